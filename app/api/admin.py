@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import Response
+import asyncio
+import hmac
+import json
+import os
+from typing import Optional
+from app.core.config import settings
+from app.core.sessions import session_manager
+from app.core.tracing import trace_registry
+
+router = APIRouter(prefix="/admin")
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # Without ADMIN_TOKEN the admin API doesn't exist as far as clients can tell.
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404)
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="bad admin token")
+
+
+def _not_here(session_id: str) -> HTTPException:
+    # Sessions live in one worker; with several, retry until the request lands on the right one.
+    return HTTPException(status_code=404, detail=f"session {session_id} is not on worker {os.getpid()}")
+
+
+@router.get("/sessions", dependencies=[Depends(require_admin)])
+async def list_sessions():
+    return {
+        "worker_pid": os.getpid(),
+        "sessions": trace_registry.sessions(),
+        "tracing": trace_registry.tracing(),
+        "captures": trace_registry.finished(),
+        "admission": session_manager.stats(),
+    }
+
+
+@router.post("/trace/{session_id}", dependencies=[Depends(require_admin)])
+async def start_trace(session_id: str, seconds: float = 10.0, profile: bool = False):
+    """Starts capturing spans for a live session; stops by itself after ``seconds``."""
+    try:
+        trace = trace_registry.start(session_id, seconds, profile)
+    except KeyError:
+        raise _not_here(session_id)
+    return {"session_id": session_id, "worker_pid": os.getpid(), "seconds": trace.seconds, "profile": profile}
+
+
+@router.post("/trace/{session_id}/stop", dependencies=[Depends(require_admin)])
+async def stop_trace(session_id: str):
+    trace = trace_registry.stop(session_id)
+    if trace is None:
+        raise _not_here(session_id)
+    return {"session_id": session_id, "events": len(trace.events), "dropped": trace.dropped}
+
+
+@router.get("/trace/{session_id}", dependencies=[Depends(require_admin)])
+async def download_trace(session_id: str):
+    """Chrome trace-event JSON for the running or most recent capture of ``session_id``."""
+    trace = trace_registry.get(session_id)
+    if trace is None:
+        raise _not_here(session_id)
+    # A full capture is tens of MB of JSON: serialize it off the event loop.
+    body = await asyncio.to_thread(json.dumps, trace.export())
+    return Response(
+        body,
+        media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="trace-{session_id}.json"'},
+    )
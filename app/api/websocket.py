@@ -4,83 +4,321 @@ import logging
 import traceback
 import time
 import uuid
-from app.services.gemini_service import GeminiLiveService
-from app.services.audio_utils import AudioProcessor
+from app.services.gemini_service import GeminiLiveService, Interrupted, Reconnected, Transcript, TurnComplete, UpstreamUnavailable
+from app.services.greeting_cache import greeting_cache
+from app.services.gemini_pool import gemini_pool
+from app.services.audio_queue import AudioQueue, AudioRingBuffer
+from app.services.coalescer import FrameCoalescer
+from app.services.pacer import DownstreamPacer
+from app.services.reframer import PlaybackReframer
+from app.services.recorder import SessionRecorder, recording_writer
+from app.services.dsp_executor import dsp_executor
 from app.core.config import settings
+from app.core import metrics
+from app.core.lifecycle import lifecycle
+from app.core.log import ChunkTracer, bind_session
+from app.core.sessions import SessionSlot, session_manager
+from app.core.tracing import TraceHandle, trace_registry
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Control markers passed through the mic queue, in order with the audio.
+_FLUSH = "flush"
+_SPEECH_END = "speech_end"
+# Downstream queue marker: the model's turn ended (not an underrun if audio pauses here).
+_TURN_END = "turn_end"
+# Interrupts the client hasn't acked within this many seconds are forgotten (never measured).
+_INTERRUPT_ACK_TIMEOUT = 5.0
+
 @router.websocket("/ws/chat")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
+    if lifecycle.draining:
+        # Shutting down: 1012 (service restart) tells the client to reconnect elsewhere.
+        await websocket.close(code=1012)
+        return
     session_id = uuid.uuid4().hex[:8]
+    bind_session(session_id)
     client_host = getattr(websocket.client, "host", "unknown")
+
+    async def close_idle():
+        await websocket.close(code=1000, reason="idle timeout")
+
+    # Admission control: wait briefly for a free slot on this worker, or turn the client away.
+    queued = session_manager.must_wait() and session_manager.waiting < session_manager.queue_max
+    if queued:
+        await websocket.send_json({"type": "queued", "position": session_manager.waiting + 1})
+    slot = await session_manager.admit(session_id, close_idle)
+    if slot is None:
+        # 1013 (try again later): the client or load balancer can retry elsewhere.
+        await websocket.close(code=1013, reason="server busy")
+        return
+    if queued:
+        try:
+            await websocket.send_json({"type": "admitted"})
+        except Exception:
+            session_manager.release(slot)  # Gave up while waiting
+            return
     logger.info("[%s] Client connected (%s)", session_id, client_host)
-    
-    # Initialize services for this session
-    gemini_service = GeminiLiveService(session_id=session_id)
+    metrics.SESSIONS_TOTAL.inc()
+    metrics.ACTIVE_SESSIONS.inc()
+    # Full span capture, started on demand from /admin/trace (``active`` is None otherwise)
+    trace_handle = trace_registry.register(session_id)
+    try:
+        await _run_session(websocket, session_id, trace_handle, slot)
+    finally:
+        # Whatever happened in the session, give back its admission slot.
+        metrics.ACTIVE_SESSIONS.dec()
+        session_manager.release(slot)
+        trace_registry.unregister(trace_handle)
+
+
+async def _run_session(websocket: WebSocket, session_id: str, trace_handle: TraceHandle, slot: SessionSlot):
+    session_started = time.monotonic()
+
+    # DSP (numpy) is loaded on first use; main.py preloads it in the background after startup.
+    from app.services.audio_utils import AudioProcessor, VoiceActivityDetector
+
+    # Initialize services for this session (a pre-warmed Gemini connection if the pool has one)
+    pooled_service = await gemini_pool.acquire(session_id)
+    gemini_service = pooled_service or GeminiLiveService(session_id=session_id)
     audio_processor = AudioProcessor(
         input_rate=settings.CLIENT_SAMPLE_RATE,
         output_rate=settings.GEMINI_SAMPLE_RATE
     )
+    # Sampled end-to-end tracing of individual chunks (LOG_TRACE_SAMPLE_N)
+    tracer = ChunkTracer(session_id, settings.LOG_TRACE_SAMPLE_N) if settings.LOG_TRACE_SAMPLE_N > 0 else None
+    gemini_service.trace = trace_handle
+
+    # Mic audio that couldn't go out while Gemini reconnects, replayed in order afterwards
+    gap_buffer = AudioRingBuffer(settings.GEMINI_SAMPLE_RATE * 2 * settings.UPSTREAM_GAP_BUFFER_MS // 1000)
+    gap_replayed_bytes = 0
+
+    async def send_upstream(data: bytes):
+        capture = trace_handle.active
+        started = time.perf_counter() if capture is not None else 0.0
+        try:
+            await gemini_service.send_audio(data)
+        except UpstreamUnavailable:
+            # Older than anything held since the drop, so it goes first.
+            gap_buffer.write_front(data)
+            if capture is not None:
+                capture.instant("upstream", "held_for_reconnect", started, bytes=len(data))
+            return
+        if capture is not None:
+            capture.span("upstream", "send_audio", started, time.perf_counter(), bytes=len(data))
+        if tracer is not None:
+            tracer.sent()
+
+    upstream = FrameCoalescer(
+        send_upstream,
+        max_bytes=settings.GEMINI_SAMPLE_RATE * 2 * settings.UPSTREAM_COALESCE_MS // 1000,
+        max_delay=settings.UPSTREAM_MAX_DELAY_MS / 1000,
+        session_id=session_id,
+    )
+    vad = VoiceActivityDetector(
+        settings.GEMINI_SAMPLE_RATE,
+        energy_dbfs=settings.VAD_ENERGY_DBFS,
+        zcr_max=settings.VAD_ZCR_MAX,
+        hangover_ms=settings.VAD_HANGOVER_MS,
+        preroll_ms=settings.VAD_PREROLL_MS,
+    ) if settings.VAD_ENABLED else None
+    # Optional QA capture; hands audio to a writer thread and never blocks
+    recorder = SessionRecorder(
+        recording_writer, session_id, settings.GEMINI_SAMPLE_RATE
+    ) if settings.RECORDING_ENABLED else None
+
+    # Bounded hand-offs between the legs, so one slow peer can't stall the other
+    # direction or grow memory: stale mic audio is dropped, downstream audio is
+    # merged into fewer frames, then parked, then dropped oldest first.
+    mic_queue = AudioQueue(
+        "mic",
+        maxsize=settings.MIC_QUEUE_MAX_FRAMES,
+        policy="drop_oldest",
+        session_id=session_id,
+    )
+    downstream_queue_ms = settings.DOWNSTREAM_QUEUE_MAX_MS
+    if settings.DOWNSTREAM_LEAD_MS > 0:
+        # Paced: the lead and a couple of playback frames is all send_to_client can use.
+        downstream_queue_ms = min(
+            downstream_queue_ms, settings.DOWNSTREAM_LEAD_MS + 2 * max(settings.DOWNSTREAM_FRAME_MS, 100)
+        )
+    downstream_queue = AudioQueue(
+        "downstream",
+        maxsize=settings.DOWNSTREAM_QUEUE_MAX_FRAMES,
+        policy="coalesce",
+        max_bytes=settings.GEMINI_SAMPLE_RATE * 2 * downstream_queue_ms // 1000,
+        session_id=session_id,
+    )
+    # Gemini output the downstream queue has no room for yet. receive_from_gemini never
+    # waits for the (paced) browser leg, or a barge-in would sit unread behind seconds of
+    # audio; it parks items here in order and send_to_client moves them over as space
+    # frees up. Bounded like the queue was: past DOWNSTREAM_QUEUE_MAX_MS the oldest parked
+    # audio is dropped (a stalled client or a model far ahead of playback), and barge-in
+    # clears it. Every audio item is at least 2 bytes, so only the byte limit binds.
+    backlog_bytes = max(2, settings.GEMINI_SAMPLE_RATE * 2 * settings.DOWNSTREAM_QUEUE_MAX_MS // 1000)
+    downstream_backlog = AudioQueue(
+        "downstream_backlog",
+        maxsize=backlog_bytes // 2,
+        policy="drop_oldest",
+        max_bytes=backlog_bytes,
+        session_id=session_id,
+    )
+    backlog_overflows = 0
+
+    def queue_downstream(item) -> None:
+        nonlocal backlog_overflows
+        if not len(downstream_backlog) and downstream_queue.try_put(item):
+            return
+        dropped = downstream_backlog.dropped
+        downstream_backlog.try_put(item)  # drop_oldest: always accepted
+        if downstream_backlog.dropped > dropped:
+            backlog_overflows += 1
+            if backlog_overflows == 1:
+                logger.warning(
+                    "[%s] Downstream backlog full (%d bytes): dropping the oldest undelivered audio",
+                    session_id, downstream_backlog.depth_bytes,
+                )
+
+    def refill_downstream() -> None:
+        while len(downstream_backlog) and downstream_queue.try_put(downstream_backlog.peek()):
+            downstream_backlog.get_nowait()
 
     # Lightweight per-session counters (avoid per-chunk logs unless debugging).
     last_stats_log = time.monotonic()
     in_audio_bytes = 0
     in_audio_chunks = 0
+    dsp_wait_window = 0.0
     out_audio_bytes = 0
     out_audio_chunks = 0
+    out_pcm_bytes = 0
     out_audio_bytes_window = 0
     out_audio_chunks_window = 0
     last_out_stats_log = time.monotonic()
     seen_gemini_audio = False
-    
-    try:
-        await gemini_service.connect()
-        
-        # Initialize Greeting immediately after handshake
-        # The response will be buffered by the websocket until we start reading
-        logger.info("[%s] Sending initial greeting trigger...", session_id)
-        await gemini_service.send_text("Hello! Please warmly welcome the user and immediately ask them specifically: 'Which language would you prefer to speak in?' and 'What challenge or problem are you facing today?' so you can motivate them.")
-        
-    except Exception as e:
-        logger.error("[%s] Failed to connect to Gemini: %s", session_id, e)
-        await websocket.close(code=1011) # Internal Error
-        return
 
+    # Barge-in: interrupt id -> monotonic time Gemini reported it; acked once the client is silent.
+    pending_interrupts = {}
+    interrupt_seq = 0
+    interrupt_count = 0
+    interrupt_silence_total = 0.0
+    interrupt_silence_max = 0.0
+
+    # Downstream encoding and playback rate, switched by send_to_client when it reaches the client's ack.
+    downstream_codec = "pcm16"
+    # Resamples 24k model audio to the client's playback rate (None = send 24k)
+    downstream_resampler = None
+    # Fixed-size playback frames (at 24k, before resampling) instead of Gemini's part sizes
+    reframer = PlaybackReframer(settings.GEMINI_SAMPLE_RATE * 2 * settings.DOWNSTREAM_FRAME_MS // 1000, session_id=session_id)
+
+    # Greeting: play a cached rendering right away, or capture this session's live one.
+    greeting_key = None
+    cached_greeting = None
+    greeting_capture = None
+    greeting_transcript = []
+    if settings.GREETING_CACHE_ENABLED:
+        greeting_key = greeting_cache.make_key(
+            gemini_service.model, gemini_service.voice_name, settings.SYSTEM_PROMPT, settings.GREETING_TRIGGER
+        )
+        try:
+            cached_greeting = await greeting_cache.get(greeting_key)
+        except Exception as e:
+            # A broken cache costs the fast greeting, not the session (or its pooled connection).
+            logger.warning("[%s] Greeting cache lookup failed: %s", session_id, e)
+        if cached_greeting is None:
+            greeting_capture = bytearray()
+    greeting_capture_limit = settings.GEMINI_SAMPLE_RATE * 2 * settings.GREETING_CACHE_MAX_SECONDS
+    
     # Task to handle incoming audio from client -> Gemini
     async def receive_from_client():
-        nonlocal last_stats_log, in_audio_bytes, in_audio_chunks
+        nonlocal last_stats_log, in_audio_bytes, in_audio_chunks, dsp_wait_window
+        nonlocal interrupt_count, interrupt_silence_total, interrupt_silence_max
+        odd_frames = 0
         try:
             while True:
                 # receive() returns an ASGI message dict which can contain 'text' or 'bytes'
                 message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    logger.info("[%s] Client disconnected", session_id)
+                    break
                 
+                slot.touch()
                 if "bytes" in message and message["bytes"]:
                     data = message["bytes"]
+                    if len(data) % 2:
+                        # Not whole int16 samples: drop the stray byte rather than fail the frame.
+                        if not odd_frames:
+                            logger.warning("[%s] Client sent an odd-length audio frame (%d bytes); trimming", session_id, len(data))
+                        odd_frames += 1
+                        data = data[:-1]
+                        if not data:
+                            continue
                     in_audio_chunks += 1
                     in_audio_bytes += len(data)
+                    metrics.CLIENT_IN_MESSAGES.inc()
+                    metrics.CLIENT_IN_BYTES.inc(len(data))
+                    trace = tracer.start("up", len(data)) if tracer is not None else None
+                    capture = trace_handle.active
+                    received = time.perf_counter() if capture is not None else 0.0
 
-                    # Process audio (Resample 48k -> 24k)
-                    processed_audio = audio_processor.resample_audio(data, input_format='int16')
+                    # Process audio (Resample 48k -> 24k) on the shared DSP pool
+                    processed_audio, dsp_wait = await dsp_executor.resample(audio_processor, data)
+                    dsp_wait_window += dsp_wait
+                    if capture is not None:
+                        capture.span("client_rx", "resample", received, time.perf_counter(),
+                                     bytes=len(data), pool_wait_ms=round(dsp_wait * 1000, 3))
+                    if trace is not None:
+                        trace.mark("dsp")
+                        if not processed_audio:
+                            tracer.finish(trace, "buffered_by_resampler")
                     if processed_audio:
-                        await gemini_service.send_audio(processed_audio)
+                        if recorder is not None:
+                            recorder.record_mic(processed_audio)
+                        if vad is None:
+                            if trace is not None:
+                                tracer.follow(trace, processed_audio)
+                            await mic_queue.put(processed_audio)
+                        else:
+                            was_speaking = vad.speaking
+                            frames, speech_ended = vad.process(processed_audio)
+                            if trace is not None:
+                                if frames:
+                                    # The last frame out of the VAD holds this chunk's audio.
+                                    trace.mark("vad")
+                                    tracer.follow(trace, frames[-1])
+                                else:
+                                    tracer.finish(trace, "suppressed_by_vad")
+                            for frame in frames:
+                                await mic_queue.put(frame)
+                            if vad.speaking and not was_speaking and gemini_service.ai_speaking:
+                                # User is talking over the bot: get the onset to Gemini now.
+                                await mic_queue.put(_FLUSH)
+                            if speech_ended:
+                                await mic_queue.put(_SPEECH_END)
+                    if capture is not None:
+                        capture.span("client_rx", "mic_chunk", received, time.perf_counter(),
+                                     bytes=len(data), out_bytes=len(processed_audio))
 
-                    # Periodic stats to terminal to help debug "mic not reaching Gemini"
+                    # Periodic stats to help debug "mic not reaching Gemini" (metrics has the totals)
                     now = time.monotonic()
                     if now - last_stats_log >= 1.0:
-                        logger.info(
-                            "[%s] RX mic: %d chunks / %d bytes (input_rate=%d -> %d)",
+                        logger.debug(
+                            "[%s] RX mic: %d chunks / %d bytes (input_rate=%d -> %d, dsp wait avg %.2fms, upstream msgs %d, mic queue %d, dropped %d)",
                             session_id,
                             in_audio_chunks,
                             in_audio_bytes,
                             audio_processor.input_rate,
                             audio_processor.output_rate,
+                            dsp_wait_window / in_audio_chunks * 1000,
+                            upstream.messages_out,
+                            mic_queue.depth,
+                            mic_queue.dropped,
                         )
                         last_stats_log = now
                         in_audio_chunks = 0
                         in_audio_bytes = 0
+                        dsp_wait_window = 0.0
                         
                 elif "text" in message and message["text"]:
                     # Handle JSON messages (e.g., Ping for latency, Config)
@@ -95,11 +333,30 @@ async def websocket_endpoint(websocket: WebSocket):
                                 "type": "pong", 
                                 "timestamp": payload.get("timestamp")
                             })
+                            buffered_ms = payload.get("bufferedMs")
+                            pacer.observe_client(None if buffered_ms is None else float(buffered_ms) / 1000)
+
+                        elif msg_type == "interrupt_ack":
+                            # Client has stopped all scheduled playback for this interrupt.
+                            interrupted_at = pending_interrupts.pop(payload.get("id"), None)
+                            if interrupted_at is not None:
+                                silence = time.monotonic() - interrupted_at
+                                interrupt_count += 1
+                                interrupt_silence_total += silence
+                                interrupt_silence_max = max(interrupt_silence_max, silence)
+                                metrics.INTERRUPT_TO_SILENCE.observe(silence)
+                                logger.info(
+                                    "[%s] Barge-in: interruption to client silence %.1fms",
+                                    session_id,
+                                    silence * 1000,
+                                )
                         
                         elif msg_type == "config":
                             # Update AudioProcessor with client's actual Sample Rate
                             client_rate = payload.get("sampleRate")
                             if client_rate:
+                                # Don't merge audio across a rate change.
+                                await mic_queue.put(_FLUSH)
                                 audio_processor.input_rate = int(client_rate)
                                 logger.info(
                                     "[%s] Client config: sendRate=%sHz (context=%sHz, chunkMs=%s)",
@@ -108,6 +365,29 @@ async def websocket_endpoint(websocket: WebSocket):
                                     payload.get("sourceSampleRate"),
                                     payload.get("chunkMs"),
                                 )
+
+                            requested_codec = payload.get("downstreamCodec")
+                            playback_rate = payload.get("playbackRate")
+                            if requested_codec or playback_rate:
+                                codec = requested_codec if requested_codec in settings.DOWNSTREAM_CODECS else "pcm16"
+                                if requested_codec and codec != requested_codec:
+                                    logger.warning(
+                                        "[%s] Downstream codec %r not available, using pcm16", session_id, requested_codec
+                                    )
+                                rate = settings.GEMINI_SAMPLE_RATE
+                                if playback_rate and settings.DOWNSTREAM_RESAMPLE:
+                                    if 8000 <= int(playback_rate) <= 192000:
+                                        rate = int(playback_rate)
+                                    else:
+                                        logger.warning("[%s] Ignoring playbackRate %r", session_id, playback_rate)
+                                # Goes through the downstream queue so audio already queued keeps its
+                                # encoding and rate; the client switches decoders when this ack arrives.
+                                await downstream_queue.put({
+                                    "type": "codec",
+                                    "codec": codec,
+                                    "sampleRate": rate,
+                                    "frameMs": settings.DOWNSTREAM_FRAME_MS,
+                                })
                                 
                     except Exception as e:
                         logger.warning("[%s] Failed to parse text message: %s", session_id, e)
@@ -118,55 +398,409 @@ async def websocket_endpoint(websocket: WebSocket):
             logger.error("[%s] Error in receive_from_client: %s", session_id, e)
             traceback.print_exc()
 
-    # Task to handle incoming audio from Gemini -> Client
-    async def send_to_client():
-        nonlocal out_audio_bytes, out_audio_chunks, out_audio_bytes_window, out_audio_chunks_window, last_out_stats_log, seen_gemini_audio
+    async def replay_gap(stream_end: bool) -> bool:
+        """Sends mic audio held during a reconnect; returns True if an audio_stream_end is still owed."""
+        nonlocal gap_replayed_bytes
+        await upstream.flush()
+        step = max(upstream.max_bytes, settings.GEMINI_SAMPLE_RATE * 2 // 10)
+        while len(gap_buffer):
+            piece = gap_buffer.pop(step)
+            try:
+                await gemini_service.send_audio(piece)
+            except UpstreamUnavailable:
+                gap_buffer.unpop(piece)  # Dropped again: keep it for the next connection
+                return stream_end
+            gap_replayed_bytes += len(piece)
+        if stream_end and not gemini_service.reconnecting:
+            try:
+                await gemini_service.end_audio_stream()
+                return False
+            except UpstreamUnavailable:
+                pass
+        return stream_end
+
+    # Task to forward processed mic audio -> Gemini
+    async def send_to_gemini():
+        gap_stream_end = False
+        try:
+            while True:
+                item = await mic_queue.get()
+                if gemini_service.reconnecting:
+                    # Hold audio until the new connection is up; flushes are moot meanwhile.
+                    if item is _SPEECH_END:
+                        gap_stream_end = True
+                    elif isinstance(item, (bytes, bytearray)):
+                        gap_buffer.write(item)
+                    continue
+                if len(gap_buffer) or gap_stream_end:
+                    gap_stream_end = await replay_gap(gap_stream_end)
+
+                if item is _FLUSH:
+                    await upstream.flush()
+                elif item is _SPEECH_END:
+                    await upstream.flush()
+                    try:
+                        await gemini_service.end_audio_stream()
+                    except UpstreamUnavailable:
+                        gap_stream_end = True
+                else:
+                    if tracer is not None:
+                        trace = tracer.claim(item)
+                        if trace is not None:
+                            trace.mark("dequeued")
+                            tracer.await_send(trace)
+                    await upstream.push(item)
+        except Exception as e:
+            logger.error("[%s] Error in send_to_gemini: %s", session_id, e)
+
+    # Task to handle incoming audio from Gemini -> downstream queue
+    async def receive_from_gemini():
+        nonlocal seen_gemini_audio, interrupt_seq, greeting_capture, downstream_resampler
         try:
             async for audio_chunk in gemini_service.receive():
-                if audio_chunk:
-                    out_audio_chunks += 1
-                    out_audio_bytes += len(audio_chunk)
-                    out_audio_chunks_window += 1
-                    out_audio_bytes_window += len(audio_chunk)
+                if isinstance(audio_chunk, TurnComplete):
+                    if greeting_capture and greeting_transcript:
+                        # First turn finished uninterrupted: keep it as a greeting variant.
+                        greeting_cache.put_soon(greeting_key, bytes(greeting_capture), "".join(greeting_transcript))
+                    elif greeting_capture:
+                        # Without a transcript, a later session couldn't tell the model what it said.
+                        logger.info("[%s] Greeting not cached: no transcript received", session_id)
+                    greeting_capture = None
+                    queue_downstream(_TURN_END)
+                    continue
+
+                if isinstance(audio_chunk, Transcript):
+                    if greeting_capture is not None:
+                        greeting_transcript.append(audio_chunk.text)
+                    continue
 
+                if isinstance(audio_chunk, Reconnected):
+                    # The turn in progress (if any) died with the old connection;
+                    # the pause that follows isn't an underrun.
+                    greeting_capture = None
+                    capture = trace_handle.active
+                    if capture is not None:
+                        capture.instant("gemini_rx", "reconnected", time.perf_counter(),
+                                        recovery_ms=round(audio_chunk.recovery_seconds * 1000, 1),
+                                        resumed=audio_chunk.resumed)
+                    queue_downstream(_TURN_END)
+                    # Wakes send_to_gemini to replay the mic audio held during the gap.
+                    await mic_queue.put(_FLUSH)
+                    continue
+
+                if isinstance(audio_chunk, Interrupted):
+                    greeting_capture = None
+                    # Drop undelivered audio, tell the browser to stop its scheduled
+                    # playback, and push the user's buffered speech upstream now.
+                    interrupt_seq += 1
+                    # A client that never acks must not grow this for the whole session.
+                    for stale_id in [i for i, at in pending_interrupts.items()
+                                     if audio_chunk.received_at - at > _INTERRUPT_ACK_TIMEOUT]:
+                        del pending_interrupts[stale_id]
+                    pending_interrupts[interrupt_seq] = audio_chunk.received_at
+                    # Parked turn ends stay: they still mark where the interrupted turn stopped.
+                    dropped = downstream_queue.clear_audio() + downstream_backlog.clear_audio() + reframer.clear()
+                    pacer.interrupt()
+                    if downstream_resampler is not None:
+                        # Stale filter history; any resample in flight finishes on the old instance.
+                        downstream_resampler = AudioProcessor(settings.GEMINI_SAMPLE_RATE, downstream_resampler.output_rate)
+                    downstream_queue.put_front({"type": "interrupt", "id": interrupt_seq})
+                    if dropped:
+                        logger.info("[%s] Barge-in: dropped %d undelivered bytes", session_id, dropped)
+                    await mic_queue.put(_FLUSH)
+                    continue
+
+                if audio_chunk:
                     if not seen_gemini_audio:
                         logger.info("[%s] First audio received from Gemini (%d bytes)", session_id, len(audio_chunk))
+                        metrics.TIME_TO_FIRST_AUDIO.observe(time.monotonic() - session_started)
                         seen_gemini_audio = True
+                    if greeting_capture is not None:
+                        greeting_capture += audio_chunk
+                        if len(greeting_capture) > greeting_capture_limit:
+                            greeting_capture = None
+                    trace = tracer.start("down", len(audio_chunk)) if tracer is not None else None
+                    if trace is not None:
+                        tracer.follow(trace, audio_chunk)
+                    queue_downstream(audio_chunk)
+                    capture = trace_handle.active
+                    if capture is not None:
+                        capture.instant("gemini_rx", "downstream_put", time.perf_counter(), bytes=len(audio_chunk),
+                                        depth=downstream_queue.depth, parked=len(downstream_backlog))
+                    if trace is not None:
+                        trace.mark("queued")
+        except Exception as e:
+            logger.error("[%s] Error in receive_from_gemini: %s", session_id, e)
 
-                    now = time.monotonic()
-                    if now - last_out_stats_log >= 1.0:
-                        logger.info(
-                            "[%s] TX audio to browser: %d chunks / %d bytes",
-                            session_id,
-                            out_audio_chunks_window,
-                            out_audio_bytes_window,
-                        )
-                        last_out_stats_log = now
-                        out_audio_chunks_window = 0
-                        out_audio_bytes_window = 0
+    # Encodes and sends one paced slice of PCM to the browser
+    async def deliver_audio(pcm: bytes):
+        nonlocal out_audio_bytes, out_audio_chunks, out_audio_bytes_window, out_audio_chunks_window, last_out_stats_log
+        nonlocal out_pcm_bytes
+        if recorder is not None:
+            recorder.record_bot(pcm)
+        capture = trace_handle.active
+        started = time.perf_counter() if capture is not None else 0.0
+        if downstream_resampler is not None:
+            pcm, _ = await dsp_executor.resample(downstream_resampler, pcm)
+            if capture is not None:
+                resampled = time.perf_counter()
+                capture.span("client_tx", "resample", started, resampled, rate=downstream_resampler.output_rate)
+                started = resampled
+        out_pcm_bytes += len(pcm)
+        data = await dsp_executor.encode(downstream_codec, pcm)
+        if capture is not None:
+            encoded = time.perf_counter()
+            capture.span("client_tx", "encode", started, encoded, codec=downstream_codec, bytes=len(pcm))
+        out_audio_chunks += 1
+        out_audio_bytes += len(data)
+        out_audio_chunks_window += 1
+        out_audio_bytes_window += len(data)
+        metrics.CLIENT_OUT_MESSAGES.inc()
+        metrics.CLIENT_OUT_BYTES.inc(len(data))
+
+        now = time.monotonic()
+        if now - last_out_stats_log >= 1.0:
+            logger.debug(
+                "[%s] TX audio to browser: %d chunks / %d bytes (client lead %.0fms, downstream queue %d / %d bytes, coalesced %d)",
+                session_id,
+                out_audio_chunks_window,
+                out_audio_bytes_window,
+                pacer.lead() * 1000,
+                downstream_queue.depth,
+                downstream_queue.depth_bytes,
+                downstream_queue.coalesced,
+            )
+            last_out_stats_log = now
+            out_audio_chunks_window = 0
+            out_audio_bytes_window = 0
+
+        # Client decodes with the codec and rate it was last told about
+        await websocket.send_bytes(data)
+        if capture is not None:
+            capture.span("client_tx", "send_bytes", encoded, time.perf_counter(),
+                         bytes=len(data), lead_ms=round(pacer.lead() * 1000, 1))
 
-                    # Send back directly (Client will play 24k PCM)
-                    await websocket.send_bytes(audio_chunk)
+    # Releases audio at playback rate so the browser only buffers DOWNSTREAM_LEAD_MS ahead
+    pacer = DownstreamPacer(
+        deliver_audio,
+        sample_rate=settings.GEMINI_SAMPLE_RATE,
+        max_lead=settings.DOWNSTREAM_LEAD_MS / 1000,
+        # Never split a playback frame
+        max_slice=max(0.1, settings.DOWNSTREAM_FRAME_MS / 1000),
+        session_id=session_id,
+    )
+
+    async def send_frames(frames):
+        generation = reframer.generation
+        for frame in frames:
+            if reframer.generation != generation:
+                return  # Barge-in: the rest is stale
+            if frame:
+                await pacer.send(frame)
+
+    # A short frame waits at most one frame's duration for the rest of its audio
+    frame_hold = settings.DOWNSTREAM_FRAME_MS / 1000
+
+    # Task to deliver downstream audio and control messages -> Client
+    async def send_to_client():
+        nonlocal downstream_codec, downstream_resampler
+        try:
+            while True:
+                if reframer.pending_bytes:
+                    try:
+                        item = await asyncio.wait_for(downstream_queue.get(), frame_hold)
+                    except asyncio.TimeoutError:
+                        # Gemini is slower than playback right now: don't sit on audio.
+                        await send_frames([reframer.flush()])
+                        continue
+                else:
+                    item = await downstream_queue.get()
+                refill_downstream()
+                if item is _TURN_END:
+                    await send_frames([reframer.flush()])
+                    pacer.end_turn()
+                    continue
+                if isinstance(item, dict):
+                    if item.get("type") == "codec":
+                        # Audio held so far goes out in the old format, before the ack.
+                        await send_frames([reframer.flush()])
+                        downstream_codec = item["codec"]
+                        rate = item["sampleRate"]
+                        downstream_resampler = (
+                            AudioProcessor(settings.GEMINI_SAMPLE_RATE, rate) if rate != settings.GEMINI_SAMPLE_RATE else None
+                        )
+                    await websocket.send_json(item)
+                    continue
+                trace = tracer.claim(item) if tracer is not None else None
+                capture = trace_handle.active
+                if trace is None and capture is None:
+                    await send_frames(reframer.push(item))
+                    continue
+                if trace is not None:
+                    trace.mark("dequeued")
+                started = time.perf_counter()
+                frames = reframer.push(item)
+                await send_frames(frames)
+                if trace is not None:
+                    tracer.finish(trace, "sent" if frames else "held_by_reframer")
+                if capture is not None:
+                    # Includes the pacer holding audio back to keep the client's lead bounded
+                    capture.span("client_tx", "paced_send", started, time.perf_counter(), bytes=len(item))
         except Exception as e:
             logger.error("[%s] Error in send_to_client: %s", session_id, e)
 
+    async def feed_cached_greeting(pcm: bytes):
+        # 100ms frames, so barge-in can drop whatever hasn't gone out yet
+        step = settings.GEMINI_SAMPLE_RATE * 2 // 10
+        for offset in range(0, len(pcm), step):
+            await downstream_queue.put(pcm[offset : offset + step])
+        await downstream_queue.put(_TURN_END)
+
+    # The browser leg starts first so a cached greeting plays while Gemini connects.
+    client_out_task = asyncio.create_task(send_to_client())
+    greeting_task = None
+    if cached_greeting is not None:
+        logger.info("[%s] Playing cached greeting (%d bytes)", session_id, len(cached_greeting[0]))
+        metrics.TIME_TO_FIRST_AUDIO.observe(time.monotonic() - session_started)
+        seen_gemini_audio = True
+        greeting_task = asyncio.create_task(feed_cached_greeting(cached_greeting[0]))
+
+    try:
+        if pooled_service is None:
+            await gemini_service.connect()
+
+        if cached_greeting is not None:
+            # Pick up as though the model had just delivered the greeting the user is hearing.
+            await gemini_service.send_greeting_context(settings.GREETING_TRIGGER, cached_greeting[1])
+        else:
+            # The response will be buffered by the websocket until we start reading
+            logger.info("[%s] Sending initial greeting trigger...", session_id)
+            await gemini_service.send_text(settings.GREETING_TRIGGER)
+
+    except Exception as e:
+        logger.error("[%s] Failed to connect to Gemini: %s", session_id, e)
+        if recorder is not None:
+            recorder.close()
+        if tracer is not None:
+            tracer.close()
+        client_out_task.cancel()
+        if greeting_task is not None:
+            greeting_task.cancel()
+        # A pooled connection, or one that failed after the handshake, is still open.
+        await gemini_service.close()
+        await websocket.close(code=1011) # Internal Error
+        return
+
     try:
-        # Run both tasks
-        client_task = asyncio.create_task(receive_from_client())
-        gemini_task = asyncio.create_task(send_to_client())
+        # Run all four legs; any one ending tears down the session
+        tasks = [
+            asyncio.create_task(receive_from_client()),
+            asyncio.create_task(send_to_gemini()),
+            asyncio.create_task(receive_from_gemini()),
+            client_out_task,
+        ]
         
         done, pending = await asyncio.wait(
-            [client_task, gemini_task],
+            tasks,
             return_when=asyncio.FIRST_COMPLETED,
         )
         
         for task in pending:
             task.cancel()
+        if greeting_task is not None:
+            greeting_task.cancel()
             
     except Exception as e:
         logger.error("[%s] Error in websocket session: %s", session_id, e)
     finally:
+        if recorder is not None:
+            recorder.close()
+        if tracer is not None:
+            tracer.close()
+        try:
+            await upstream.close()
+        except Exception:
+            pass
         await gemini_service.close()
+        upstream_stats = upstream.stats()
+        logger.info(
+            "[%s] Upstream coalescing: %d frames -> %d messages (%.1f msgs/s saved, added latency avg %.1fms / max %.1fms)",
+            session_id,
+            upstream_stats["frames_in"],
+            upstream_stats["messages_out"],
+            upstream_stats["messages_saved_per_s"],
+            upstream_stats["avg_added_latency_ms"],
+            upstream_stats["max_added_latency_ms"],
+        )
+        if gap_buffer.buffered_bytes:
+            gap_lost = gap_buffer.dropped_bytes + len(gap_buffer)
+            metrics.UPSTREAM_GAP_DROPPED_BYTES.inc(gap_lost)
+            logger.info(
+                "[%s] Upstream gap buffer: %d mic bytes held during reconnects, %d replayed, %d dropped",
+                session_id,
+                gap_buffer.buffered_bytes,
+                gap_replayed_bytes,
+                gap_lost,
+            )
+        for queue in (mic_queue, downstream_queue, downstream_backlog):
+            queue_stats = queue.stats()
+            logger.info(
+                "[%s] %s queue: max depth %d, dropped %d (%d bytes), coalesced %d, high watermark hits %d",
+                session_id,
+                queue.name,
+                queue_stats["max_depth"],
+                queue_stats["dropped"],
+                queue_stats["dropped_bytes"],
+                queue_stats["coalesced"],
+                queue_stats["high_events"],
+            )
+        if backlog_overflows:
+            logger.warning("[%s] Downstream backlog overflowed %d times (oldest audio dropped)", session_id, backlog_overflows)
+        if interrupt_count:
+            logger.info(
+                "[%s] Barge-in: %d interruptions, interruption to silence avg %.1fms / max %.1fms",
+                session_id,
+                interrupt_count,
+                interrupt_silence_total / interrupt_count * 1000,
+                interrupt_silence_max * 1000,
+            )
+        if vad is not None:
+            logger.info(
+                "[%s] VAD suppressed %.1f%% of mic chunks (%d / %d)",
+                session_id,
+                vad.suppressed_fraction * 100,
+                vad.chunks_suppressed,
+                vad.chunks_total,
+            )
+        reframer_stats = reframer.stats()
+        if reframer.enabled and reframer_stats["parts_in"]:
+            logger.info(
+                "[%s] Downstream reframing: %d Gemini parts -> %d frames of %dms (%d short)",
+                session_id,
+                reframer_stats["parts_in"],
+                reframer_stats["frames_out"],
+                settings.DOWNSTREAM_FRAME_MS,
+                reframer_stats["short_frames"],
+            )
+        pacer_stats = pacer.stats()
+        logger.info(
+            "[%s] Downstream pacing: client lead avg %.0fms / max %.0fms, %d underruns (%.0fms), %d network stalls",
+            session_id,
+            pacer_stats["avg_lead_ms"],
+            pacer_stats["max_lead_ms"],
+            pacer_stats["underruns"],
+            pacer_stats["underrun_ms"],
+            pacer_stats["stalls"],
+        )
+        if out_pcm_bytes and out_audio_bytes != out_pcm_bytes:
+            logger.info(
+                "[%s] Downstream codec %s: %d PCM bytes -> %d bytes sent (%.1fx smaller)",
+                session_id,
+                downstream_codec,
+                out_pcm_bytes,
+                out_audio_bytes,
+                out_pcm_bytes / max(1, out_audio_bytes),
+            )
         logger.info(
             "[%s] Session closed (TX to client: %d chunks / %d bytes)",
             session_id,
@@ -4,13 +4,37 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class Settings:
+    # Checked by validate() at startup rather than on import, so tools and
+    # benchmarks can import the app without a key.
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY not found in .env file")
 
     # Live API defaults (override via .env if Google changes model names)
     GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash-native-audio-preview-12-2025")
     GEMINI_VOICE = os.getenv("GEMINI_VOICE", "Aoede")
+    # Point at a local stand-in (benchmarks/mock_gemini.py) for load testing
+    GEMINI_LIVE_URI = os.getenv(
+        "GEMINI_LIVE_URI",
+        "wss://generativelanguage.googleapis.com/ws/google.ai.generativelanguage.v1alpha.GenerativeService.BidiGenerateContent",
+    )
+
+    # JSON backend for the Gemini wire format: "auto" (orjson > simdjson > stdlib), "orjson", "simdjson", "stdlib"
+    GEMINI_JSON_BACKEND = os.getenv("GEMINI_JSON_BACKEND", "auto")
+    # Send realtime_input as binary websocket frames (skips the bytes -> str copy)
+    GEMINI_BINARY_FRAMES = os.getenv("GEMINI_BINARY_FRAMES", "0") == "1"
+
+    # Pre-warmed Gemini connections per (model, voice); 0 disables the pool
+    GEMINI_POOL_SIZE = int(os.getenv("GEMINI_POOL_SIZE", "0"))
+    # Retire pooled connections before the server's idle timeout can close them
+    GEMINI_POOL_MAX_IDLE_S = float(os.getenv("GEMINI_POOL_MAX_IDLE_S", "60"))
+
+    # If the Gemini connection drops mid-session, reconnect instead of ending the
+    # session (0 disables); attempts back off exponentially from the base delay
+    GEMINI_RECONNECT_ATTEMPTS = int(os.getenv("GEMINI_RECONNECT_ATTEMPTS", "3"))
+    GEMINI_RECONNECT_BACKOFF_MS = int(os.getenv("GEMINI_RECONNECT_BACKOFF_MS", "250"))
+    # Ask for session resumption handles so a reconnect keeps the conversation context
+    GEMINI_SESSION_RESUMPTION = os.getenv("GEMINI_SESSION_RESUMPTION", "1") == "1"
+    # Mic audio held while reconnecting and replayed afterwards (older audio is dropped)
+    UPSTREAM_GAP_BUFFER_MS = int(os.getenv("UPSTREAM_GAP_BUFFER_MS", "5000"))
 
     # Audio Configuration
     # Gemini usually expects 16kHz or 24kHz, 1 channel, PCM 16-bit
@@ -22,8 +46,104 @@ class Settings:
     CLIENT_SAMPLE_RATE = 48000 
     CLIENT_CHANNELS = 1
     
+    # DSP Executor (resampling off the event loop)
+    # "thread" (numpy releases the GIL), "process", or "inline" (on the event loop)
+    DSP_EXECUTOR = os.getenv("DSP_EXECUTOR", "thread")
+    DSP_WORKERS = int(os.getenv("DSP_WORKERS", "2"))
+    # Max frames (one per session) folded into a single vectorized DSP call
+    DSP_BATCH_MAX = int(os.getenv("DSP_BATCH_MAX", "64"))
+
+    # Upstream coalescing: merge 20ms mic frames into one Gemini message of up to
+    # UPSTREAM_COALESCE_MS audio, never holding a frame longer than UPSTREAM_MAX_DELAY_MS.
+    # Set either to 0 to send every frame as-is.
+    UPSTREAM_COALESCE_MS = int(os.getenv("UPSTREAM_COALESCE_MS", "80"))
+    UPSTREAM_MAX_DELAY_MS = int(os.getenv("UPSTREAM_MAX_DELAY_MS", "100"))
+
+    # Server-side VAD: stop streaming silence upstream
+    VAD_ENABLED = os.getenv("VAD_ENABLED", "1") == "1"
+    VAD_ENERGY_DBFS = float(os.getenv("VAD_ENERGY_DBFS", "-45"))
+    VAD_ZCR_MAX = float(os.getenv("VAD_ZCR_MAX", "0.35"))
+    VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "400"))
+    VAD_PREROLL_MS = int(os.getenv("VAD_PREROLL_MS", "200"))
+
+    # Per-session queues between the audio legs
+    # Mic frames waiting for the Gemini socket (oldest dropped beyond this, ~500ms of 20ms frames)
+    MIC_QUEUE_MAX_FRAMES = int(os.getenv("MIC_QUEUE_MAX_FRAMES", "25"))
+    # Gemini audio waiting for the browser: merged into fewer frames beyond the frame
+    # limit (paced sessions queue little more than DOWNSTREAM_LEAD_MS). Overflow is parked
+    # so Gemini is still read and barge-ins aren't delayed; once DOWNSTREAM_QUEUE_MAX_MS is
+    # parked, the oldest parked audio is dropped
+    DOWNSTREAM_QUEUE_MAX_FRAMES = int(os.getenv("DOWNSTREAM_QUEUE_MAX_FRAMES", "32"))
+    DOWNSTREAM_QUEUE_MAX_MS = int(os.getenv("DOWNSTREAM_QUEUE_MAX_MS", "10000"))
+    # Pace audio to the browser at playback rate, letting it buffer at most this much
+    # ahead (ms); 0 sends audio as fast as Gemini produces it
+    DOWNSTREAM_LEAD_MS = int(os.getenv("DOWNSTREAM_LEAD_MS", "300"))
+    # Downstream encodings a client may pick via {"type": "config", "downstreamCodec": ...}
+    # (pcm16 = raw 24kHz PCM, mulaw = G.711 u-law, adpcm = IMA-ADPCM)
+    DOWNSTREAM_CODECS = [c.strip() for c in os.getenv("DOWNSTREAM_CODECS", "pcm16,mulaw,adpcm").split(",") if c.strip()]
+    # Re-cut Gemini's variable-size audio parts into fixed playback frames of this
+    # length (ms), one browser AudioBuffer each; 0 forwards parts as they arrive
+    DOWNSTREAM_FRAME_MS = int(os.getenv("DOWNSTREAM_FRAME_MS", "80"))
+    # Resample downstream audio to the playback rate a client asks for via
+    # {"type": "config", "playbackRate": ...}, so the browser plays frames as-is
+    DOWNSTREAM_RESAMPLE = os.getenv("DOWNSTREAM_RESAMPLE", "1") == "1"
+
+    # Greeting: trigger sent to Gemini at session start, and the cache of rendered greetings
+    GREETING_TRIGGER = "Hello! Please warmly welcome the user and immediately ask them specifically: 'Which language would you prefer to speak in?' and 'What challenge or problem are you facing today?' so you can motivate them."
+    # Renderings are cached with Gemini's transcript of them (output_audio_transcription
+    # is requested while enabled); the played variant's transcript seeds the conversation
+    GREETING_CACHE_ENABLED = os.getenv("GREETING_CACHE_ENABLED", "1") == "1"
+    GREETING_CACHE_DIR = os.getenv("GREETING_CACHE_DIR", ".greeting_cache")
+    GREETING_VARIANTS = int(os.getenv("GREETING_VARIANTS", "3"))
+    GREETING_CACHE_MAX_ENTRIES = int(os.getenv("GREETING_CACHE_MAX_ENTRIES", "16"))
+    # Greetings longer than this are not cached
+    GREETING_CACHE_MAX_SECONDS = int(os.getenv("GREETING_CACHE_MAX_SECONDS", "30"))
+
+    # QA recording of mic and bot audio to WAV (off by default)
+    RECORDING_ENABLED = os.getenv("RECORDING_ENABLED", "0") == "1"
+    RECORDING_DIR = os.getenv("RECORDING_DIR", "recordings")
+    # Audio waiting for the disk beyond this is dropped (and counted) instead of stalling sessions
+    RECORDING_QUEUE_MAX_MB = int(os.getenv("RECORDING_QUEUE_MAX_MB", "16"))
+    # Start a new file once the current one reaches this size or age
+    RECORDING_ROTATE_MB = int(os.getenv("RECORDING_ROTATE_MB", "100"))
+    RECORDING_ROTATE_S = float(os.getenv("RECORDING_ROTATE_S", "900"))
+
+    # Logging: records go through a bounded queue to a writer thread, so a slow
+    # stdout/collector never blocks the event loop (overflow is dropped and counted)
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" or "json" (one object per line)
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Trace 1 in N audio chunks through every stage of the pipeline (0 = off)
+    LOG_TRACE_SAMPLE_N = int(os.getenv("LOG_TRACE_SAMPLE_N", "0"))
+
+    # On-demand per-session trace capture (Chrome trace JSON) via /admin/trace.
+    # The admin endpoints are disabled unless ADMIN_TOKEN is set; send it as X-Admin-Token.
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+    TRACE_MAX_SECONDS = float(os.getenv("TRACE_MAX_SECONDS", "60"))
+    TRACE_MAX_EVENTS = int(os.getenv("TRACE_MAX_EVENTS", "200000"))  # per capture; the rest are counted as dropped
+    TRACE_KEEP = int(os.getenv("TRACE_KEEP", "8"))  # finished captures kept for download
+    TRACE_LAG_INTERVAL_MS = float(os.getenv("TRACE_LAG_INTERVAL_MS", "10"))  # loop lag sampling while capturing
+    TRACE_PROFILE_INTERVAL_MS = float(os.getenv("TRACE_PROFILE_INTERVAL_MS", "5"))  # stack sampling (profile=1)
+
     # WebSocket Configuration
-    WS_HEARTBEAT_INTERVAL = 10  # seconds
+    WS_HEARTBEAT_INTERVAL = int(os.getenv("WS_HEARTBEAT_INTERVAL", "10"))  # seconds
+    WS_MAX_MESSAGE_BYTES = int(os.getenv("WS_MAX_MESSAGE_BYTES", str(64 * 1024)))
+    WS_MAX_QUEUE = int(os.getenv("WS_MAX_QUEUE", "32"))
+
+    # Admission control: concurrent /ws/chat sessions per worker (0 = unlimited).
+    # When full, up to SESSION_QUEUE_MAX connections wait SESSION_QUEUE_TIMEOUT_S
+    # for a slot; the rest are closed at once with 1013 (try again later)
+    MAX_SESSIONS_PER_WORKER = int(os.getenv("MAX_SESSIONS_PER_WORKER", "100"))
+    SESSION_QUEUE_MAX = int(os.getenv("SESSION_QUEUE_MAX", "16"))
+    SESSION_QUEUE_TIMEOUT_S = float(os.getenv("SESSION_QUEUE_TIMEOUT_S", "5"))
+    # Close sessions with no mic audio or pings for this long (checked every heartbeat; 0 = never)
+    SESSION_IDLE_TIMEOUT_S = float(os.getenv("SESSION_IDLE_TIMEOUT_S", str(WS_HEARTBEAT_INTERVAL * 3)))
+
+    # Production launcher (python run.py --prod)
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "0"))  # 0 = one per CPU core
+    SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+    # On SIGTERM, how long live conversations may continue before the worker exits
+    DRAIN_TIMEOUT_S = float(os.getenv("DRAIN_TIMEOUT_S", "60"))
 
     # Moderation / System Prompt
     SYSTEM_PROMPT = """
@@ -45,4 +165,9 @@ class Settings:
     - Your goal is to make the user feel invincible.
     """
 
+    def validate(self) -> None:
+        """Fails fast on settings the server can't run without."""
+        if not self.GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY not found in .env file")
+
 settings = Settings()
@@ -0,0 +1,37 @@
+"""Process lifecycle state shared between the launcher and the websocket endpoint."""
+from __future__ import annotations
+
+import logging
+import time
+
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Lifecycle:
+    def __init__(self):
+        self.draining = False
+        self.drain_deadline = 0.0
+
+    def begin_drain(self, timeout: float) -> None:
+        """Stops admitting new sessions; live ones get ``timeout`` seconds to finish."""
+        if self.draining:
+            return
+        self.draining = True
+        self.drain_deadline = time.monotonic() + timeout
+        logger.info(
+            "Draining: refusing new sessions, waiting up to %.0fs for %d live session(s)",
+            timeout,
+            self.active_sessions(),
+        )
+
+    @staticmethod
+    def active_sessions() -> int:
+        return int(metrics.ACTIVE_SESSIONS.value)
+
+    def drained(self) -> bool:
+        return self.draining and (self.active_sessions() <= 0 or time.monotonic() >= self.drain_deadline)
+
+
+lifecycle = Lifecycle()
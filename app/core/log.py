@@ -0,0 +1,258 @@
+"""
+Non-blocking logging, structured output and sampled chunk tracing.
+
+Every record is handed to a bounded queue on the calling thread (the event
+loop, usually) and formatted and written by a single listener thread, so a
+slow terminal or log collector can't stall sessions. When the queue is full
+the record is dropped and counted (``voicebot_log_records_dropped_total``)
+and a warning with the count is logged once there is room again.
+
+Records carry the ``session_id`` bound to the current asyncio task by the
+websocket endpoint; with ``LOG_FORMAT=json`` each record is one JSON object
+per line with it as a field.
+
+``ChunkTracer`` follows 1 in ``LOG_TRACE_SAMPLE_N`` audio chunks through the
+pipeline and logs one line per traced chunk with the time at each stage, so
+latency can be broken down end to end without logging every chunk.
+"""
+from __future__ import annotations
+
+import atexit
+import contextvars
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+_session_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("session_id", default=None)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Attributes every LogRecord has; anything else was passed via ``extra=``.
+_STANDARD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "session_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def bind_session(session_id: str) -> None:
+    """Tags records logged from the current task (and tasks it creates) with ``session_id``."""
+    _session_id.set(session_id)
+
+
+class _SessionFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "session_id"):
+            record.session_id = _session_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "session_id": getattr(record, "session_id", None),
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks: a full queue drops the record and counts it."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._reported = 0
+        self._exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message now (args may change after this returns) but
+        # leave the layout to the listener's formatter.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            metrics.LOG_DROPPED.inc()
+            return
+        if self.dropped != self._reported:
+            missed = self.dropped - self._reported
+            notice = logging.LogRecord(
+                "app.core.log", logging.WARNING, __file__, 0,
+                "Log queue full: dropped %d record(s)", (missed,), None,
+            )
+            try:
+                self.queue.put_nowait(self.prepare(notice))
+                self._reported = self.dropped
+            except queue.Full:
+                pass
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Blocking put: the queue may be full, and the thread is still draining it.
+        self.queue.put(self._sentinel)
+
+
+def setup_logging() -> None:
+    """Routes the root logger (and uvicorn's) through the queue. Safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    log_queue: queue.Queue = queue.Queue(maxsize=max(1, settings.LOG_QUEUE_SIZE))
+    handler = _DroppingQueueHandler(log_queue)
+    handler.addFilter(_SessionFilter())
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(settings.LOG_LEVEL)
+    # uvicorn installs its own blocking stream handlers; send its records through the queue too.
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+    if settings.LOG_TRACE_SAMPLE_N > 0:
+        logging.getLogger(TRACE_LOGGER).setLevel(logging.DEBUG)
+
+    _listener = _Listener(log_queue, output)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Writes out everything still queued and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# --- Sampled chunk tracing -------------------------------------------------
+
+TRACE_LOGGER = "app.trace"
+trace_logger = logging.getLogger(TRACE_LOGGER)
+
+
+class ChunkTrace:
+    __slots__ = ("direction", "seq", "nbytes", "stages")
+
+    def __init__(self, direction: str, seq: int, nbytes: int):
+        self.direction = direction
+        self.seq = seq
+        self.nbytes = nbytes
+        self.stages: List[Tuple[str, float]] = [("in", time.perf_counter())]
+
+    def mark(self, stage: str) -> None:
+        self.stages.append((stage, time.perf_counter()))
+
+
+class ChunkTracer:
+    """
+    Follows 1 in ``every`` chunks per direction ("up" = mic to Gemini, "down" =
+    Gemini to browser) of one session.
+
+    Chunks are bytes objects passed through queues, so a traced chunk is
+    recognised downstream by identity (``follow`` / ``claim``) rather than by
+    wrapping it. At most one trace per direction is in flight; a chunk that
+    was dropped or merged on the way is reported as "lost" when the next one
+    starts.
+    """
+
+    def __init__(self, session_id: str, every: int):
+        self.session_id = session_id
+        self.every = every
+        self._counts: Dict[str, int] = {"up": 0, "down": 0}
+        self._active: Dict[str, ChunkTrace] = {}
+        self._following: Dict[int, Tuple[bytes, ChunkTrace]] = {}
+        self._awaiting_send: Optional[ChunkTrace] = None
+
+    def start(self, direction: str, nbytes: int) -> Optional[ChunkTrace]:
+        count = self._counts[direction] = self._counts[direction] + 1
+        if count % self.every:
+            return None
+        previous = self._active.get(direction)
+        if previous is not None:
+            self.finish(previous, "lost")
+        trace = self._active[direction] = ChunkTrace(direction, count, nbytes)
+        return trace
+
+    def follow(self, trace: ChunkTrace, item: bytes) -> None:
+        """From here on ``trace``'s audio travels as ``item``."""
+        self._following[id(item)] = (item, trace)
+
+    def claim(self, item: bytes) -> Optional[ChunkTrace]:
+        if not self._following:
+            return None
+        entry = self._following.pop(id(item), None)
+        return entry[1] if entry is not None and entry[0] is item else None
+
+    def await_send(self, trace: ChunkTrace) -> None:
+        """The next upstream message carries ``trace``'s audio."""
+        self._awaiting_send = trace
+
+    def sent(self) -> None:
+        trace, self._awaiting_send = self._awaiting_send, None
+        if trace is not None:
+            self.finish(trace, "sent")
+
+    def finish(self, trace: ChunkTrace, outcome: str) -> None:
+        if outcome not in ("lost", "session_closed"):
+            trace.mark(outcome)
+        if self._active.get(trace.direction) is trace:
+            del self._active[trace.direction]
+        for key in [k for k, (_, t) in self._following.items() if t is trace]:
+            del self._following[key]
+        if self._awaiting_send is trace:
+            self._awaiting_send = None
+
+        start = trace.stages[0][1]
+        stages = {name: round((at - start) * 1000, 2) for name, at in trace.stages}
+        trace_logger.debug(
+            "[%s] trace %s#%d (%d bytes) %s: %s",
+            self.session_id,
+            trace.direction,
+            trace.seq,
+            trace.nbytes,
+            outcome,
+            ", ".join(f"{name} +{ms:.1f}ms" for name, ms in stages.items()),
+            extra={"trace": {
+                "direction": trace.direction,
+                "seq": trace.seq,
+                "bytes": trace.nbytes,
+                "outcome": outcome,
+                "stages_ms": stages,
+            }},
+        )
+
+    def close(self) -> None:
+        for trace in list(self._active.values()):
+            self.finish(trace, "session_closed")
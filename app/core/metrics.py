@@ -0,0 +1,248 @@
+"""
+Process-wide metrics in Prometheus text exposition format.
+
+Recording is a few attribute updates (and a bisect for histograms), so the
+instruments are cheap enough to stay on in production. Labelled children are
+created once and should be bound at import time or session start, not per
+chunk.
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import time
+import weakref
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond DSP up to multi-second connects.
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        REGISTRY.append(self)
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._new_child()
+            self._children[key] = child
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> List[Tuple[Tuple[str, ...], "_Metric"]]:
+        if self.labelnames:
+            return list(self._children.items())
+        return [((), self)]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._samples():
+            lines.extend(child._render_child(self.name, self.labelnames, values))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.value = 0.0
+        super().__init__(name, help_text, labelnames)
+
+    def _new_child(self):
+        child = Counter.__new__(Counter)
+        child.value = 0.0
+        return child
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def _render_child(self, name, labelnames, values):
+        return [f"{name}{_format_labels(labelnames, values)} {self.value:g}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def _new_child(self):
+        child = Gauge.__new__(Gauge)
+        child.value = 0.0
+        return child
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self._init_state(buckets)
+        super().__init__(name, help_text, labelnames)
+
+    def _init_state(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def _new_child(self):
+        child = Histogram.__new__(Histogram)
+        child._init_state(self.buckets)
+        return child
+
+    def observe(self, value: float, count: int = 1) -> None:
+        """Records ``count`` observations of ``value``."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += count
+        self.sum += value * count
+
+    def _render_child(self, name, labelnames, values):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            le = _format_labels(labelnames, values, f'le="{bound:g}"')
+            lines.append(f"{name}_bucket{le} {cumulative}")
+        cumulative += self.counts[-1]
+        inf = _format_labels(labelnames, values, 'le="+Inf"')
+        lines.append(f"{name}_bucket{inf} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, values)} {self.sum:g}")
+        lines.append(f"{name}_count{_format_labels(labelnames, values)} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+ACTIVE_SESSIONS = Gauge("voicebot_active_sessions", "Browser sessions currently open")
+SESSIONS_TOTAL = Counter("voicebot_sessions_total", "Browser sessions accepted")
+GEMINI_HANDSHAKE = Histogram("voicebot_gemini_handshake_seconds",
+                             "Gemini connect + setup until setupComplete")
+TIME_TO_FIRST_AUDIO = Histogram("voicebot_time_to_first_audio_seconds",
+                                "Browser connect until the first Gemini audio arrives")
+DSP_CHUNK = Histogram("voicebot_dsp_chunk_seconds", "DSP time per mic chunk")
+DSP_QUEUE_WAIT = Histogram("voicebot_dsp_queue_wait_seconds", "Time a mic chunk waited for a DSP worker")
+DOWNSTREAM_ENCODE = Histogram("voicebot_downstream_encode_seconds", "Codec time per chunk sent to the browser")
+INTERRUPT_TO_SILENCE = Histogram("voicebot_interrupt_to_silence_seconds",
+                                 "Gemini interruption until the client reports playback stopped")
+AUDIO_BYTES = Counter("voicebot_audio_bytes_total", "Audio bytes by leg (client_out after downstream encoding)",
+                      ("direction",))
+AUDIO_MESSAGES = Counter("voicebot_audio_messages_total", "Audio messages by leg", ("direction",))
+GEMINI_POOL_HITS = Counter("voicebot_gemini_pool_hits_total", "Sessions served a pre-warmed Gemini connection")
+GEMINI_POOL_MISSES = Counter("voicebot_gemini_pool_misses_total", "Sessions that had to connect to Gemini inline")
+GEMINI_POOL_SAVED = Counter("voicebot_gemini_pool_saved_seconds_total",
+                            "Handshake time sessions skipped thanks to the pool")
+GEMINI_POOL_READY = Gauge("voicebot_gemini_pool_ready", "Pre-warmed Gemini connections ready to hand out")
+DOWNSTREAM_UNDERRUNS = Counter("voicebot_downstream_underruns_total",
+                               "Mid-turn gaps where the browser ran out of audio to play")
+CLIENT_LEAD = Histogram("voicebot_client_lead_seconds", "Audio buffered in the browser, sampled at each ping")
+RECORDING_DROPPED_BYTES = Counter("voicebot_recording_dropped_bytes_total",
+                                  "Session audio not recorded because the writer fell behind")
+SESSIONS_REJECTED = Counter("voicebot_sessions_rejected_total",
+                            "Sessions turned away by admission control (full, queue_timeout)", ("reason",))
+SESSION_QUEUE_WAIT = Histogram("voicebot_session_queue_wait_seconds", "Time a new session waited for a free slot")
+SESSIONS_REAPED = Counter("voicebot_sessions_reaped_total", "Sessions closed for inactivity")
+GEMINI_RECONNECTS = Counter("voicebot_gemini_reconnects_total",
+                            "Mid-session Gemini reconnects by outcome (resumed, fresh, failed)", ("outcome",))
+GEMINI_RECOVERY = Histogram("voicebot_gemini_recovery_seconds",
+                            "Time from losing the Gemini connection to a working replacement")
+UPSTREAM_GAP_DROPPED_BYTES = Counter("voicebot_upstream_gap_dropped_bytes_total",
+                                     "Mic audio lost because a Gemini reconnect outlasted the gap buffer")
+LOG_DROPPED = Counter("voicebot_log_records_dropped_total", "Log records dropped because the log queue was full")
+EVENT_LOOP_LAG = Histogram("voicebot_event_loop_lag_seconds", "Event loop scheduling delay")
+
+# Directions: client_in (browser mic), gemini_out (to Gemini), gemini_in (from Gemini), client_out (to browser)
+CLIENT_IN_BYTES = AUDIO_BYTES.labels("client_in")
+CLIENT_IN_MESSAGES = AUDIO_MESSAGES.labels("client_in")
+GEMINI_OUT_BYTES = AUDIO_BYTES.labels("gemini_out")
+GEMINI_OUT_MESSAGES = AUDIO_MESSAGES.labels("gemini_out")
+GEMINI_IN_BYTES = AUDIO_BYTES.labels("gemini_in")
+GEMINI_IN_MESSAGES = AUDIO_MESSAGES.labels("gemini_in")
+CLIENT_OUT_BYTES = AUDIO_BYTES.labels("client_out")
+CLIENT_OUT_MESSAGES = AUDIO_MESSAGES.labels("client_out")
+
+# Live per-session queues; depths are aggregated at scrape time.
+_queues: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def register_queue(queue) -> None:
+    _queues.add(queue)
+
+
+def _render_queues() -> List[str]:
+    depth: Dict[str, int] = {}
+    depth_max: Dict[str, int] = {}
+    dropped: Dict[str, int] = {}
+    for queue in list(_queues):
+        depth[queue.name] = depth.get(queue.name, 0) + queue.depth
+        depth_max[queue.name] = max(depth_max.get(queue.name, 0), queue.depth)
+        dropped[queue.name] = dropped.get(queue.name, 0) + queue.dropped
+    lines = [
+        "# HELP voicebot_queue_depth Audio items queued, summed over live sessions",
+        "# TYPE voicebot_queue_depth gauge",
+    ]
+    lines += [f'voicebot_queue_depth{{queue="{n}"}} {v}' for n, v in depth.items()]
+    lines += [
+        "# HELP voicebot_queue_depth_max Deepest single-session queue right now",
+        "# TYPE voicebot_queue_depth_max gauge",
+    ]
+    lines += [f'voicebot_queue_depth_max{{queue="{n}"}} {v}' for n, v in depth_max.items()]
+    lines += [
+        "# HELP voicebot_queue_dropped Audio items dropped by live sessions' queues",
+        "# TYPE voicebot_queue_dropped gauge",
+    ]
+    lines += [f'voicebot_queue_dropped{{queue="{n}"}} {v}' for n, v in dropped.items()]
+    return lines
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(_render_queues())
+    return "\n".join(lines) + "\n"
+
+
+async def _monitor_loop_lag(interval: float) -> None:
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - start - interval))
+
+
+_lag_task: Optional[asyncio.Task] = None
+
+
+def start_loop_lag_monitor(interval: float = 0.25) -> None:
+    global _lag_task
+    if _lag_task is None or _lag_task.done():
+        _lag_task = asyncio.get_running_loop().create_task(_monitor_loop_lag(interval))
+
+
+def stop_loop_lag_monitor() -> None:
+    global _lag_task
+    if _lag_task is not None:
+        _lag_task.cancel()
+        _lag_task = None
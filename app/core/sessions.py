@@ -0,0 +1,232 @@
+"""
+Per-worker admission control and idle-session reaping for /ws/chat.
+
+Each session holds a browser socket, a Gemini socket and a share of the DSP
+pool, so a worker only admits ``MAX_SESSIONS_PER_WORKER`` at a time. When it
+is full, a new connection waits in a short FIFO queue (at most
+``SESSION_QUEUE_MAX`` waiting, each for up to ``SESSION_QUEUE_TIMEOUT_S``) and
+is otherwise turned away straight away, so the load balancer or the client can
+try another worker. A freed slot is handed directly to the oldest waiter.
+
+Sessions report activity (mic audio, pings) through their ``SessionSlot``.
+Every ``WS_HEARTBEAT_INTERVAL`` the reaper closes sessions that have been
+silent for ``SESSION_IDLE_TIMEOUT_S``, e.g. an abandoned tab.
+"""
+from __future__ import annotations
+
+import asyncio
+import collections
+import logging
+import time
+from typing import Awaitable, Callable, Deque, Dict, Optional, Set
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SessionSlot:
+    """One admitted session. ``touch()`` on every sign of life from the client."""
+
+    __slots__ = ("session_id", "admitted_at", "last_activity", "on_idle", "reaped")
+
+    def __init__(self, session_id: str, on_idle: Callable[[], Awaitable[None]]):
+        self.session_id = session_id
+        self.admitted_at = time.monotonic()
+        self.last_activity = self.admitted_at
+        # Closes the session; called once by the reaper
+        self.on_idle = on_idle
+        self.reaped = False
+
+    def touch(self) -> None:
+        self.last_activity = time.monotonic()
+
+
+class SessionManager:
+    def __init__(
+        self,
+        *,
+        max_sessions: int,
+        queue_max: int,
+        queue_timeout: float,
+        idle_timeout: float,
+        reap_interval: float,
+    ):
+        self.max_sessions = max_sessions
+        self.queue_max = queue_max
+        self.queue_timeout = queue_timeout
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+
+        self._active: Dict[str, SessionSlot] = {}
+        self._waiters: Deque[asyncio.Future] = collections.deque()
+        # Slots handed to a waiter that hasn't resumed yet; not free for newcomers
+        self._reserved = 0
+        self._reaper: Optional[asyncio.Task] = None
+        self._closing: Set[asyncio.Task] = set()
+
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.reaped = 0
+
+    @classmethod
+    def from_settings(cls) -> "SessionManager":
+        return cls(
+            max_sessions=settings.MAX_SESSIONS_PER_WORKER,
+            queue_max=settings.SESSION_QUEUE_MAX,
+            queue_timeout=settings.SESSION_QUEUE_TIMEOUT_S,
+            idle_timeout=settings.SESSION_IDLE_TIMEOUT_S,
+            reap_interval=settings.WS_HEARTBEAT_INTERVAL,
+        )
+
+    @property
+    def active(self) -> int:
+        return len(self._active)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _has_room(self) -> bool:
+        return self.max_sessions <= 0 or len(self._active) + self._reserved < self.max_sessions
+
+    def must_wait(self) -> bool:
+        """True if a new session would have to queue (or be rejected) right now."""
+        return not self._has_room() or bool(self._waiters)
+
+    async def admit(self, session_id: str, on_idle: Callable[[], Awaitable[None]]) -> Optional[SessionSlot]:
+        """Returns a slot, or None if the worker is full and the wait queue is full or timed out."""
+        if not self.must_wait():
+            return self._register(session_id, on_idle)
+
+        if len(self._waiters) >= self.queue_max:
+            self._reject(session_id, "full")
+            return None
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        started = time.monotonic()
+        try:
+            # Shielded: on timeout, check whether a slot arrived at the last moment.
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            self._abandon(waiter)  # Client went away while queued
+            raise
+        finally:
+            metrics.SESSION_QUEUE_WAIT.observe(time.monotonic() - started)
+        if not waiter.done():
+            self._abandon(waiter)
+            self._reject(session_id, "queue_timeout")
+            return None
+        self._reserved -= 1
+        return self._register(session_id, on_idle)
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+        if waiter.done() and not waiter.cancelled():
+            # It was handed a slot it won't use: pass it on.
+            self._reserved -= 1
+            self._hand_over()
+        else:
+            waiter.cancel()
+
+    def _register(self, session_id: str, on_idle: Callable[[], Awaitable[None]]) -> SessionSlot:
+        slot = SessionSlot(session_id, on_idle)
+        self._active[session_id] = slot
+        self.admitted += 1
+        return slot
+
+    def _reject(self, session_id: str, reason: str) -> None:
+        self.rejected += 1
+        metrics.SESSIONS_REJECTED.labels(reason).inc()
+        logger.warning(
+            "[%s] Session rejected (%s): %d/%d active, %d waiting",
+            session_id, reason, len(self._active), self.max_sessions, len(self._waiters),
+        )
+
+    def release(self, slot: SessionSlot) -> None:
+        if self._active.pop(slot.session_id, None) is None:
+            return
+        self._hand_over()
+
+    def _hand_over(self) -> None:
+        # Freed capacity goes to the oldest connection still waiting.
+        while self._waiters and self._has_room():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._reserved += 1
+                waiter.set_result(None)
+
+    # --- Idle reaping ------------------------------------------------------
+
+    def start(self) -> None:
+        if self.idle_timeout > 0 and self._reaper is None:
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_loop())
+        logger.info(
+            "Session manager started (max %s per worker, queue %d for %.0fs, idle timeout %s)",
+            self.max_sessions or "unlimited",
+            self.queue_max,
+            self.queue_timeout,
+            f"{self.idle_timeout:.0f}s" if self.idle_timeout > 0 else "off",
+        )
+
+    async def stop(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+        for task in list(self._closing):
+            task.cancel()
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+    async def _reap_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            await self.reap_idle()
+
+    async def reap_idle(self) -> int:
+        deadline = time.monotonic() - self.idle_timeout
+        idle = [slot for slot in self._active.values() if slot.last_activity < deadline and not slot.reaped]
+        for slot in idle:
+            slot.reaped = True
+            self.reaped += 1
+            metrics.SESSIONS_REAPED.inc()
+            logger.info(
+                "[%s] Reaping idle session (no mic audio or pings for %.0fs)",
+                slot.session_id, time.monotonic() - slot.last_activity,
+            )
+            # Each close runs on its own: one peer that never completes the close
+            # handshake must not hold up reaping the others.
+            task = asyncio.ensure_future(self._close_idle(slot))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+        return len(idle)
+
+    async def _close_idle(self, slot: SessionSlot) -> None:
+        try:
+            await slot.on_idle()
+        except Exception as e:
+            logger.warning("[%s] Closing idle session failed: %s", slot.session_id, e)
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._active),
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "reaped": self.reaped,
+        }
+
+
+session_manager = SessionManager.from_settings()
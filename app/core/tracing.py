@@ -0,0 +1,282 @@
+"""
+On-demand trace capture for one session, exported as Chrome trace-event JSON.
+
+Every session registers a ``TraceHandle``. Its ``active`` attribute is None
+unless an admin has started a capture for that session, so instrumented code
+pays one attribute check per chunk when tracing is off:
+
+    trace = handle.active
+    if trace is not None:
+        trace.span("client_rx", "resample", started, time.perf_counter())
+
+While at least one capture is running, an event-loop lag sampler adds a
+``loop_lag_ms`` counter track to it, and a capture started with
+``profile=True`` also gets stack samples of the event-loop thread from a
+statistical profiler. Both are per process, so they show what every session
+on the worker was doing, not just the traced one. Finished captures are kept
+(the most recent ``TRACE_KEEP``) so they can be downloaded after the session
+has ended.
+
+Open the export in chrome://tracing or https://ui.perfetto.dev.
+"""
+from __future__ import annotations
+
+import asyncio
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SessionTrace:
+    """Spans, counters and stack samples recorded for one session (times from ``time.perf_counter``)."""
+
+    def __init__(self, session_id: str, seconds: float, max_events: int, profile: bool):
+        self.session_id = session_id
+        self.seconds = seconds
+        self.max_events = max_events
+        self.profile = profile
+        self.t0 = time.perf_counter()
+        self.started_wall = time.time()
+        self.finished_at: Optional[float] = None
+        self.dropped = 0
+
+        self.events: List[Dict[str, Any]] = []
+        self._lanes: Dict[str, int] = {}
+        # Profiler: stack frame id per (parent id, frame name), and samples referencing them
+        self._frames: Dict[Tuple[int, str], int] = {}
+        self._samples: List[Tuple[float, int]] = []
+
+    def _us(self, at: float) -> float:
+        return round((at - self.t0) * 1e6, 1)
+
+    def _lane(self, name: str) -> int:
+        tid = self._lanes.get(name)
+        if tid is None:
+            tid = self._lanes[name] = len(self._lanes) + 1
+        return tid
+
+    def _add(self, event: Dict[str, Any]) -> None:
+        if len(self.events) >= self.max_events:
+            self.dropped += 1
+            return
+        self.events.append(event)
+
+    def span(self, lane: str, name: str, start: float, end: float, **args: Any) -> None:
+        event = {"ph": "X", "name": name, "tid": self._lane(lane), "ts": self._us(start), "dur": round((end - start) * 1e6, 1)}
+        if args:
+            event["args"] = args
+        self._add(event)
+
+    def instant(self, lane: str, name: str, at: float, **args: Any) -> None:
+        event = {"ph": "i", "s": "t", "name": name, "tid": self._lane(lane), "ts": self._us(at)}
+        if args:
+            event["args"] = args
+        self._add(event)
+
+    def counter(self, name: str, at: float, **values: float) -> None:
+        self._add({"ph": "C", "name": name, "tid": 0, "ts": self._us(at), "args": values})
+
+    def stack_sample(self, at: float, stack: List[str]) -> None:
+        """``stack`` is outermost first."""
+        if len(self._samples) >= self.max_events:
+            self.dropped += 1
+            return
+        parent = 0
+        for name in stack:
+            key = (parent, name)
+            frame = self._frames.get(key)
+            if frame is None:
+                frame = self._frames[key] = len(self._frames) + 1
+            parent = frame
+        self._samples.append((at, parent))
+
+    def export(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        metadata = [
+            {"ph": "M", "name": "process_name", "pid": pid, "tid": 0, "args": {"name": f"session {self.session_id} (pid {pid})"}},
+            {"ph": "M", "name": "thread_name", "pid": pid, "tid": 0, "args": {"name": "event_loop"}},
+        ]
+        for lane, tid in self._lanes.items():
+            metadata.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": lane}})
+        events = [dict(event, pid=pid) for event in self.events]
+
+        stack_frames = {}
+        for (parent, name), frame in self._frames.items():
+            entry = {"name": name, "category": "python"}
+            if parent:
+                entry["parent"] = str(parent)
+            stack_frames[str(frame)] = entry
+        samples = [
+            {"name": "cpu", "pid": pid, "tid": 0, "ts": self._us(at), "sf": str(frame), "weight": 1}
+            for at, frame in self._samples
+        ]
+        return {
+            "traceEvents": metadata + events,
+            "stackFrames": stack_frames,
+            "samples": samples,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "session_id": self.session_id,
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_wall)),
+                "seconds": round((self.finished_at or time.perf_counter()) - self.t0, 3),
+                "dropped_events": self.dropped,
+                "profiled": self.profile,
+            },
+        }
+
+
+class TraceHandle:
+    """Per-session hook; ``active`` is the running capture or None."""
+
+    __slots__ = ("session_id", "active")
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.active: Optional[SessionTrace] = None
+
+
+class _StackSampler(threading.Thread):
+    """Statistical profiler: samples the event-loop thread's Python stack every ``interval`` seconds."""
+
+    def __init__(self, registry: "TraceRegistry", target_thread: int, interval: float):
+        super().__init__(name="trace-profiler", daemon=True)
+        self.registry = registry
+        self.target_thread = target_thread
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            stack.reverse()
+            at = time.perf_counter()
+            # Appends to lists only; safe next to the event loop under the GIL.
+            for trace in self.registry.profiled():
+                trace.stack_sample(at, stack)
+
+
+class TraceRegistry:
+    def __init__(self, *, max_events: int, keep: int, lag_interval: float, profile_interval: float):
+        self.max_events = max_events
+        self.lag_interval = lag_interval
+        self.profile_interval = profile_interval
+        self._handles: Dict[str, TraceHandle] = {}
+        self._finished: "collections.OrderedDict[str, SessionTrace]" = collections.OrderedDict()
+        self._keep = keep
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._lag_task: Optional[asyncio.Task] = None
+        self._profiler: Optional[_StackSampler] = None
+
+    @classmethod
+    def from_settings(cls) -> "TraceRegistry":
+        return cls(
+            max_events=settings.TRACE_MAX_EVENTS,
+            keep=settings.TRACE_KEEP,
+            lag_interval=settings.TRACE_LAG_INTERVAL_MS / 1000,
+            profile_interval=settings.TRACE_PROFILE_INTERVAL_MS / 1000,
+        )
+
+    # --- Session side ------------------------------------------------------
+
+    def register(self, session_id: str) -> TraceHandle:
+        handle = self._handles[session_id] = TraceHandle(session_id)
+        return handle
+
+    def unregister(self, handle: TraceHandle) -> None:
+        if handle.active is not None:
+            self.stop(handle.session_id)
+        self._handles.pop(handle.session_id, None)
+
+    # --- Admin side --------------------------------------------------------
+
+    def sessions(self) -> List[str]:
+        return list(self._handles)
+
+    def tracing(self) -> List[str]:
+        return [sid for sid, handle in self._handles.items() if handle.active is not None]
+
+    def finished(self) -> List[str]:
+        return list(self._finished)
+
+    def profiled(self) -> List[SessionTrace]:
+        return [h.active for h in list(self._handles.values()) if h.active is not None and h.active.profile]
+
+    def start(self, session_id: str, seconds: float, profile: bool = False) -> SessionTrace:
+        """Starts (or restarts) a capture; raises KeyError if the session isn't on this worker."""
+        handle = self._handles[session_id]
+        if handle.active is not None:
+            self.stop(session_id)
+        seconds = min(max(0.1, seconds), settings.TRACE_MAX_SECONDS)
+        trace = handle.active = SessionTrace(session_id, seconds, self.max_events, profile)
+        loop = asyncio.get_running_loop()
+        self._timers[session_id] = loop.call_later(seconds, self.stop, session_id)
+        if self._lag_task is None or self._lag_task.done():
+            self._lag_task = loop.create_task(self._sample_loop_lag())
+        if profile and self._profiler is None:
+            self._profiler = _StackSampler(self, threading.get_ident(), self.profile_interval)
+            self._profiler.start()
+        logger.info("[%s] Trace capture started (%.0fs%s)", session_id, seconds, ", profiling" if profile else "")
+        return trace
+
+    def stop(self, session_id: str) -> Optional[SessionTrace]:
+        handle = self._handles.get(session_id)
+        trace = handle.active if handle is not None else None
+        timer = self._timers.pop(session_id, None)
+        if timer is not None:
+            timer.cancel()
+        if trace is None:
+            return self._finished.get(session_id)
+        handle.active = None
+        trace.finished_at = time.perf_counter()
+        self._finished[session_id] = trace
+        self._finished.move_to_end(session_id)
+        while len(self._finished) > self._keep:
+            self._finished.popitem(last=False)
+        logger.info("[%s] Trace capture finished (%d events, %d dropped)", session_id, len(trace.events), trace.dropped)
+
+        if not self.tracing() and self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._profiler is not None and not self.profiled():
+            self._profiler.stopped.set()
+            self._profiler = None
+        return trace
+
+    def get(self, session_id: str) -> Optional[SessionTrace]:
+        handle = self._handles.get(session_id)
+        if handle is not None and handle.active is not None:
+            return handle.active
+        return self._finished.get(session_id)
+
+    async def _sample_loop_lag(self) -> None:
+        # Finer-grained than the metrics monitor, and only while someone is tracing.
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.lag_interval)
+            now = time.perf_counter()
+            lag_ms = max(0.0, now - start - self.lag_interval) * 1000
+            for handle in list(self._handles.values()):
+                if handle.active is not None:
+                    handle.active.counter("loop_lag_ms", now, lag=round(lag_ms, 3))
+
+    async def shutdown(self) -> None:
+        for session_id in self.tracing():
+            self.stop(session_id)
+
+
+trace_registry = TraceRegistry.from_settings()
@@ -0,0 +1,177 @@
+"""
+Production launcher: N uvicorn workers sharing one listening socket, uvloop
+and httptools when installed, websocket limits tuned for small PCM frames,
+and a graceful drain of live conversations on SIGTERM.
+"""
+from __future__ import annotations
+
+import inspect
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from typing import List, Optional
+
+import uvicorn
+
+from app.core.config import settings
+from app.core.lifecycle import lifecycle
+
+logger = logging.getLogger("app.launcher")
+
+
+def _available(module: str) -> bool:
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+
+class DrainingServer(uvicorn.Server):
+    """
+    uvicorn server that drains before shutting down.
+
+    The first SIGTERM/SIGINT stops new /ws/chat sessions and lets live ones
+    finish; the server exits once they have all closed or the drain deadline
+    passes, at which point uvicorn closes whatever is left. A second signal
+    exits immediately.
+
+    A ``supervised`` worker ignores SIGINT: Ctrl+C in a terminal reaches the
+    whole process group, and the supervisor already forwards one SIGTERM, so
+    a worker acting on both would skip its drain.
+    """
+
+    def __init__(self, config: uvicorn.Config, drain_timeout: float, *, supervised: bool = False):
+        super().__init__(config)
+        self.drain_timeout = drain_timeout
+        self.supervised = supervised
+
+    def handle_exit(self, sig, frame) -> None:
+        if self.supervised and sig == signal.SIGINT:
+            return
+        if lifecycle.draining or self.drain_timeout <= 0:
+            super().handle_exit(sig, frame)
+            return
+        lifecycle.begin_drain(self.drain_timeout)
+
+    async def on_tick(self, counter: int) -> bool:
+        if lifecycle.drained() and not self.should_exit:
+            logger.info("Drain complete (%d session(s) still open), shutting down", lifecycle.active_sessions())
+            self.should_exit = True
+        return await super().on_tick(counter)
+
+
+def build_config(host: str, port: int, workers: int) -> uvicorn.Config:
+    options = dict(
+        host=host,
+        port=port,
+        workers=workers,
+        loop="uvloop" if _available("uvloop") else "asyncio",
+        http="httptools" if _available("httptools") else "h11",
+        ws="websockets",
+        # Mic frames are ~1KB and control messages are tiny; cap inbound frames and
+        # the per-connection backlog so a misbehaving client can't balloon memory.
+        ws_max_size=settings.WS_MAX_MESSAGE_BYTES,
+        ws_max_queue=settings.WS_MAX_QUEUE,
+        # Compressing PCM costs CPU for almost no gain.
+        ws_per_message_deflate=False,
+        ws_ping_interval=settings.WS_HEARTBEAT_INTERVAL,
+        ws_ping_timeout=settings.WS_HEARTBEAT_INTERVAL * 2,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=5,
+        reload=False,
+        access_log=False,
+    )
+    # Older uvicorn releases lack some knobs (e.g. ws_max_queue); drop what isn't supported.
+    supported = inspect.signature(uvicorn.Config).parameters
+    return uvicorn.Config("app.main:app", **{k: v for k, v in options.items() if k in supported})
+
+
+def _report(config: uvicorn.Config, drain_timeout: float) -> None:
+    print("----------------------------------------------------------------")
+    print("   Motivational Voice ChatBot - production mode                 ")
+    print("----------------------------------------------------------------")
+    print(f" * Listen:         http://{config.host}:{config.port}")
+    print(f" * Workers:        {config.workers} (cpu_count={os.cpu_count()})")
+    print(f" * Event loop:     {config.loop}" + ("" if config.loop == "uvloop" else " (install uvloop for more throughput)"))
+    print(f" * HTTP parser:    {config.http}" + ("" if config.http == "httptools" else " (install httptools for more throughput)"))
+    print(f" * WebSocket:      {config.ws}, max frame {config.ws_max_size} B, "
+          f"queue {getattr(config, 'ws_max_queue', 'n/a')}, deflate off, ping {config.ws_ping_interval}s")
+    print(f" * Backlog:        {config.backlog}")
+    print(f" * DSP executor:   {settings.DSP_EXECUTOR} x{settings.DSP_WORKERS} per worker")
+    print(f" * Gemini pool:    {settings.GEMINI_POOL_SIZE} per worker")
+    print(f" * Drain timeout:  {drain_timeout:.0f}s on SIGTERM")
+    print("----------------------------------------------------------------")
+    sys.stdout.flush()
+
+
+def _run_worker(config: uvicorn.Config, sockets, drain_timeout: float) -> None:
+    config.configure_logging()
+    DrainingServer(config, drain_timeout, supervised=True).run(sockets=sockets)
+
+
+def serve(host: str = "0.0.0.0", port: int = 8000, workers: Optional[int] = None,
+          drain_timeout: Optional[float] = None) -> None:
+    workers = workers or settings.SERVER_WORKERS or os.cpu_count() or 1
+    drain_timeout = settings.DRAIN_TIMEOUT_S if drain_timeout is None else drain_timeout
+    try:
+        settings.validate()
+    except ValueError as e:
+        # Before spawning workers, so a bad config fails once instead of per worker.
+        print(f"Configuration error: {e}", file=sys.stderr)
+        sys.exit(1)
+    config = build_config(host, port, workers)
+    _report(config, drain_timeout)
+
+    if workers == 1:
+        DrainingServer(config, drain_timeout).run()
+        return
+
+    sock = config.bind_socket()
+    ctx = multiprocessing.get_context("spawn")
+
+    def start_worker() -> multiprocessing.Process:
+        process = ctx.Process(target=_run_worker, args=(config, [sock], drain_timeout))
+        process.start()
+        return process
+
+    processes: List[multiprocessing.Process] = [start_worker() for _ in range(workers)]
+    stopping = False
+
+    def on_signal(sig, frame) -> None:
+        nonlocal stopping
+        if stopping:
+            # Second signal: stop waiting for the drain.
+            for process in processes:
+                if process.is_alive():
+                    process.kill()
+            return
+        stopping = True
+        logger.info("Received %s, draining %d worker(s)", signal.Signals(sig).name, len(processes))
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    try:
+        while not stopping:
+            for i, process in enumerate(processes):
+                if not process.is_alive() and not stopping:
+                    logger.warning("Worker %s exited (code %s), restarting", process.pid, process.exitcode)
+                    processes[i] = start_worker()
+            time.sleep(0.5)
+
+        # Workers exit on their own once drained; give them the deadline plus a grace period.
+        deadline = time.monotonic() + drain_timeout + 10
+        for process in processes:
+            process.join(timeout=max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+    finally:
+        sock.close()
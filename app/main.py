@@ -1,19 +1,21 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from app.api import websocket
+from fastapi.responses import FileResponse, PlainTextResponse
+from app.api import admin, websocket
+from app.core import metrics
+from app.core.config import settings
+from app.core.log import setup_logging
+from app.core.sessions import session_manager
+from app.core.tracing import trace_registry
+from app.services.dsp_executor import dsp_executor
+from app.services.gemini_pool import gemini_pool
+from app.services.recorder import recording_writer
+import asyncio
 import os
 import logging
-import sys
 
-# Configure Logging to display in Terminal
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Log to the terminal through a background thread (LOG_FORMAT=json for collectors)
+setup_logging()
 
 logger = logging.getLogger("app.main")
 logger.info("Starting Application...")
@@ -22,6 +24,8 @@ app = FastAPI(title="Gemini Voice ChatBot", version="1.0.0")
 
 # Include Websocket Router
 app.include_router(websocket.router)
+# Trace capture for live sessions; 404 unless ADMIN_TOKEN is set
+app.include_router(admin.router)
 
 # Serve static files (if we want a basic UI)
 # We will create a 'static' directory
@@ -31,6 +35,35 @@ if not os.path.exists(static_dir):
 
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
+@app.on_event("startup")
+async def start_background_work():
+    settings.validate()
+    metrics.start_loop_lag_monitor()
+    session_manager.start()
+    gemini_pool.start()
+    # Load numpy and build the DSP filters/tables off the loop, so the worker
+    # accepts connections right away and the first session doesn't pay for it.
+    asyncio.get_running_loop().run_in_executor(None, _warm_up_dsp)
+
+def _warm_up_dsp():
+    from app.services import audio_utils
+    audio_utils.warm_up(settings.GEMINI_SAMPLE_RATE, (settings.CLIENT_SAMPLE_RATE, 44100, 16000))
+    logger.info("DSP warm-up done")
+
+@app.on_event("shutdown")
+async def stop_background_work():
+    metrics.stop_loop_lag_monitor()
+    await session_manager.stop()
+    await trace_registry.shutdown()
+    await gemini_pool.stop()
+    dsp_executor.shutdown()
+    # Finish queued recordings and patch their WAV headers
+    await asyncio.to_thread(recording_writer.stop)
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def get():
     return FileResponse(os.path.join(static_dir, 'index.html'))
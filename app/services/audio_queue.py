@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import logging
+from typing import Any, Deque, List, Optional
+
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AudioQueue:
+    """
+    Bounded hand-off between two legs of a session's audio pipeline.
+
+    Audio items are ``bytes``; anything else is a control item that is never
+    dropped or merged and does not count towards the limits. When the queue is
+    full the overflow policy decides what happens to a new audio item:
+
+    - ``drop_oldest``: discard the oldest queued audio (keeps latency bounded).
+    - ``coalesce``: append to the newest queued audio item (fewer, larger
+      frames); once ``max_bytes`` is reached, ``put`` waits for the consumer.
+    - ``block``: ``put`` waits for the consumer.
+
+    Crossing the high watermark (3/4 full) and draining back below the low
+    watermark (1/4 full) are logged and counted.
+    """
+
+    POLICIES = ("drop_oldest", "coalesce", "block")
+
+    def __init__(self, name: str, *, maxsize: int, policy: str, max_bytes: int = 0, session_id: str = ""):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unsupported overflow policy: {policy}")
+        self.name = name
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.max_bytes = max_bytes
+        self.session_id = session_id
+
+        self.high_watermark = max(1, self.maxsize * 3 // 4)
+        self.low_watermark = self.maxsize // 4
+
+        self._items: Deque[Any] = collections.deque()
+        self._audio_items = 0
+        self._bytes = 0
+        # Coalescing grows this buffer in place (it's the newest item) instead of
+        # copying the whole item per merge; it's turned back into bytes on the way out.
+        self._merging: Optional[bytearray] = None
+        self._not_empty = asyncio.Event()
+        self._has_space = asyncio.Event()
+        self._has_space.set()
+        self._above_high = False
+
+        self.max_depth = 0
+        self.dropped = 0
+        self.dropped_bytes = 0
+        self.coalesced = 0
+        self.high_events = 0
+        metrics.register_queue(self)
+
+    def __len__(self) -> int:
+        """Items queued, control items included."""
+        return len(self._items)
+
+    @property
+    def depth(self) -> int:
+        return self._audio_items
+
+    @property
+    def depth_bytes(self) -> int:
+        return self._bytes
+
+    def _full(self) -> bool:
+        if self._audio_items >= self.maxsize:
+            return True
+        return self.max_bytes > 0 and self._bytes >= self.max_bytes
+
+    async def put(self, item: Any) -> None:
+        while not self.try_put(item):
+            self._has_space.clear()
+            await self._has_space.wait()
+
+    def try_put(self, item: Any) -> bool:
+        """Queues ``item`` unless ``put`` would have to wait; returns whether it was queued."""
+        if not isinstance(item, (bytes, bytearray)):
+            self._append(item)
+            return True
+
+        if self._full():
+            if self.policy == "drop_oldest":
+                self._drop_oldest_audio()
+            elif self.policy == "coalesce" and self._audio_items >= self.maxsize and (
+                self.max_bytes <= 0 or self._bytes < self.max_bytes
+            ) and isinstance(self._items[-1], (bytes, bytearray)):
+                if self._items[-1] is not self._merging:
+                    self._merging = bytearray(self._items[-1])
+                    self._items[-1] = self._merging
+                self._merging.extend(item)
+                self._bytes += len(item)
+                self.coalesced += 1
+                self._update_space()
+                return True
+            else:
+                return False
+
+        self._append(item)
+        return True
+
+    def put_front(self, item: Any) -> None:
+        """Queues a control item ahead of everything else."""
+        self._items.appendleft(item)
+        self._not_empty.set()
+
+    def _append(self, item: Any) -> None:
+        self._items.append(item)
+        if isinstance(item, (bytes, bytearray)):
+            self._audio_items += 1
+            self._bytes += len(item)
+            if self._audio_items > self.max_depth:
+                self.max_depth = self._audio_items
+            if not self._above_high and self._audio_items >= self.high_watermark:
+                self._above_high = True
+                self.high_events += 1
+                logger.warning(
+                    "[%s] %s queue above high watermark (%d items / %d bytes)",
+                    self.session_id, self.name, self._audio_items, self._bytes,
+                )
+            self._update_space()
+        self._not_empty.set()
+
+    def _drop_oldest_audio(self) -> None:
+        for i, queued in enumerate(self._items):
+            if isinstance(queued, (bytes, bytearray)):
+                del self._items[i]
+                self._audio_items -= 1
+                self._bytes -= len(queued)
+                self.dropped += 1
+                self.dropped_bytes += len(queued)
+                return
+
+    def _update_space(self) -> None:
+        if self._full():
+            self._has_space.clear()
+        else:
+            self._has_space.set()
+
+    async def get(self) -> Any:
+        while not self._items:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        return self.get_nowait()
+
+    def peek(self) -> Any:
+        """The item ``get`` would return next (IndexError if empty)."""
+        if self._items[0] is self._merging:
+            self._items[0] = bytes(self._merging)
+            self._merging = None
+        return self._items[0]
+
+    def get_nowait(self) -> Any:
+        """Removes and returns the next item (IndexError if empty)."""
+        item = self._items.popleft()
+        if item is self._merging:
+            item = bytes(item)
+            self._merging = None
+        if isinstance(item, (bytes, bytearray)):
+            self._audio_items -= 1
+            self._bytes -= len(item)
+            if self._above_high and self._audio_items <= self.low_watermark:
+                self._above_high = False
+                logger.info("[%s] %s queue drained below low watermark", self.session_id, self.name)
+            self._update_space()
+        return item
+
+    def clear_audio(self) -> int:
+        """Drops all queued audio (keeps control items). Returns bytes dropped."""
+        dropped = self._bytes
+        self.dropped += self._audio_items
+        self.dropped_bytes += dropped
+        self._items = collections.deque(i for i in self._items if not isinstance(i, (bytes, bytearray)))
+        self._merging = None
+        self._audio_items = 0
+        self._bytes = 0
+        self._above_high = False
+        self._update_space()
+        return dropped
+
+    def stats(self) -> dict:
+        return {
+            "depth": self._audio_items,
+            "depth_bytes": self._bytes,
+            "max_depth": self.max_depth,
+            "dropped": self.dropped,
+            "dropped_bytes": self.dropped_bytes,
+            "coalesced": self.coalesced,
+            "high_events": self.high_events,
+        }
+
+
+class AudioRingBuffer:
+    """
+    Fixed-size holding area for audio that can't be sent yet (e.g. while the
+    upstream connection is being re-established).
+
+    Holds at most ``max_bytes``; writing past that discards the oldest audio,
+    so what is replayed later is the most recent stretch. Not awaitable: the
+    producer never waits on it.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._chunks: Deque[bytes] = collections.deque()
+        self._bytes = 0
+
+        self.buffered_bytes = 0
+        self.dropped_bytes = 0
+
+    def __len__(self) -> int:
+        return self._bytes
+
+    def write(self, pcm: bytes) -> None:
+        self._chunks.append(pcm)
+        self._bytes += len(pcm)
+        self.buffered_bytes += len(pcm)
+        while self._bytes > self.max_bytes and self._chunks:
+            oldest = self._chunks.popleft()
+            self._bytes -= len(oldest)
+            self.dropped_bytes += len(oldest)
+
+    def write_front(self, pcm: bytes) -> None:
+        """Puts back audio older than anything buffered (dropped if there's no room)."""
+        self.buffered_bytes += len(pcm)
+        if self._bytes + len(pcm) > self.max_bytes:
+            self.dropped_bytes += len(pcm)
+            return
+        self._chunks.appendleft(pcm)
+        self._bytes += len(pcm)
+
+    def unpop(self, pcm: bytes) -> None:
+        """Returns audio just taken with ``pop`` (it didn't go out after all)."""
+        self._chunks.appendleft(pcm)
+        self._bytes += len(pcm)
+
+    def pop(self, max_bytes: int) -> bytes:
+        """Removes and returns up to ``max_bytes`` of the oldest audio (at least one chunk)."""
+        parts: List[bytes] = []
+        size = 0
+        while self._chunks and (not parts or size + len(self._chunks[0]) <= max_bytes):
+            chunk = self._chunks.popleft()
+            parts.append(chunk)
+            size += len(chunk)
+        self._bytes -= size
+        return parts[0] if len(parts) == 1 else b"".join(parts)
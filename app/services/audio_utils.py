@@ -1,14 +1,222 @@
+import collections
+import functools
+import struct
+from typing import List, Optional, Tuple, Union
+
 import numpy as np
-from scipy import signal
 
-class AudioProcessor:
+
+def _firwin_kaiser(numtaps: int, cutoff: float, beta: float) -> np.ndarray:
+    """
+    Windowed-sinc lowpass, normalised to unit DC gain.
+
+    Same taps as ``scipy.signal.firwin(numtaps, cutoff, window=("kaiser", beta))``
+    (cutoff relative to Nyquist), without importing scipy, which would add about
+    a second to every worker's cold start.
+    """
+    m = np.arange(numtaps) - (numtaps - 1) / 2.0
+    taps = cutoff * np.sinc(cutoff * m) * np.kaiser(numtaps, beta)
+    return taps / taps.sum()
+
+
+@functools.lru_cache(maxsize=32)
+def _design_filter(up: int, down: int) -> np.ndarray:
+    """
+    Designs (and caches, process-wide) the anti-aliasing FIR for an up/down ratio.
+
+    Uses the same Kaiser-windowed design as ``scipy.signal.resample_poly`` so the
+    streaming output matches the one-shot resampler's frequency response.
+    """
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    taps = _firwin_kaiser(2 * half_len + 1, 1.0 / max_rate, 5.0) * up
+    taps = taps.astype(np.float32)
+    taps.setflags(write=False)
+    return taps
+
+
+class StreamingResampler:
+    """
+    Stateful polyphase resampler for a continuous stream of PCM chunks.
+
+    Keeps the filter history between calls so chunk edges are filtered exactly as
+    if the stream had been resampled in one go (no boundary clicks). Filter taps
+    are shared across sessions via ``_design_filter``. The common 2:1 case
+    (48k -> 24k) takes a halfband path that skips the zero taps.
+    """
+
     def __init__(self, input_rate: int, output_rate: int):
+        gcd = int(np.gcd(input_rate, output_rate))
         self.input_rate = input_rate
         self.output_rate = output_rate
+        self.up = output_rate // gcd
+        self.down = input_rate // gcd
+
+        taps = _design_filter(self.up, self.down)
+        self._halfband = self.up == 1 and self.down == 2
+        if self._halfband:
+            self._taps = taps
+            self._history = len(taps) - 1
+            centre = self._history // 2
+            # Halfband: every even offset from the centre is zero, keep only odd pairs.
+            self._center_tap = float(taps[centre])
+            self._pairs = [(centre - d, centre + d, float(taps[centre + d])) for d in range(1, centre + 1, 2)]
+        else:
+            phase_len = -(-len(taps) // self.up)
+            padded = np.zeros(self.up * phase_len, dtype=np.float32)
+            padded[: len(taps)] = taps
+            # _phases[p, j] = h[p + j*up]; reversed over j so a forward window dot works.
+            self._phases = np.ascontiguousarray(padded.reshape(phase_len, self.up).T[:, ::-1])
+            self._history = phase_len - 1
+            self._window = np.arange(-self._history, 1)
+            # (start phase, chunk length) -> gather plan; fixed-size chunks hit one or two entries.
+            self._plans = {}
+
+        self._buf = np.zeros(self._history, dtype=np.float32)
+        self._phase = 0
+
+    def __getstate__(self):
+        # Gather plans are rebuilt on demand; don't ship them to worker processes.
+        state = self.__dict__.copy()
+        if "_plans" in state:
+            state["_plans"] = {}
+        return state
+
+    def reset(self) -> None:
+        """Clears the filter history (e.g. after a stream discontinuity)."""
+        self._buf[: self._history] = 0.0
+        self._phase = 0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Resamples the next chunk of the stream.
+
+        Args:
+            samples: 1-D array of int16-scaled samples (any real dtype).
+
+        Returns:
+            Resampled int16 samples. Output is delayed by half the filter length.
+        """
+        n_in = len(samples)
+        if n_in == 0:
+            return np.empty(0, dtype=np.int16)
+
+        h = self._history
+        if len(self._buf) != h + n_in:
+            buf = np.empty(h + n_in, dtype=np.float32)
+            buf[:h] = self._buf[:h]
+            self._buf = buf
+        buf = self._buf
+        buf[h:] = samples
+
+        if self._halfband:
+            out = self._process_halfband(buf, n_in)
+        else:
+            out = self._process_polyphase(buf, n_in)
+
+        # Carry the filter history into the next chunk.
+        buf[:h] = buf[n_in:]
+
+        np.clip(out, -32768, 32767, out=out)
+        return out.astype(np.int16)
+
+    def _process_halfband(self, buf: np.ndarray, n_in: int) -> np.ndarray:
+        start = self._phase
+        n_out = max(0, (n_in - start + 1) // 2)
+        self._phase = start + 2 * n_out - n_in
+        return self._halfband_kernel(buf, start, n_out)
+
+    def _halfband_kernel(self, buf: np.ndarray, start: int, n_out: int) -> np.ndarray:
+        # Works on the last axis so stacked (sessions, samples) buffers share one pass.
+        if n_out == 0:
+            return np.empty(buf.shape[:-1] + (0,), dtype=np.float32)
+
+        stop = start + 2 * n_out
+        centre = self._history // 2
+        out = buf[..., start + centre : stop + centre : 2] * self._center_tap
+        pair = np.empty_like(out)
+        for lo, hi, tap in self._pairs:
+            np.add(buf[..., start + lo : stop + lo : 2], buf[..., start + hi : stop + hi : 2], out=pair)
+            pair *= tap
+            out += pair
+        return out
+
+    @staticmethod
+    def process_stacked(resamplers: List["StreamingResampler"], chunks: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Resamples one chunk for each of several halfband streams in a single pass.
+
+        All resamplers must be halfband, share the same phase, and all chunks must
+        have the same length (see ``can_stack``). Each stream's history is updated
+        exactly as ``process`` would.
+        """
+        first = resamplers[0]
+        h = first._history
+        n_in = len(chunks[0])
+        stacked = np.empty((len(resamplers), h + n_in), dtype=np.float32)
+        for row, resampler, chunk in zip(stacked, resamplers, chunks):
+            row[:h] = resampler._buf[:h]
+            row[h:] = chunk
+
+        start = first._phase
+        n_out = max(0, (n_in - start + 1) // 2)
+        out = first._halfband_kernel(stacked, start, n_out)
+        next_phase = start + 2 * n_out - n_in
+        for row, resampler in zip(stacked, resamplers):
+            resampler._buf[:h] = row[n_in:]
+            resampler._phase = next_phase
+
+        np.clip(out, -32768, 32767, out=out)
+        return list(out.astype(np.int16))
+
+    def can_stack(self) -> bool:
+        return self._halfband
+
+    @property
+    def phase(self) -> int:
+        return self._phase
+
+    def _process_polyphase(self, buf: np.ndarray, n_in: int) -> np.ndarray:
+        up, down = self.up, self.down
+        start = self._phase
+        n_out = max(0, -(-(n_in * up - start) // down))
+        self._phase = start + n_out * down - n_in * up
+        if n_out == 0:
+            return np.empty(0, dtype=np.float32)
+
+        plan = self._plans.get((start, n_in))
+        if plan is None:
+            if len(self._plans) >= 8:
+                self._plans.clear()
+            t = start + np.arange(n_out) * down
+            idx = (t // up)[:, None] + self._history + self._window
+            plan = (idx, self._phases[t % up], np.empty(idx.shape, dtype=np.float32))
+            self._plans[(start, n_in)] = plan
+        idx, coeffs, window = plan
+        np.take(buf, idx, out=window)
+        return np.einsum("nj,nj->n", window, coeffs)
+
+
+class AudioProcessor:
+    def __init__(self, input_rate: int, output_rate: int):
+        self._input_rate = input_rate
+        self.output_rate = output_rate
+        self._resampler: Optional[StreamingResampler] = None
+
+    @property
+    def input_rate(self) -> int:
+        return self._input_rate
+
+    @input_rate.setter
+    def input_rate(self, rate: int) -> None:
+        # A new client rate starts a new stream; the old filter state no longer applies.
+        if rate != self._input_rate:
+            self._input_rate = rate
+            self._resampler = None
 
     def resample_audio(self, audio_data: bytes, input_format='int16') -> bytes:
         """
-        Resamples raw PCM audio data.
+        Resamples raw PCM audio data, continuing the stream from the previous call.
         
         Args:
             audio_data: Raw bytes of audio data.
@@ -28,32 +236,61 @@ class AudioProcessor:
         if input_format == 'int16':
             audio_np = np.frombuffer(audio_data, dtype=np.int16)
         elif input_format == 'float32':
-            audio_np = np.frombuffer(audio_data, dtype=np.float32)
-            # Convert float32 [-1.0, 1.0] to int16 [-32768, 32767]
-            audio_np = (audio_np * 32767).astype(np.int16)
+            # Scale float32 [-1.0, 1.0] to the int16 range; the resampler clips on output.
+            audio_np = np.frombuffer(audio_data, dtype=np.float32) * 32767
         else:
             raise ValueError(f"Unsupported input format: {input_format}")
 
         if self.input_rate == self.output_rate:
-            return audio_np.astype(np.int16).tobytes()
+            return np.clip(audio_np, -32768, 32767).astype(np.int16).tobytes()
 
-        # Resample (polyphase is lower-latency than FFT for streaming chunks)
+        if self._resampler is None:
+            self._resampler = StreamingResampler(self.input_rate, self.output_rate)
+        return self._resampler.process(audio_np).tobytes()
+
+    def _resample_or_error(self, data: bytes) -> Union[bytes, Exception]:
         try:
-            gcd = int(np.gcd(self.input_rate, self.output_rate))
-            up = int(self.output_rate // gcd)
-            down = int(self.input_rate // gcd)
-            resampled = signal.resample_poly(audio_np.astype(np.float32), up, down)
-        except Exception:
-            return b""  # Handle empty/too-small chunks gracefully
+            return self.resample_audio(data, input_format='int16')
+        except Exception as e:
+            return e
+
+    @staticmethod
+    def resample_many(items: List[Tuple["AudioProcessor", bytes]]) -> List[Union[bytes, Exception]]:
+        """
+        Resamples one int16 chunk for each of several sessions, in order.
+
+        Halfband streams with matching chunk length and phase are stacked into a
+        single vectorized call; everything else goes through ``resample_audio``.
+        Each processor may appear at most once per call. A chunk that can't be
+        resampled (e.g. an odd byte count) gets its exception in its slot, so it
+        only fails its own session.
+        """
+        results: List[Union[bytes, Exception]] = [b""] * len(items)
+        groups = {}
+        for i, (processor, data) in enumerate(items):
+            if data and processor.input_rate != processor.output_rate and len(data) % 2 == 0:
+                if processor._resampler is None:
+                    processor._resampler = StreamingResampler(processor.input_rate, processor.output_rate)
+                resampler = processor._resampler
+                if resampler.can_stack():
+                    groups.setdefault((len(data), resampler.phase), []).append(i)
+                    continue
+            results[i] = processor._resample_or_error(data)
 
-        # Clip + cast back to int16 PCM
-        resampled = np.clip(resampled, -32768, 32767)
-        return resampled.astype(np.int16).tobytes()
+        for indices in groups.values():
+            if len(indices) == 1:
+                i = indices[0]
+                results[i] = items[i][0]._resample_or_error(items[i][1])
+                continue
+            resamplers = [items[i][0]._resampler for i in indices]
+            chunks = [np.frombuffer(items[i][1], dtype=np.int16) for i in indices]
+            for i, out in zip(indices, StreamingResampler.process_stacked(resamplers, chunks)):
+                results[i] = out.tobytes()
+        return results
 
     @staticmethod
     def create_wav_header(sample_rate: int, channels: int, bits_per_sample: int, data_size: int) -> bytes:
         """Helper to verify audio dumps if needed"""
-        import struct
         byte_rate = sample_rate * channels * bits_per_sample // 8
         block_align = channels * bits_per_sample // 8
         return struct.pack(
@@ -72,3 +309,332 @@ class AudioProcessor:
             b'data',
             data_size
         )
+
+
+class VoiceActivityDetector:
+    """
+    Gates a stream of int16 PCM chunks down to the stretches that contain speech.
+
+    Each chunk is split into short analysis frames; energy (dBFS) and
+    zero-crossing rate are computed for all of them in one vectorized pass. A
+    frame counts as speech when it is above the energy threshold and either
+    tonal (low ZCR) or clearly loud. Speech starts after ``start_frames``
+    consecutive speech frames and ends after ``hangover_ms`` without any.
+    While silent, the last ``preroll_ms`` of audio is kept in a ring buffer and
+    released ahead of the first speech chunk so word onsets are not clipped.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        *,
+        energy_dbfs: float = -45.0,
+        zcr_max: float = 0.35,
+        frame_ms: int = 10,
+        start_frames: int = 2,
+        hangover_ms: int = 400,
+        preroll_ms: int = 200,
+    ):
+        self.sample_rate = sample_rate
+        self.energy_dbfs = energy_dbfs
+        self.zcr_max = zcr_max
+        self.frame_len = max(2, sample_rate * frame_ms // 1000)
+        self.start_frames = start_frames
+        self.hangover_samples = sample_rate * hangover_ms // 1000
+        self.preroll_bytes = sample_rate * 2 * preroll_ms // 1000
+
+        self.speaking = False
+        self._run = 0  # consecutive speech frames while silent
+        self._silent_samples = 0  # samples since the last speech frame while speaking
+        self._preroll = collections.deque()
+        self._preroll_size = 0
+
+        self.chunks_total = 0
+        self.chunks_suppressed = 0
+
+    def _speech_frames(self, samples: np.ndarray) -> np.ndarray:
+        n = len(samples)
+        frame_len = self.frame_len if n >= self.frame_len else n
+        frames = samples[: n - n % frame_len].reshape(-1, frame_len).astype(np.float32)
+        power = np.einsum("ij,ij->i", frames, frames) / frame_len
+        db = 10.0 * np.log10(power / (32768.0 * 32768.0) + 1e-12)
+        zcr = np.count_nonzero(np.diff(np.signbit(frames), axis=1), axis=1) / (frame_len - 1)
+        loud = db > self.energy_dbfs
+        return loud & ((zcr < self.zcr_max) | (db > self.energy_dbfs + 15.0))
+
+    def process(self, chunk: bytes) -> Tuple[List[bytes], bool]:
+        """
+        Feeds one chunk through the gate.
+
+        Returns:
+            (chunks to forward upstream, whether speech just ended).
+        """
+        if len(chunk) < 4:
+            return ([chunk] if self.speaking and chunk else []), False
+
+        self.chunks_total += 1
+        speech = self._speech_frames(np.frombuffer(chunk, dtype=np.int16))
+        frame_len = len(chunk) // 2 // len(speech)
+
+        if self.speaking:
+            if speech.any():
+                # Only the trailing silence after the last speech frame counts.
+                last = len(speech) - 1 - int(np.argmax(speech[::-1]))
+                self._silent_samples = (len(speech) - 1 - last) * frame_len
+            else:
+                self._silent_samples += len(chunk) // 2
+            if self._silent_samples >= self.hangover_samples:
+                self.speaking = False
+                self._run = 0
+                return [chunk], True
+            return [chunk], False
+
+        started = False
+        for is_speech in speech:
+            self._run = self._run + 1 if is_speech else 0
+            if self._run >= self.start_frames:
+                started = True
+                break
+
+        if not started:
+            self.chunks_suppressed += 1
+            self._preroll.append(chunk)
+            self._preroll_size += len(chunk)
+            # With preroll_ms=0 this empties the buffer: no pre-roll is kept.
+            while self._preroll and self._preroll_size - len(self._preroll[0]) >= self.preroll_bytes:
+                self._preroll_size -= len(self._preroll.popleft())
+            return [], False
+
+        self.speaking = True
+        self._silent_samples = 0
+        out = list(self._preroll)
+        out.append(chunk)
+        self._preroll.clear()
+        self._preroll_size = 0
+        return out, False
+
+    @property
+    def suppressed_fraction(self) -> float:
+        return self.chunks_suppressed / self.chunks_total if self.chunks_total else 0.0
+
+
+# --- Downstream codecs -------------------------------------------------------
+#
+# Optional compact encodings for the Gemini -> browser leg, negotiated through
+# the client's {"type": "config"} message. "pcm16" is the raw 24kHz stream.
+#
+#   mulaw  G.711 u-law, one byte per sample (2x).
+#   adpcm  IMA-ADPCM, four bits per sample (~3.6x). A message is a little-endian
+#          uint32 sample count followed by independent blocks of
+#          ADPCM_BLOCK_SAMPLES samples: int16 first sample, uint8 step index,
+#          one reserved byte, then (ADPCM_BLOCK_SAMPLES - 1) / 2 bytes of codes,
+#          low nibble first. The last block is padded; the decoder trims to the
+#          sample count. Blocks carry their own state, so queue drops and
+#          barge-in never desynchronise the client's decoder.
+
+DOWNSTREAM_CODECS = ("pcm16", "mulaw", "adpcm")
+
+ADPCM_BLOCK_SAMPLES = 65
+
+
+@functools.lru_cache(maxsize=None)
+def _mulaw_tables() -> Tuple[np.ndarray, np.ndarray]:
+    # Same arithmetic as the CCITT reference (g711.c), so any standard decoder agrees.
+    bias = 0x84
+    # Encode table indexed by the int16 sample reinterpreted as uint16.
+    samples = np.arange(65536, dtype=np.uint32).astype(np.uint16).view(np.int16).astype(np.int32) >> 2
+    negative = samples < 0
+    magnitude = np.minimum(np.where(negative, -samples, samples), 8159) + (bias >> 2)
+    exponent = np.floor(np.log2(magnitude)).astype(np.int32) - 5
+    mantissa = (magnitude >> (exponent + 1)) & 0x0F
+    code = np.where(exponent > 7, 0x7F, (exponent << 4) | mantissa)  # clipped: top of the scale
+    encode = (code ^ np.where(negative, 0x7F, 0xFF)).astype(np.uint8)
+
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    magnitude = (((codes & 0x0F) << 3) + bias << exponent) - bias
+    decode = np.where(codes & 0x80, -magnitude, magnitude).astype(np.int16)
+
+    encode.setflags(write=False)
+    decode.setflags(write=False)
+    return encode, decode
+
+
+_ADPCM_STEPS = np.array([
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+    32767,
+], dtype=np.int32)
+_ADPCM_INDEX_DELTA = np.array([-1, -1, -1, -1, 2, 4, 6, 8], dtype=np.int32)
+
+
+@functools.lru_cache(maxsize=None)
+def _adpcm_tables() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # The reference encoder picks the 3 magnitude bits by successive approximation
+    # against step, step >> 1 and step >> 2. Those partial sums increase with the
+    # code, so the same code is the number of sums <= |diff|: one comparison per
+    # step index instead of three dependent ones.
+    code = np.arange(8)
+    partial = (
+        ((code >> 2) & 1)[None, :] * _ADPCM_STEPS[:, None]
+        + ((code >> 1) & 1)[None, :] * (_ADPCM_STEPS >> 1)[:, None]
+        + (code & 1)[None, :] * (_ADPCM_STEPS >> 2)[:, None]
+    )
+    thresholds = np.ascontiguousarray(partial[:, 1:])
+    deltas = (_ADPCM_STEPS >> 3)[:, None] + partial
+    next_index = np.clip(np.arange(len(_ADPCM_STEPS))[:, None] + _ADPCM_INDEX_DELTA[None, :], 0, len(_ADPCM_STEPS) - 1)
+    return thresholds, deltas.astype(np.int32), next_index.astype(np.intp)
+
+
+def mulaw_encode(pcm: bytes) -> bytes:
+    """Encodes int16 PCM as G.711 u-law (one byte per sample)."""
+    return _mulaw_tables()[0][np.frombuffer(pcm, dtype=np.uint16)].tobytes()
+
+
+def mulaw_decode(data: bytes) -> bytes:
+    return _mulaw_tables()[1][np.frombuffer(data, dtype=np.uint8)].tobytes()
+
+
+def adpcm_encode_many(chunks: List[bytes]) -> List[bytes]:
+    """
+    Encodes several int16 PCM chunks (e.g. one per session) as IMA-ADPCM.
+
+    The quantiser is a sample-by-sample recurrence, so the loop runs over the
+    sample positions of a block while every block of every chunk is advanced at
+    once; batching chunks together spreads the per-step overhead.
+    """
+    block = ADPCM_BLOCK_SAMPLES
+    thresholds, deltas, next_index = _adpcm_tables()
+    counts = [len(chunk) // 2 for chunk in chunks]
+    n_blocks = [-(-n // block) for n in counts]
+    total = sum(n_blocks)
+    if total == 0:
+        return [b"" for _ in chunks]
+
+    x = np.empty((total, block), dtype=np.int32)
+    row = 0
+    for chunk, n, nb in zip(chunks, counts, n_blocks):
+        if not nb:
+            continue
+        flat = x[row : row + nb].reshape(-1)
+        flat[:n] = np.frombuffer(chunk, dtype=np.int16, count=n)
+        flat[n:] = flat[n - 1]
+        row += nb
+
+    predictor = x[:, 0].copy()
+    # Start each block at a step near its typical sample-to-sample change, rather
+    # than carrying the index over from the previous block.
+    index = np.searchsorted(_ADPCM_STEPS, np.abs(np.diff(x, axis=1)).mean(axis=1))
+    index = np.minimum(index, len(_ADPCM_STEPS) - 1)
+    first_index = index.astype(np.uint8)
+
+    targets = np.ascontiguousarray(x[:, 1:].T)
+    codes = np.empty((block - 1, total), dtype=np.uint8)
+    for t in range(block - 1):
+        diff = targets[t] - predictor
+        negative = diff < 0
+        magnitude = np.count_nonzero(np.abs(diff)[:, None] >= thresholds[index], axis=1)
+        delta = deltas[index, magnitude]
+        predictor += np.where(negative, -delta, delta)
+        np.clip(predictor, -32768, 32767, out=predictor)
+        index = next_index[index, magnitude]
+        codes[t] = magnitude | (negative << 3)
+
+    codes = codes.T
+    blocks = np.empty((total, 4 + (block - 1) // 2), dtype=np.uint8)
+    blocks[:, 0:2] = x[:, :1].astype("<i2").view(np.uint8)
+    blocks[:, 2] = first_index
+    blocks[:, 3] = 0
+    blocks[:, 4:] = codes[:, 0::2] | (codes[:, 1::2] << 4)
+
+    results = []
+    row = 0
+    for n, nb in zip(counts, n_blocks):
+        results.append(struct.pack("<I", n) + blocks[row : row + nb].tobytes() if nb else b"")
+        row += nb
+    return results
+
+
+def adpcm_encode(pcm: bytes) -> bytes:
+    return adpcm_encode_many([pcm])[0]
+
+
+def adpcm_decode(data: bytes) -> bytes:
+    """Decodes one ``adpcm_encode`` message back to int16 PCM."""
+    block = ADPCM_BLOCK_SAMPLES
+    _, deltas, next_index = _adpcm_tables()
+    if not data:
+        return b""
+    (count,) = struct.unpack_from("<I", data)
+    blocks = np.frombuffer(data, dtype=np.uint8, offset=4).reshape(-1, 4 + (block - 1) // 2)
+    packed = blocks[:, 4:]
+    codes = np.empty((len(blocks), block - 1), dtype=np.intp)
+    codes[:, 0::2] = packed & 0x0F
+    codes[:, 1::2] = packed >> 4
+
+    out = np.empty((len(blocks), block), dtype=np.int32)
+    predictor = blocks[:, 0:2].copy().view("<i2")[:, 0].astype(np.int32)
+    index = blocks[:, 2].astype(np.intp)
+    out[:, 0] = predictor
+    for t in range(block - 1):
+        magnitude = codes[:, t] & 0x07
+        delta = deltas[index, magnitude]
+        predictor += np.where(codes[:, t] & 0x08, -delta, delta)
+        np.clip(predictor, -32768, 32767, out=predictor)
+        index = next_index[index, magnitude]
+        out[:, t + 1] = predictor
+    return out.reshape(-1)[:count].astype(np.int16).tobytes()
+
+
+def encode_downstream_many(items: List[Tuple[str, bytes]]) -> List[Union[bytes, Exception]]:
+    """
+    Encodes (codec, int16 PCM) pairs; ADPCM chunks are encoded together. As in
+    ``resample_many``, an item that fails gets its exception in its slot.
+    """
+    results: List[Union[bytes, Exception]] = [b""] * len(items)
+    adpcm = []
+    for i, (codec, pcm) in enumerate(items):
+        try:
+            if codec == "adpcm":
+                adpcm.append(i)
+            elif codec == "mulaw":
+                results[i] = mulaw_encode(pcm)
+            elif codec == "pcm16":
+                results[i] = pcm
+            else:
+                raise ValueError(f"Unsupported downstream codec: {codec}")
+        except Exception as e:
+            results[i] = e
+    if adpcm:
+        try:
+            encoded = adpcm_encode_many([items[i][1] for i in adpcm])
+        except Exception:
+            # Find the bad chunk(s) one by one; the rest still get encoded.
+            encoded = []
+            for i in adpcm:
+                try:
+                    encoded.append(adpcm_encode_many([items[i][1]])[0])
+                except Exception as e:
+                    encoded.append(e)
+        for i, result in zip(adpcm, encoded):
+            results[i] = result
+    return results
+
+
+def encode_downstream(codec: str, pcm: bytes) -> bytes:
+    result = encode_downstream_many([(codec, pcm)])[0]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def warm_up(output_rate: int, input_rates: Tuple[int, ...] = (48000, 44100, 16000)) -> None:
+    """Builds the codec tables and the usual resampling filters ahead of the first session."""
+    _mulaw_tables()
+    _adpcm_tables()
+    for rate in input_rates:
+        AudioProcessor(rate, output_rate).resample_audio(bytes(960))
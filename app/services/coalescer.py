@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FrameCoalescer:
+    """
+    Combines small mic frames into fewer upstream messages.
+
+    Frames are buffered until either ``max_bytes`` of audio is queued or the
+    oldest buffered frame has waited ``max_delay`` seconds, whichever comes
+    first. ``flush()`` sends whatever is buffered immediately (speech end,
+    barge-in, stream end). Sends are serialized so message order matches
+    frame order.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[bytes], Awaitable[None]],
+        *,
+        max_bytes: int,
+        max_delay: float,
+        session_id: str = "",
+    ):
+        self._send = send
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.session_id = session_id
+
+        self._chunks: List[bytes] = []
+        self._buffered = 0
+        self._arrival_sum = 0.0
+        self._first_arrival = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock = asyncio.Lock()
+
+        self.started = time.monotonic()
+        self.frames_in = 0
+        self.messages_out = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.max_delay > 0
+
+    async def push(self, frame: bytes) -> None:
+        if not frame:
+            return
+        self.frames_in += 1
+        if not self.enabled:
+            self.messages_out += 1
+            await self._send(frame)
+            return
+
+        now = time.monotonic()
+        if not self._chunks:
+            self._first_arrival = now
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._on_deadline)
+        self._chunks.append(frame)
+        self._buffered += len(frame)
+        self._arrival_sum += now
+
+        if self._buffered >= self.max_bytes:
+            await self.flush()
+
+    def _on_deadline(self) -> None:
+        self._timer = None
+        asyncio.ensure_future(self.flush()).add_done_callback(self._on_flush_done)
+
+    def _on_flush_done(self, task: asyncio.Future) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("[%s] Deadline flush failed: %s", self.session_id, task.exception())
+
+    async def flush(self) -> None:
+        """Sends everything buffered right now."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._chunks:
+            return
+
+        chunks, frames, arrival_sum = self._chunks, len(self._chunks), self._arrival_sum
+        first_arrival = self._first_arrival
+        self._chunks = []
+        self._buffered = 0
+        self._arrival_sum = 0.0
+
+        async with self._lock:
+            now = time.monotonic()
+            self.latency_sum += frames * now - arrival_sum
+            self.latency_max = max(self.latency_max, now - first_arrival)
+            self.messages_out += 1
+            await self._send(chunks[0] if frames == 1 else b"".join(chunks))
+
+    async def close(self) -> None:
+        await self.flush()
+
+    def stats(self) -> dict:
+        elapsed = max(1e-6, time.monotonic() - self.started)
+        return {
+            "frames_in": self.frames_in,
+            "messages_out": self.messages_out,
+            "messages_saved_per_s": (self.frames_in - self.messages_out) / elapsed,
+            "avg_added_latency_ms": self.latency_sum / self.frames_in * 1000 if self.frames_in else 0.0,
+            "max_added_latency_ms": self.latency_max * 1000,
+        }
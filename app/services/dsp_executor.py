@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import time
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
+
+from app.core.config import settings
+from app.core import metrics
+
+if TYPE_CHECKING:
+    from app.services.audio_utils import AudioProcessor
+
+logger = logging.getLogger(__name__)
+
+# audio_utils (numpy) is imported on first use rather than with the app, to keep worker start fast.
+
+
+def _resample_batch(items: List[Tuple[AudioProcessor, bytes]]) -> List[Union[bytes, Exception]]:
+    from app.services.audio_utils import AudioProcessor
+    return AudioProcessor.resample_many(items)
+
+
+def _resample_batch_remote(
+    items: List[Tuple[AudioProcessor, bytes]],
+) -> Tuple[List[AudioProcessor], List[Union[bytes, Exception]]]:
+    # Process pool: the processors are copies, so ship the updated filter state back.
+    results = _resample_batch(items)
+    return [processor for processor, _ in items], results
+
+
+def _encode_batch(items: List[Tuple[str, bytes]]) -> List[Union[bytes, Exception]]:
+    from app.services.audio_utils import encode_downstream_many
+    return encode_downstream_many(items)
+
+
+class DSPExecutor:
+    """
+    Shared worker pool for per-chunk audio DSP.
+
+    Frames submitted by different sessions during the same event-loop tick are
+    collected and resampled (or encoded for the browser) in one batch, stacked
+    into a single vectorized call where possible, so the event loop only pays
+    for the hand-off. Each session
+    awaits its own frame before submitting the next, which keeps per-session
+    ordering and means a processor is never in two batches at once.
+    """
+
+    def __init__(self, mode: str = "thread", workers: int = 2, batch_max: int = 64):
+        if mode not in ("thread", "process", "inline"):
+            raise ValueError(f"Unsupported DSP executor mode: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.batch_max = max(1, batch_max)
+
+        self._pool: Optional[concurrent.futures.Executor] = None
+        self._pending: List[Tuple[AudioProcessor, bytes, asyncio.Future, float]] = []
+        self._pending_encode: List[Tuple[str, bytes, asyncio.Future]] = []
+        self._flush_scheduled = False
+
+        self.batches = 0
+        self.frames = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @classmethod
+    def from_settings(cls) -> "DSPExecutor":
+        return cls(
+            mode=settings.DSP_EXECUTOR,
+            workers=settings.DSP_WORKERS,
+            batch_max=settings.DSP_BATCH_MAX,
+        )
+
+    def _get_pool(self) -> concurrent.futures.Executor:
+        if self._pool is None:
+            if self.mode == "process":
+                self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="dsp"
+                )
+            logger.info("DSP executor started (mode=%s, workers=%d)", self.mode, self.workers)
+        return self._pool
+
+    async def resample(self, processor: AudioProcessor, data: bytes) -> Tuple[bytes, float]:
+        """
+        Resamples one int16 chunk for a session.
+
+        Returns:
+            (resampled bytes, seconds the frame waited before DSP started).
+        """
+        if not data:
+            return b"", 0.0
+        if self.mode == "inline" or processor.input_rate == processor.output_rate:
+            # Nothing worth a hand-off: passthrough is a no-op.
+            started = time.perf_counter()
+            result = processor.resample_audio(data, input_format='int16')
+            metrics.DSP_CHUNK.observe(time.perf_counter() - started)
+            return result, 0.0
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((processor, data, future, time.perf_counter()))
+        self._schedule_flush(loop)
+        return await future
+
+    async def encode(self, codec: str, pcm: bytes) -> bytes:
+        """Encodes one int16 chunk bound for the browser with the session's downstream codec."""
+        if codec == "pcm16" or not pcm:
+            return pcm
+        if self.mode == "inline" or codec == "mulaw":
+            # u-law is a table lookup: cheaper than the hand-off.
+            started = time.perf_counter()
+            result = _encode_batch([(codec, pcm)])[0]
+            metrics.DOWNSTREAM_ENCODE.observe(time.perf_counter() - started)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending_encode.append((codec, pcm, future))
+        self._schedule_flush(loop)
+        return await future
+
+    def _schedule_flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            loop.call_soon(self._flush)
+
+    def _flush(self) -> None:
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, []
+        for i in range(0, len(pending), self.batch_max):
+            asyncio.ensure_future(self._run_batch(pending[i : i + self.batch_max]))
+        pending_encode, self._pending_encode = self._pending_encode, []
+        for i in range(0, len(pending_encode), self.batch_max):
+            asyncio.ensure_future(self._run_encode_batch(pending_encode[i : i + self.batch_max]))
+
+    async def _run_batch(self, batch: List[Tuple[AudioProcessor, bytes, asyncio.Future, float]]) -> None:
+        loop = asyncio.get_running_loop()
+        items = [(processor, data) for processor, data, _, _ in batch]
+        queued_at = [enqueued for _, _, _, enqueued in batch]
+        try:
+            if self.mode == "process":
+                # Worker start time isn't observable across processes; count wait up to hand-off.
+                started = time.perf_counter()
+                processors, results = await loop.run_in_executor(self._get_pool(), _resample_batch_remote, items)
+                finished = time.perf_counter()
+                for (processor, _), updated in zip(items, processors):
+                    processor.__dict__.update(updated.__dict__)
+            else:
+                times: List[float] = []
+
+                def run() -> List[Union[bytes, Exception]]:
+                    times.append(time.perf_counter())
+                    batch_results = _resample_batch(items)
+                    times.append(time.perf_counter())
+                    return batch_results
+
+                results = await loop.run_in_executor(self._get_pool(), run)
+                started, finished = times
+        except Exception as e:
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.frames += len(batch)
+        metrics.DSP_CHUNK.observe((finished - started) / len(batch), len(batch))
+        for (_, _, future, _), result, enqueued in zip(batch, results, queued_at):
+            wait = max(0.0, started - enqueued)
+            self.wait_total += wait
+            if wait > self.wait_max:
+                self.wait_max = wait
+            metrics.DSP_QUEUE_WAIT.observe(wait)
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                # Only this session's frame was bad; the rest of the batch is fine.
+                future.set_exception(result)
+            else:
+                future.set_result((result, wait))
+
+    async def _run_encode_batch(self, batch: List[Tuple[str, bytes, asyncio.Future]]) -> None:
+        loop = asyncio.get_running_loop()
+        items = [(codec, pcm) for codec, pcm, _ in batch]
+        try:
+            started = time.perf_counter()
+            results = await loop.run_in_executor(self._get_pool(), _encode_batch, items)
+            finished = time.perf_counter()
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        metrics.DOWNSTREAM_ENCODE.observe((finished - started) / len(batch), len(batch))
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "batches": self.batches,
+            "frames": self.frames,
+            "avg_batch": self.frames / self.batches if self.batches else 0.0,
+            "avg_wait_ms": self.wait_total / self.frames * 1000 if self.frames else 0.0,
+            "max_wait_ms": self.wait_max * 1000,
+        }
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            logger.info("DSP executor shutting down (%s)", self.stats())
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+dsp_executor = DSPExecutor.from_settings()
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import binascii
+import json
+import re
+import time
+from typing import Any, Callable, List, Optional, Union
+
+from app.core.config import settings
+
+# Optional faster JSON backends; the stdlib is always available as a fallback.
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:  # pragma: no cover - optional dependency
+    simdjson = None
+
+
+def _select_loads(backend: str) -> Callable[[Union[str, bytes]], Any]:
+    if backend in ("auto", "orjson") and orjson is not None:
+        return orjson.loads
+    if backend in ("auto", "simdjson") and simdjson is not None:
+        return simdjson.loads
+    if backend not in ("auto", "stdlib"):
+        raise ValueError(f"JSON backend '{backend}' is not installed")
+    return json.loads
+
+
+def _select_dumps(backend: str) -> Callable[[Any], str]:
+    # Control messages go out as text frames, so always hand back a str.
+    if backend in ("auto", "orjson") and orjson is not None:
+        return lambda obj: orjson.dumps(obj).decode("utf-8")
+    return json.dumps
+
+
+loads = _select_loads(settings.GEMINI_JSON_BACKEND)
+dumps = _select_dumps(settings.GEMINI_JSON_BACKEND)
+
+# base64 never contains quotes or braces, so the payload can be located with a
+# scan for the key and sliced out up to the next quote without parsing the rest.
+_INLINE_DATA_RE = re.compile(r'"inlineData"\s*:\s*\{[^{}]*?"data"\s*:\s*"')
+_INLINE_DATA_RE_B = re.compile(_INLINE_DATA_RE.pattern.encode())
+_TURN_COMPLETE_RE = re.compile(r'"turnComplete"\s*:\s*true')
+_TURN_COMPLETE_RE_B = re.compile(_TURN_COMPLETE_RE.pattern.encode())
+_INTERRUPTED_RE = re.compile(r'"interrupted"\s*:\s*true')
+_INTERRUPTED_RE_B = re.compile(_INTERRUPTED_RE.pattern.encode())
+# Transcription text is a JSON string literal (escapes included), decoded on its own.
+_TRANSCRIPTION_RE = re.compile(r'"outputTranscription"\s*:\s*\{[^{}]*?"text"\s*:\s*("(?:[^"\\]|\\.)*")')
+_TRANSCRIPTION_RE_B = re.compile(_TRANSCRIPTION_RE.pattern.encode())
+
+
+class RealtimeAudioEncoder:
+    """
+    Renders ``realtime_input`` audio messages by splicing base64 into a
+    pre-rendered template, instead of building a dict and running json.dumps.
+    """
+
+    def __init__(self, sample_rate: int):
+        self.prefix = (
+            '{"realtime_input":{"audio":{"mime_type":"audio/pcm;rate=%d","data":"' % sample_rate
+        ).encode("ascii")
+        self.suffix = b'"}}}'
+
+    def encode(self, pcm: bytes) -> bytes:
+        """Returns the full JSON message as UTF-8 bytes (for binary frames)."""
+        return b"".join((self.prefix, binascii.b2a_base64(pcm, newline=False), self.suffix))
+
+    def encode_text(self, pcm: bytes) -> str:
+        """Returns the full JSON message as ``str`` (for text frames)."""
+        # The message is pure ASCII, so this decode is a straight copy.
+        return self.encode(pcm).decode("ascii")
+
+
+class ServerMessage:
+    """The parts of a BidiGenerateContent server message the session acts on."""
+
+    __slots__ = ("audio", "turn_complete", "interrupted", "setup_complete", "error", "resumption_handle",
+                 "go_away", "transcript", "data")
+
+    def __init__(self):
+        self.audio: List[bytes] = []
+        self.turn_complete = False
+        self.interrupted = False
+        self.setup_complete = False
+        self.error: Optional[Any] = None
+        # Latest handle a dropped connection can resume this session with (sessionResumptionUpdate)
+        self.resumption_handle: Optional[str] = None
+        # The server will close this connection soon (goAway)
+        self.go_away = False
+        # Text of the model's speech so far in this message (outputTranscription), if requested
+        self.transcript: Optional[str] = None
+        # Fully decoded message, only populated on the slow path (no audio parts).
+        self.data: Optional[dict] = None
+
+
+def parse_server_message(raw: Union[str, bytes], timings: Optional[list] = None) -> ServerMessage:
+    """
+    Extracts audio and control flags from a Gemini Live server message.
+
+    Messages carrying ``inlineData`` are scanned directly: each payload is
+    sliced out and base64-decoded without building the JSON object graph.
+    Everything else (setupComplete, errors, text-only turns) is small and goes
+    through the configured JSON backend.
+
+    If ``timings`` is given (trace capture), ``(stage, start, end)`` tuples
+    from ``time.perf_counter`` are appended for the JSON parse and each
+    base64 decode.
+    """
+    msg = ServerMessage()
+    is_bytes = isinstance(raw, (bytes, bytearray))
+    inline_re = _INLINE_DATA_RE_B if is_bytes else _INLINE_DATA_RE
+    quote = b'"' if is_bytes else '"'
+
+    match = inline_re.search(raw)
+    if match is None:
+        if timings is not None:
+            started = time.perf_counter()
+            data = loads(raw)
+            timings.append(("json_parse", started, time.perf_counter()))
+        else:
+            data = loads(raw)
+        msg.data = data
+        if "error" in data:
+            msg.error = data["error"]
+        if "setupComplete" in data:
+            msg.setup_complete = True
+        update = data.get("sessionResumptionUpdate")
+        if update and update.get("resumable") and update.get("newHandle"):
+            msg.resumption_handle = update["newHandle"]
+        if "goAway" in data:
+            msg.go_away = True
+        server_content = data.get("serverContent")
+        if server_content:
+            msg.turn_complete = bool(server_content.get("turnComplete"))
+            msg.interrupted = bool(server_content.get("interrupted"))
+            transcription = server_content.get("outputTranscription")
+            if transcription and transcription.get("text"):
+                msg.transcript = transcription["text"]
+        return msg
+
+    view = memoryview(raw) if is_bytes else None
+    while match is not None:
+        start = match.end()
+        end = raw.find(quote, start)
+        if end < 0:
+            raise ValueError("Unterminated inlineData payload")
+        if end > start:
+            if timings is not None:
+                started = time.perf_counter()
+                msg.audio.append(binascii.a2b_base64(view[start:end] if is_bytes else raw[start:end]))
+                timings.append(("b64decode", started, time.perf_counter()))
+            else:
+                msg.audio.append(binascii.a2b_base64(view[start:end] if is_bytes else raw[start:end]))
+        match = inline_re.search(raw, end + 1)
+
+    turn_re = _TURN_COMPLETE_RE_B if is_bytes else _TURN_COMPLETE_RE
+    interrupted_re = _INTERRUPTED_RE_B if is_bytes else _INTERRUPTED_RE
+    msg.turn_complete = turn_re.search(raw) is not None
+    msg.interrupted = interrupted_re.search(raw) is not None
+    transcription = (_TRANSCRIPTION_RE_B if is_bytes else _TRANSCRIPTION_RE).search(raw)
+    if transcription is not None:
+        msg.transcript = loads(transcription.group(1)) or None
+    return msg
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import logging
+import time
+import uuid
+from typing import Deque, Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core import metrics
+from app.services.gemini_service import GeminiLiveService
+
+logger = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, str]  # (model, voice)
+
+
+class GeminiConnectionPool:
+    """
+    Keeps ``size`` Gemini Live connections per (model, voice) handshaken and idle.
+
+    ``acquire`` hands a ready connection to exactly one session and triggers a
+    background refill. Connections are retired after ``max_idle`` seconds,
+    before the server's idle timeout would drop them. A miss returns ``None``
+    and the caller connects inline as usual; the key is then kept warm too.
+    """
+
+    def __init__(self, size: int, max_idle: float):
+        self.size = size
+        self.max_idle = max_idle
+        self._ready: Dict[PoolKey, Deque[Tuple[GeminiLiveService, float]]] = {}
+        self._connecting: Dict[PoolKey, int] = collections.defaultdict(int)
+        self._tasks: Set[asyncio.Task] = set()
+        self._maintainer: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    @staticmethod
+    def default_key() -> PoolKey:
+        return (settings.GEMINI_MODEL, settings.GEMINI_VOICE)
+
+    def start(self) -> None:
+        if not self.enabled or self._maintainer is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._ready.setdefault(self.default_key(), collections.deque())
+        self._maintainer = asyncio.get_running_loop().create_task(self._maintain())
+        logger.info("Gemini connection pool started (size=%d per model/voice, max_idle=%.0fs)",
+                    self.size, self.max_idle)
+
+    async def acquire(self, session_id: str, key: Optional[PoolKey] = None) -> Optional[GeminiLiveService]:
+        if not self.enabled:
+            return None
+        key = key or self.default_key()
+        ready = self._ready.setdefault(key, collections.deque())
+        now = time.monotonic()
+
+        service = None
+        while ready:
+            candidate, ready_at = ready.popleft()
+            if candidate.is_open and now - ready_at < self.max_idle:
+                service = candidate
+                break
+            self._spawn(candidate.close())
+
+        self._refresh_gauge()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+        if service is None:
+            self.misses += 1
+            metrics.GEMINI_POOL_MISSES.inc()
+            return None
+
+        self.hits += 1
+        self.saved_seconds += service.handshake_seconds
+        metrics.GEMINI_POOL_HITS.inc()
+        metrics.GEMINI_POOL_SAVED.inc(service.handshake_seconds)
+        logger.info("[%s] Using pre-warmed Gemini connection %s (saved %.0fms)",
+                    session_id, service.session_id, service.handshake_seconds * 1000)
+        service.session_id = session_id
+        return service
+
+    async def _maintain(self) -> None:
+        while True:
+            now = time.monotonic()
+            for key, ready in self._ready.items():
+                # Retire connections that are about to hit the idle limit.
+                while ready and (now - ready[0][1] >= self.max_idle or not ready[0][0].is_open):
+                    stale, _ = ready.popleft()
+                    self._spawn(stale.close())
+                for _ in range(self.size - len(ready) - self._connecting[key]):
+                    self._spawn(self._warm(key))
+            self._refresh_gauge()
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(1.0, self.max_idle / 4))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _warm(self, key: PoolKey) -> None:
+        model, voice = key
+        service = GeminiLiveService(session_id=f"pool-{uuid.uuid4().hex[:6]}", model=model, voice_name=voice)
+        self._connecting[key] += 1
+        try:
+            await service.connect()
+        except Exception as e:
+            logger.warning("Gemini pool warm-up failed for %s/%s: %s", model, voice, e)
+            await service.close()
+            # Back off before the maintainer tries this key again.
+            await asyncio.sleep(5)
+            return
+        finally:
+            self._connecting[key] -= 1
+        self._ready.setdefault(key, collections.deque()).append((service, time.monotonic()))
+        self._refresh_gauge()
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _refresh_gauge(self) -> None:
+        metrics.GEMINI_POOL_READY.set(sum(len(ready) for ready in self._ready.values()))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "saved_seconds": self.saved_seconds,
+        }
+
+    async def stop(self) -> None:
+        if self._maintainer is not None:
+            self._maintainer.cancel()
+            self._maintainer = None
+        for task in list(self._tasks):
+            task.cancel()
+        for ready in self._ready.values():
+            while ready:
+                service, _ = ready.popleft()
+                await service.close()
+        if self.hits or self.misses:
+            logger.info("Gemini connection pool stopped (%s)", self.stats())
+
+
+gemini_pool = GeminiConnectionPool(settings.GEMINI_POOL_SIZE, settings.GEMINI_POOL_MAX_IDLE_S)
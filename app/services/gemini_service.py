@@ -1,36 +1,123 @@
 from __future__ import annotations
 
-import base64
-import json
+import asyncio
 import logging
-from typing import AsyncIterator, Optional
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Optional, Union
 
 import websockets
 
 from app.core.config import settings
+from app.core import metrics
+from app.services.gemini_codec import RealtimeAudioEncoder, dumps, loads, parse_server_message
+
+if TYPE_CHECKING:
+    from app.core.tracing import TraceHandle
 
 logger = logging.getLogger(__name__)
 
 
+class Interrupted:
+    """Yielded by ``GeminiLiveService.receive()`` when Gemini reports a barge-in."""
+
+    __slots__ = ("received_at",)
+
+    def __init__(self, received_at: float):
+        # time.monotonic() when the interrupting message arrived
+        self.received_at = received_at
+
+
+class TurnComplete:
+    """Yielded by ``GeminiLiveService.receive()`` when the model finishes its turn."""
+
+    __slots__ = ()
+
+
+TURN_COMPLETE = TurnComplete()
+
+
+class Transcript:
+    """Yielded by ``GeminiLiveService.receive()`` with a piece of the model's speech as text."""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class Reconnected:
+    """Yielded by ``GeminiLiveService.receive()`` once a dropped connection has been replaced."""
+
+    __slots__ = ("recovery_seconds", "resumed")
+
+    def __init__(self, recovery_seconds: float, resumed: bool):
+        # From noticing the drop to the new connection's setupComplete
+        self.recovery_seconds = recovery_seconds
+        # False: the new connection started without the conversation so far
+        self.resumed = resumed
+
+
+class UpstreamUnavailable(Exception):
+    """Raised by sends while the Gemini connection is down and being replaced."""
+
+
 class GeminiLiveService:
-    def __init__(self, *, session_id: str):
+    def __init__(self, *, session_id: str, model: Optional[str] = None, voice_name: Optional[str] = None):
         self.session_id = session_id
         self.api_key = settings.GEMINI_API_KEY
-        self.model = getattr(settings, "GEMINI_MODEL", "gemini-2.5-flash-native-audio-preview-12-2025")
-        self.voice_name = getattr(settings, "GEMINI_VOICE", "Aoede")
+        self.model = model or getattr(settings, "GEMINI_MODEL", "gemini-2.5-flash-native-audio-preview-12-2025")
+        self.voice_name = voice_name or getattr(settings, "GEMINI_VOICE", "Aoede")
 
-        self.uri = "wss://generativelanguage.googleapis.com/ws/google.ai.generativelanguage.v1alpha.GenerativeService.BidiGenerateContent"
+        self.uri = settings.GEMINI_LIVE_URI
         self.ws: Optional[websockets.WebSocketClientProtocol] = None
         self.ai_speaking = False
+        self._audio_encoder = RealtimeAudioEncoder(settings.GEMINI_SAMPLE_RATE)
 
         self._sent_audio_chunks = 0
         self._sent_audio_bytes = 0
         self._recv_audio_chunks = 0
         self._recv_audio_bytes = 0
+        self._interruptions = 0
+        # Seconds the last connect() took (DNS/TLS/upgrade + setupComplete)
+        self.handshake_seconds = 0.0
+
+        # Mid-session failover (see receive())
+        self.resumption_handle: Optional[str] = None
+        self.reconnecting = False
+        self._lost_at = 0.0
+        self._closing = False
+        self.reconnects = 0
+        self.resumed_reconnects = 0
+        self.reconnect_failures = 0
+        self.recovery_max = 0.0
+
+        # Set by the websocket endpoint; spans are recorded while an admin capture is active
+        self.trace: Optional[TraceHandle] = None
+
+    @property
+    def is_open(self) -> bool:
+        if self.ws is None:
+            return False
+        is_open = getattr(self.ws, "open", None)
+        if is_open is None:  # websockets >= 14 connections expose `state` only
+            return self.ws.state.name == "OPEN"
+        return is_open
+
+    @property
+    def can_reconnect(self) -> bool:
+        return settings.GEMINI_RECONNECT_ATTEMPTS > 0 and not self._closing
+
+    def _connection_lost(self, ws) -> None:
+        # Ignore late failures on a connection that has already been replaced.
+        if ws is self.ws and not self.reconnecting:
+            self.reconnecting = True
+            self._lost_at = time.monotonic()
 
-    async def connect(self) -> None:
+    async def connect(self, resume: bool = True) -> None:
+        ws = None
         try:
             logger.info("[%s] Connecting to Gemini Live API: %s", self.session_id, self.uri)
+            started = time.monotonic()
             # websockets renamed `extra_headers` -> `additional_headers` (v14+).
             connect_kwargs = dict(
                 ping_interval=20,
@@ -38,32 +125,42 @@ class GeminiLiveService:
                 max_size=4 * 1024 * 1024,
             )
             try:
-                self.ws = await websockets.connect(
+                ws = self.ws = await websockets.connect(
                     self.uri,
                     additional_headers={"x-goog-api-key": self.api_key},
                     **connect_kwargs,
                 )
             except TypeError:
-                self.ws = await websockets.connect(
+                ws = self.ws = await websockets.connect(
                     self.uri,
                     extra_headers={"x-goog-api-key": self.api_key},
                     **connect_kwargs,
                 )
-            await self._send_setup()
+            await self._send_setup(resume)
 
             logger.info("[%s] Waiting for Gemini handshake (setupComplete)...", self.session_id)
             raw_msg = await self.ws.recv()
-            msg = json.loads(raw_msg)
+            msg = loads(raw_msg)
             if "setupComplete" not in msg:
                 logger.error("[%s] Handshake failed: %s", self.session_id, raw_msg)
                 raise RuntimeError("Did not receive setupComplete from Gemini")
 
-            logger.info("[%s] Gemini handshake complete", self.session_id)
-        except Exception:
-            logger.exception("[%s] Failed to connect to Gemini", self.session_id)
+            handshake = time.monotonic() - started
+            self.handshake_seconds = handshake
+            metrics.GEMINI_HANDSHAKE.observe(handshake)
+            logger.info("[%s] Gemini handshake complete (%.0fms)", self.session_id, handshake * 1000)
+        except BaseException as e:
+            if ws is not None:
+                # Don't leave the half-open socket behind; this also runs for every
+                # failed reconnect attempt and when the caller cancels (timeout).
+                if self.ws is ws:
+                    self.ws = None
+                ws.transport.abort()
+            if isinstance(e, Exception) and not self.reconnecting:  # Reconnect attempts log their own one-line failure
+                logger.exception("[%s] Failed to connect to Gemini", self.session_id)
             raise
 
-    async def _send_setup(self) -> None:
+    async def _send_setup(self, resume: bool = True) -> None:
         if not self.ws:
             raise RuntimeError("WebSocket not connected")
 
@@ -83,26 +180,50 @@ class GeminiLiveService:
                 "system_instruction": {"parts": [{"text": settings.SYSTEM_PROMPT}]},
             }
         }
+        if settings.GREETING_CACHE_ENABLED:
+            # Cached greetings are stored with what the model said, to seed later sessions with.
+            setup_msg["setup"]["output_audio_transcription"] = {}
+        if settings.GEMINI_SESSION_RESUMPTION:
+            # An empty config asks for resumption handles; a handle continues that session.
+            handle = self.resumption_handle if resume else None
+            setup_msg["setup"]["session_resumption"] = {"handle": handle} if handle else {}
         logger.info("[%s] Sending setup: model=%s voice=%s", self.session_id, self.model, self.voice_name)
-        await self.ws.send(json.dumps(setup_msg))
+        await self.ws.send(dumps(setup_msg))
 
     async def send_audio(self, audio_chunk: bytes) -> None:
-        if not self.ws or not audio_chunk:
+        """Raises ``UpstreamUnavailable`` (the chunk was not sent) while reconnecting."""
+        # Between failed reconnect attempts there is no ws, but the chunk must still be held.
+        if not audio_chunk or not (self.ws or self.reconnecting):
             return
 
-        b64_audio = base64.b64encode(audio_chunk).decode("utf-8")
-        msg = {
-            "realtime_input": {
-                "audio": {
-                    "mime_type": f"audio/pcm;rate={settings.GEMINI_SAMPLE_RATE}",
-                    "data": b64_audio,
-                }
-            }
-        }
+        if settings.GEMINI_BINARY_FRAMES:
+            frame = self._audio_encoder.encode(audio_chunk)
+        else:
+            frame = self._audio_encoder.encode_text(audio_chunk)
 
+        await self._send_realtime(frame)
         self._sent_audio_chunks += 1
         self._sent_audio_bytes += len(audio_chunk)
-        await self.ws.send(json.dumps(msg))
+        metrics.GEMINI_OUT_MESSAGES.inc()
+        metrics.GEMINI_OUT_BYTES.inc(len(audio_chunk))
+
+    async def end_audio_stream(self) -> None:
+        """Tells Gemini the mic stream paused (e.g. VAD saw speech stop)."""
+        if not (self.ws or self.reconnecting):
+            return
+        await self._send_realtime(dumps({"realtime_input": {"audio_stream_end": True}}))
+
+    async def _send_realtime(self, frame) -> None:
+        if self.reconnecting:
+            raise UpstreamUnavailable()
+        ws = self.ws
+        try:
+            await ws.send(frame)
+        except websockets.ConnectionClosed:
+            if not self.can_reconnect:
+                raise
+            self._connection_lost(ws)
+            raise UpstreamUnavailable() from None
 
     async def send_text(self, text: str) -> None:
         if not self.ws:
@@ -115,56 +236,161 @@ class GeminiLiveService:
                 "turn_complete": True,
             }
         }
-        await self.ws.send(json.dumps(msg))
+        await self.ws.send(dumps(msg))
 
-    async def receive(self) -> AsyncIterator[bytes]:
+    async def send_greeting_context(self, trigger: str, greeting: str) -> None:
+        """
+        Seeds the conversation with a greeting exchange that was already played
+        to the user from cache, without asking the model to respond to it.
+        ``greeting`` is the transcript of the rendering that was played.
+        """
         if not self.ws:
             return
 
-        async for message in self.ws:
+        logger.info("[%s] Sending cached greeting context", self.session_id)
+        msg = {
+            "client_content": {
+                "turns": [
+                    {"role": "user", "parts": [{"text": trigger}]},
+                    {"role": "model", "parts": [{"text": greeting}]},
+                ],
+                "turn_complete": False,
+            }
+        }
+        await self.ws.send(dumps(msg))
+
+    async def receive(self) -> AsyncIterator[Union[bytes, Interrupted, TurnComplete, Transcript, Reconnected]]:
+        """
+        Yields model audio and events until the session ends.
+
+        If the connection drops (network error, keepalive timeout, or the
+        server closing it after ``goAway``), it is replaced transparently,
+        resuming the same Gemini session when a handle is available, and
+        ``Reconnected`` is yielded. Sends raise ``UpstreamUnavailable`` in the
+        meantime. The iterator only ends (or raises) once reconnecting is
+        disabled, the service is closed, or every attempt has failed.
+        """
+        while self.ws:
+            ws = self.ws
             try:
-                data = json.loads(message)
+                async for message in ws:
+                    try:
+                        trace = self.trace.active if self.trace is not None else None
+                        if trace is None:
+                            msg = parse_server_message(message)
+                        else:
+                            received = time.perf_counter()
+                            timings = []
+                            msg = parse_server_message(message, timings)
+                            trace.span("gemini_rx", "parse", received, time.perf_counter(),
+                                       bytes=len(message), audio_parts=len(msg.audio))
+                            for stage, started, ended in timings:
+                                trace.span("gemini_rx", stage, started, ended)
 
-                if "error" in data:
-                    logger.error("[%s] Gemini error: %s", self.session_id, data["error"])
-                    continue
+                        if msg.error is not None:
+                            logger.error("[%s] Gemini error: %s", self.session_id, msg.error)
+                            continue
 
-                server_content = data.get("serverContent")
-                if not server_content:
-                    continue
+                        if msg.resumption_handle:
+                            self.resumption_handle = msg.resumption_handle
+                        if msg.go_away:
+                            logger.info("[%s] Gemini goAway: connection will close soon (%s)",
+                                        self.session_id, (msg.data or {}).get("goAway"))
 
-                if server_content.get("turnComplete"):
-                    logger.info("[%s] Gemini turn complete (AI finished speaking)", self.session_id)
-                    self.ai_speaking = False
+                        if msg.interrupted:
+                            # Generation was cut off; anything in this message is stale.
+                            self._interruptions += 1
+                            self.ai_speaking = False
+                            logger.info("[%s] Gemini interrupted (user barge-in)", self.session_id)
+                            yield Interrupted(time.monotonic())
+                            continue
 
-                model_turn = server_content.get("modelTurn")
-                if not model_turn:
-                    continue
+                        for audio_bytes in msg.audio:
+                            if not audio_bytes:
+                                continue
+                            self.ai_speaking = True
+                            self._recv_audio_chunks += 1
+                            self._recv_audio_bytes += len(audio_bytes)
+                            metrics.GEMINI_IN_MESSAGES.inc()
+                            metrics.GEMINI_IN_BYTES.inc(len(audio_bytes))
+                            yield audio_bytes
 
-                for part in model_turn.get("parts", []):
-                    inline_data = part.get("inlineData")
-                    if not inline_data:
-                        continue
+                        if msg.transcript:
+                            yield Transcript(msg.transcript)
 
-                    b64_audio = inline_data.get("data")
-                    if not b64_audio:
+                        if msg.turn_complete:
+                            logger.info("[%s] Gemini turn complete (AI finished speaking)", self.session_id)
+                            self.ai_speaking = False
+                            yield TURN_COMPLETE
+                    except Exception:
+                        logger.exception("[%s] Error parsing Gemini message", self.session_id)
                         continue
+                reason = "closed by server (code %s)" % getattr(ws, "close_code", None)
+            except websockets.ConnectionClosed as e:
+                if not self.can_reconnect:
+                    raise
+                reason = str(e) or type(e).__name__
 
-                    self.ai_speaking = True
-                    audio_bytes = base64.b64decode(b64_audio)
-                    self._recv_audio_chunks += 1
-                    self._recv_audio_bytes += len(audio_bytes)
-                    yield audio_bytes
-            except Exception:
-                logger.exception("[%s] Error parsing Gemini message", self.session_id)
+            if not self.can_reconnect:
+                return
+            event = await self._reconnect(ws, reason)
+            if event is None:
+                return
+            yield event
+
+    async def _reconnect(self, lost_ws, reason: str) -> Optional[Reconnected]:
+        self._connection_lost(lost_ws)
+        self.ai_speaking = False
+        attempts = settings.GEMINI_RECONNECT_ATTEMPTS
+        logger.warning(
+            "[%s] Gemini connection lost (%s); reconnecting (%s)",
+            self.session_id,
+            reason,
+            "resuming session" if self.resumption_handle else "no resumption handle, context will be lost",
+        )
+        delay = settings.GEMINI_RECONNECT_BACKOFF_MS / 1000
+        for attempt in range(1, attempts + 1):
+            if self._closing:
+                return None
+            # Last try without the handle, in case it is what the server rejects.
+            resume = self.resumption_handle is not None and (attempt < attempts or attempts == 1)
+            try:
+                await self.connect(resume=resume)
+            except Exception as e:
+                logger.warning("[%s] Gemini reconnect attempt %d/%d failed: %s", self.session_id, attempt, attempts, e)
+                if attempt < attempts:
+                    await asyncio.sleep(delay)
+                    delay *= 2
                 continue
 
+            recovery = time.monotonic() - self._lost_at
+            self.reconnecting = False
+            self.reconnects += 1
+            self.recovery_max = max(self.recovery_max, recovery)
+            if resume:
+                self.resumed_reconnects += 1
+            metrics.GEMINI_RECONNECTS.labels("resumed" if resume else "fresh").inc()
+            metrics.GEMINI_RECOVERY.observe(recovery)
+            logger.info(
+                "[%s] Gemini reconnected in %.0fms (%s)",
+                self.session_id,
+                recovery * 1000,
+                "session resumed" if resume else "new session",
+            )
+            return Reconnected(recovery, resume)
+
+        self.reconnect_failures += 1
+        metrics.GEMINI_RECONNECTS.labels("failed").inc()
+        logger.error("[%s] Gemini reconnect failed after %d attempts", self.session_id, attempts)
+        return None
+
     async def close(self) -> None:
+        self._closing = True
         if not self.ws:
             return
 
         try:
-            await self.ws.send(json.dumps({"realtime_input": {"audio_stream_end": True}}))
+            await self.end_audio_stream()
         except Exception:
             pass
 
@@ -172,10 +398,20 @@ class GeminiLiveService:
             await self.ws.close()
         finally:
             logger.info(
-                "[%s] Gemini ws closed (sent: %d chunks / %d bytes, recv: %d chunks / %d bytes)",
+                "[%s] Gemini ws closed (sent: %d chunks / %d bytes, recv: %d chunks / %d bytes, interruptions: %d)",
                 self.session_id,
                 self._sent_audio_chunks,
                 self._sent_audio_bytes,
                 self._recv_audio_chunks,
                 self._recv_audio_bytes,
+                self._interruptions,
             )
+            if self.reconnects or self.reconnect_failures:
+                logger.info(
+                    "[%s] Gemini failover: %d reconnects (%d resumed, %d failed), max recovery %.0fms",
+                    self.session_id,
+                    self.reconnects,
+                    self.resumed_reconnects,
+                    self.reconnect_failures,
+                    self.recovery_max * 1000,
+                )
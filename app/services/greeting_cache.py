@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import hashlib
+import logging
+import os
+import random
+from typing import List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class GreetingCache:
+    """
+    LRU cache of rendered greeting audio, persisted to disk.
+
+    Entries are keyed on everything that shapes the greeting (model, voice,
+    system prompt, trigger text) and hold up to ``variants`` PCM renderings so
+    repeat visitors don't always hear the identical take. Each rendering is
+    stored with its transcript (a ``.txt`` next to the ``.pcm``), which is what
+    the model is told it said when that rendering is played. Disk reads and
+    writes run in a worker thread.
+    """
+
+    def __init__(self, directory: str, *, variants: int, max_entries: int):
+        self.directory = directory
+        self.variants = variants
+        self.max_entries = max_entries
+        # key -> [(pcm, transcript), ...]
+        self._entries: "collections.OrderedDict[str, List[Tuple[bytes, str]]]" = collections.OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, voice: str, system_prompt: str, trigger: str) -> str:
+        digest = hashlib.sha256("\x00".join((model, voice, system_prompt, trigger)).encode("utf-8"))
+        return digest.hexdigest()[:24]
+
+    def _paths(self, key: str) -> List[str]:
+        try:
+            names = sorted(n for n in os.listdir(self.directory) if n.startswith(key) and n.endswith(".pcm"))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, n) for n in names]
+
+    def _load(self, key: str) -> List[Tuple[bytes, str]]:
+        variants = []
+        for path in self._paths(key):
+            if len(variants) == self.variants:
+                break
+            try:
+                with open(path[:-4] + ".txt", encoding="utf-8") as f:
+                    transcript = f.read()
+            except FileNotFoundError:
+                # Rendering without a transcript (older cache): it can't be seeded, so re-render it.
+                os.remove(path)
+                continue
+            with open(path, "rb") as f:
+                variants.append((f.read(), transcript))
+            os.utime(path)  # mtime doubles as the on-disk LRU clock
+        return variants
+
+    def _store(self, key: str, pcm: bytes, transcript: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        index = 0
+        while os.path.exists(os.path.join(self.directory, f"{key}_{index}.pcm")):
+            index += 1
+        path = os.path.join(self.directory, f"{key}_{index}.pcm")
+        # Transcript first: a .pcm on disk always has its .txt.
+        for target, data in ((path[:-4] + ".txt", transcript.encode("utf-8")), (path, pcm)):
+            tmp = target + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+
+        # Evict least recently used files beyond what the cache may hold.
+        files = [os.path.join(self.directory, n) for n in os.listdir(self.directory) if n.endswith(".pcm")]
+        excess = len(files) - self.max_entries * self.variants
+        if excess > 0:
+            for stale in sorted(files, key=os.path.getmtime)[:excess]:
+                os.remove(stale)
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(stale[:-4] + ".txt")
+
+    async def _variants(self, key: str) -> List[Tuple[bytes, str]]:
+        variants = self._entries.get(key)
+        if variants is None:
+            variants = await asyncio.to_thread(self._load, key)
+            self._entries[key] = variants
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self._entries.move_to_end(key)
+        return variants
+
+    async def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """Returns a random ``(pcm, transcript)`` variant, or None while the entry still needs renderings."""
+        variants = await self._variants(key)
+        if len(variants) < self.variants:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return random.choice(variants)
+
+    async def put(self, key: str, pcm: bytes, transcript: str) -> None:
+        try:
+            variants = await self._variants(key)
+            if len(variants) >= self.variants or not pcm or not transcript:
+                return
+            variants.append((pcm, transcript))
+            await asyncio.to_thread(self._store, key, pcm, transcript)
+        except Exception as e:
+            # Caching is best effort: the greeting was already played live.
+            logger.warning("Could not persist greeting variant: %s", e)
+            return
+        logger.info("Greeting cache: stored variant %d/%d (%d bytes)", len(variants), self.variants, len(pcm))
+
+    def put_soon(self, key: str, pcm: bytes, transcript: str) -> None:
+        """Stores a rendering in the background, without holding up the session."""
+        task = asyncio.ensure_future(self.put(key, pcm, transcript))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+greeting_cache = GreetingCache(
+    settings.GREETING_CACHE_DIR,
+    variants=settings.GREETING_VARIANTS,
+    max_entries=settings.GREETING_CACHE_MAX_ENTRIES,
+)
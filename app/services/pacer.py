@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Gaps shorter than this (scheduling jitter) are not counted as underruns.
+UNDERRUN_TOLERANCE = 0.02
+
+
+class DownstreamPacer:
+    """
+    Releases downstream audio at playback rate plus a bounded lead.
+
+    The browser schedules chunks back to back from the moment they arrive, so
+    the pacer can track when it will finish playing everything sent so far.
+    Audio is sent in slices of at most ``max_slice`` seconds, each one only once
+    that lead has dropped to ``max_lead``. The client never holds much more
+    than ``max_lead`` seconds of audio, so interruptions stay cheap and network
+    stalls show up as underruns instead of being hidden by a deep buffer.
+    ``max_lead <= 0`` sends everything immediately; the counters still work.
+
+    ``interrupt()`` (barge-in) drops the rest of whatever is being held and
+    restarts the clock; ``end_turn()`` marks the end of a model turn so the gap
+    before the next one isn't counted as an underrun.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[bytes], Awaitable[None]],
+        *,
+        sample_rate: int,
+        max_lead: float,
+        max_slice: float = 0.1,
+        session_id: str = "",
+    ):
+        self._send = send
+        self.bytes_per_second = sample_rate * 2
+        self.max_lead = max_lead
+        self.slice_bytes = max(2, int(self.bytes_per_second * max_slice) & ~1)
+        self.session_id = session_id
+
+        self._play_end = 0.0
+        self._in_turn = False
+        self._generation = 0
+        self._waiter: Optional[asyncio.Future] = None
+
+        self.slices_out = 0
+        self.held_seconds = 0.0
+        self.underruns = 0
+        self.underrun_seconds = 0.0
+        self.lead_samples = 0
+        self.lead_sum = 0.0
+        self.lead_max = 0.0
+        self.stalls = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_lead > 0
+
+    def lead(self) -> float:
+        """Seconds of audio the client is expected to have buffered right now."""
+        return max(0.0, self._play_end - time.monotonic())
+
+    async def send(self, pcm: bytes) -> None:
+        generation = self._generation
+        step = self.slice_bytes if self.enabled else max(1, len(pcm))
+        for offset in range(0, len(pcm), step):
+            piece = pcm if step >= len(pcm) else pcm[offset : offset + step]
+            if self.enabled:
+                wait = self.lead() - self.max_lead
+                if wait > 0:
+                    self.held_seconds += wait
+                    await self._hold(wait)
+            if generation != self._generation:
+                return  # Barge-in since this chunk was dequeued: the rest is stale.
+
+            now = time.monotonic()
+            if self._in_turn and now - self._play_end > UNDERRUN_TOLERANCE:
+                # Mid-turn and the client already ran dry: an audible gap.
+                self.underruns += 1
+                self.underrun_seconds += now - self._play_end
+                metrics.DOWNSTREAM_UNDERRUNS.inc()
+            self._in_turn = True
+            self._play_end = max(now, self._play_end) + len(piece) / self.bytes_per_second
+            self.slices_out += 1
+            await self._send(piece)
+
+    async def _hold(self, seconds: float) -> None:
+        loop = asyncio.get_running_loop()
+        self._waiter = loop.create_future()
+        timer = loop.call_later(seconds, self._wake)
+        try:
+            await self._waiter
+        finally:
+            timer.cancel()
+            self._waiter = None
+
+    def _wake(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def interrupt(self) -> None:
+        """The client is stopping playback: drop held audio and restart the clock."""
+        self._generation += 1
+        self._play_end = 0.0
+        self._in_turn = False
+        self._wake()
+
+    def end_turn(self) -> None:
+        self._in_turn = False
+
+    def observe_client(self, buffered: Optional[float]) -> None:
+        """
+        Records the client's lead from a ping (``buffered`` seconds of scheduled
+        audio, or None if the client didn't report it: the server estimate is used).
+        """
+        estimate = self.lead()
+        if buffered is None:
+            buffered = estimate
+        elif buffered <= 0 and self._in_turn and estimate >= self.slice_bytes / self.bytes_per_second:
+            # Audio we sent a while ago hasn't reached the player: the network is stalling.
+            self.stalls += 1
+        if buffered <= 0 and not self._in_turn:
+            return  # Idle between turns; not a lead sample.
+        self.lead_samples += 1
+        self.lead_sum += buffered
+        self.lead_max = max(self.lead_max, buffered)
+        metrics.CLIENT_LEAD.observe(buffered)
+
+    def stats(self) -> dict:
+        return {
+            "slices_out": self.slices_out,
+            "held_s": self.held_seconds,
+            "underruns": self.underruns,
+            "underrun_ms": self.underrun_seconds * 1000,
+            "avg_lead_ms": self.lead_sum / self.lead_samples * 1000 if self.lead_samples else 0.0,
+            "max_lead_ms": self.lead_max * 1000,
+            "stalls": self.stalls,
+        }
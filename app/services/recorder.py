@@ -0,0 +1,257 @@
+"""
+Opt-in QA capture of session audio to WAV, without disk I/O on the event loop.
+
+Sessions hand PCM to a bounded deque (append/popleft are atomic, so the event
+loop never takes a lock); one background thread drains it every
+``poll_interval`` and writes through large buffered files. Each session gets
+a mic and a bot track. Gaps in a track are filled with silence so the two
+files line up in time. Files rotate by size or age, and the WAV header is
+patched with the real data size when a file is finished. If the disk falls
+behind and the backlog exceeds ``max_pending_bytes``, new audio is dropped
+and counted rather than stalling the session.
+"""
+from __future__ import annotations
+
+import collections
+import datetime
+import logging
+import os
+import threading
+import time
+from typing import Deque, Dict, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Silence shorter than this between chunks is jitter, not a gap worth filling.
+_GAP_TOLERANCE = 0.05
+_CLOSE = None
+
+
+def _wav_header(sample_rate: int, data_size: int) -> bytes:
+    # Writer thread only; keeps audio_utils (numpy) out of the app's import path.
+    from app.services.audio_utils import AudioProcessor
+    return AudioProcessor.create_wav_header(sample_rate, 1, 16, data_size)
+
+
+class _Track:
+    """One recorded stream. Producer fields are only touched on the event loop, writer fields on the writer thread."""
+
+    def __init__(self, base_path: str, sample_rate: int, started: float):
+        self.base_path = base_path
+        self.sample_rate = sample_rate
+        # Tracks of a session share this origin, so their files line up.
+        self.timeline_start = started
+        # Producer side
+        self.queued_bytes = 0
+        self.dropped_chunks = 0
+        self.dropped_bytes = 0
+        # Writer side
+        self.file = None
+        self.part = 0
+        self.file_bytes = 0
+        self.file_opened = 0.0
+        self.timeline_bytes = 0
+        self.written_bytes = 0
+        self.paths = []
+
+
+class RecordingWriter:
+    def __init__(
+        self,
+        directory: str,
+        *,
+        max_pending_bytes: int,
+        rotate_bytes: int,
+        rotate_seconds: float,
+        buffer_bytes: int = 1 << 20,
+        poll_interval: float = 0.1,
+    ):
+        self.directory = directory
+        self.max_pending_bytes = max_pending_bytes
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.buffer_bytes = buffer_bytes
+        self.poll_interval = poll_interval
+
+        self._queue: Deque[Tuple[_Track, float, Optional[bytes]]] = collections.deque()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        # Pending = enqueued - dequeued; each counter has a single writer thread.
+        self._enqueued_bytes = 0
+        self._dequeued_bytes = 0
+
+        self.files_finished = 0
+        self.write_errors = 0
+
+    @classmethod
+    def from_settings(cls) -> "RecordingWriter":
+        return cls(
+            settings.RECORDING_DIR,
+            max_pending_bytes=settings.RECORDING_QUEUE_MAX_MB << 20,
+            rotate_bytes=settings.RECORDING_ROTATE_MB << 20,
+            rotate_seconds=settings.RECORDING_ROTATE_S,
+        )
+
+    @property
+    def pending_bytes(self) -> int:
+        return self._enqueued_bytes - self._dequeued_bytes
+
+    def _ensure_started(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+            self._thread.start()
+            logger.info("Recording writer started (dir=%s)", self.directory)
+
+    # --- Event loop side -------------------------------------------------
+
+    def track(self, session_id: str, name: str, sample_rate: int, started: float) -> _Track:
+        self._ensure_started()
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        return _Track(os.path.join(self.directory, f"{stamp}-{session_id}-{name}"), sample_rate, started)
+
+    def write(self, track: _Track, pcm: bytes) -> bool:
+        """Queues audio for ``track``; returns False (and counts it) if it had to be dropped."""
+        if self.pending_bytes + len(pcm) > self.max_pending_bytes:
+            track.dropped_chunks += 1
+            track.dropped_bytes += len(pcm)
+            metrics.RECORDING_DROPPED_BYTES.inc(len(pcm))
+            return False
+        track.queued_bytes += len(pcm)
+        self._enqueued_bytes += len(pcm)
+        self._queue.append((track, time.monotonic(), pcm))
+        return True
+
+    def close_track(self, track: _Track) -> None:
+        self._queue.append((track, time.monotonic(), _CLOSE))
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Finishes everything queued and closes all files (blocking)."""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._thread.join(timeout)
+        self._thread = None
+
+    # --- Writer thread ---------------------------------------------------
+
+    def _run(self) -> None:
+        open_tracks: Dict[int, _Track] = {}
+        while True:
+            if not self._queue:
+                if self._stopping:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+            track, at, pcm = self._queue.popleft()
+            try:
+                if pcm is _CLOSE:
+                    self._finish(track)
+                    open_tracks.pop(id(track), None)
+                    continue
+                self._dequeued_bytes += len(pcm)
+                open_tracks[id(track)] = track
+                self._append(track, at, pcm)
+            except OSError as e:
+                self.write_errors += 1
+                logger.error("Recording write to %s failed: %s", track.base_path, e)
+
+        for track in open_tracks.values():
+            try:
+                self._finish(track)
+            except OSError as e:
+                logger.error("Recording close of %s failed: %s", track.base_path, e)
+
+    def _append(self, track: _Track, at: float, pcm: bytes) -> None:
+        bytes_per_second = track.sample_rate * 2
+        # Keep the tracks aligned: pad with silence up to where this chunk began.
+        gap = at - len(pcm) / bytes_per_second - (track.timeline_start + track.timeline_bytes / bytes_per_second)
+        if gap > _GAP_TOLERANCE:
+            silence = int(gap * bytes_per_second) & ~1
+            while silence > 0:
+                piece = min(silence, self.buffer_bytes)
+                self._write(track, bytes(piece))
+                silence -= piece
+        self._write(track, pcm)
+
+    def _write(self, track: _Track, data: bytes) -> None:
+        if track.file is not None and track.file_bytes > 0 and (
+            track.file_bytes + len(data) > self.rotate_bytes
+            or (self.rotate_seconds > 0 and time.monotonic() - track.file_opened >= self.rotate_seconds)
+        ):
+            self._finish(track)
+        if track.file is None:
+            self._open(track)
+        track.file.write(data)
+        track.file_bytes += len(data)
+        track.timeline_bytes += len(data)
+        track.written_bytes += len(data)
+
+    def _open(self, track: _Track) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        track.part += 1
+        path = f"{track.base_path}-{track.part:03d}.wav"
+        track.file = open(path, "wb", buffering=self.buffer_bytes)
+        # Placeholder sizes; patched in _finish.
+        track.file.write(_wav_header(track.sample_rate, 0))
+        track.file_bytes = 0
+        track.file_opened = time.monotonic()
+        track.paths.append(path)
+
+    def _finish(self, track: _Track) -> None:
+        if track.file is None:
+            return
+        f, track.file = track.file, None
+        try:
+            f.flush()
+            f.seek(0)
+            f.write(_wav_header(track.sample_rate, track.file_bytes))
+        finally:
+            f.close()
+        self.files_finished += 1
+
+    def stats(self) -> dict:
+        return {
+            "pending_bytes": self.pending_bytes,
+            "files_finished": self.files_finished,
+            "write_errors": self.write_errors,
+        }
+
+
+class SessionRecorder:
+    """Mic and bot tracks for one session; every call returns immediately."""
+
+    def __init__(self, writer: RecordingWriter, session_id: str, sample_rate: int):
+        self.writer = writer
+        self.session_id = session_id
+        started = time.monotonic()
+        self.mic = writer.track(session_id, "mic", sample_rate, started)
+        self.bot = writer.track(session_id, "bot", sample_rate, started)
+
+    def record_mic(self, pcm: bytes) -> None:
+        if pcm:
+            self.writer.write(self.mic, pcm)
+
+    def record_bot(self, pcm: bytes) -> None:
+        if pcm:
+            self.writer.write(self.bot, pcm)
+
+    def close(self) -> None:
+        self.writer.close_track(self.mic)
+        self.writer.close_track(self.bot)
+        dropped = self.mic.dropped_chunks + self.bot.dropped_chunks
+        logger.info(
+            "[%s] Recording: mic %d bytes, bot %d bytes queued to %s, %d chunks (%d bytes) dropped",
+            self.session_id,
+            self.mic.queued_bytes,
+            self.bot.queued_bytes,
+            self.writer.directory,
+            dropped,
+            self.mic.dropped_bytes + self.bot.dropped_bytes,
+        )
+
+
+recording_writer = RecordingWriter.from_settings()
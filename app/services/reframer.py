@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from typing import List
+
+
+class PlaybackReframer:
+    """
+    Cuts downstream PCM into fixed-size playback frames.
+
+    Gemini's ``inlineData`` parts range from a few milliseconds to hundreds,
+    and the browser turns every frame it receives into its own AudioBuffer and
+    source node, so tiny frames mean scheduling jitter and garbage on weak
+    devices. Audio is buffered here and released in frames of exactly
+    ``frame_bytes``; the remainder waits for more audio. ``flush()`` releases a
+    short final frame (end of turn, codec switch, or the caller deciding it
+    has waited long enough), and ``clear()`` drops it (barge-in).
+
+    ``frame_bytes <= 0`` disables reframing: each part is passed through.
+    """
+
+    def __init__(self, frame_bytes: int, *, session_id: str = ""):
+        self.frame_bytes = frame_bytes & ~1
+        self.session_id = session_id
+        self._pending = bytearray()
+        # Bumped by clear(); frames cut before a barge-in are stale after it.
+        self.generation = 0
+
+        self.parts_in = 0
+        self.frames_out = 0
+        self.short_frames = 0
+        self.dropped_bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.frame_bytes > 0
+
+    @property
+    def pending_bytes(self) -> int:
+        return len(self._pending)
+
+    def push(self, pcm: bytes) -> List[bytes]:
+        """Adds a part; returns the full frames now available (possibly none)."""
+        if not pcm:
+            return []
+        self.parts_in += 1
+        if not self.enabled:
+            self.frames_out += 1
+            return [pcm]
+
+        size = self.frame_bytes
+        if not self._pending and len(pcm) == size:
+            self.frames_out += 1
+            return [pcm]
+        self._pending += pcm
+        count = len(self._pending) // size
+        if not count:
+            return []
+        view = memoryview(self._pending)
+        frames = [bytes(view[i * size : (i + 1) * size]) for i in range(count)]
+        view.release()
+        del self._pending[: count * size]
+        self.frames_out += count
+        return frames
+
+    def flush(self) -> bytes:
+        """Returns the held remainder as a short frame (b"" if nothing is held)."""
+        if not self._pending:
+            return b""
+        frame = bytes(self._pending)
+        self._pending.clear()
+        self.frames_out += 1
+        self.short_frames += 1
+        return frame
+
+    def clear(self) -> int:
+        """Drops the held remainder; returns the bytes dropped."""
+        dropped = len(self._pending)
+        self._pending.clear()
+        self.dropped_bytes += dropped
+        self.generation += 1
+        return dropped
+
+    def stats(self) -> dict:
+        return {
+            "parts_in": self.parts_in,
+            "frames_out": self.frames_out,
+            "short_frames": self.short_frames,
+            "dropped_bytes": self.dropped_bytes,
+        }
@@ -0,0 +1,373 @@
+"""
+Offline batch run of recorded mic audio through the server's upstream pipeline.
+
+For tuning resampling, VAD and coalescing without a browser: every WAV file
+under the given paths is memory-mapped and fed, chunk by chunk as a client
+would send it, through ``AudioProcessor`` (resample to the Gemini rate), the
+``VoiceActivityDetector`` and the upstream coalescing rules, one file per
+worker process. With ``--gemini`` (or ``--mock``, which starts a local
+stand-in) the coalesced messages are also sent through ``GeminiLiveService``.
+
+Audio runs as fast as the CPU allows, so coalescing is replayed in stream
+time: a message goes out once ``--coalesce-ms`` of audio is buffered or the
+oldest frame is ``--max-delay-ms`` old, as ``FrameCoalescer`` does in real time.
+
+Writes one CSV row per file (duration, wall and CPU time, speed vs real time,
+speech fraction, segments, upstream messages, added latency, ...) and prints
+a summary. Pages of a file are released as soon as they've been processed and
+rows are written as files finish, so memory stays flat however big the corpus.
+
+Usage:
+    python -m benchmarks.batch_pipeline recordings/ [--workers 8] [--out stats.csv]
+        [--vad-energy-dbfs -45] [--coalesce-ms 60] [--mock]
+"""
+import argparse
+import asyncio
+import csv
+import mmap
+import multiprocessing
+import os
+import resource
+import struct
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+
+FIELDS = [
+    "path", "seconds", "sample_rate", "channels", "wall_s", "cpu_s", "x_realtime", "bytes_out",
+    "speech_pct", "speech_segments", "upstream_msgs", "msgs_per_s", "coalesce_avg_ms", "coalesce_max_ms",
+    "sent_bytes", "model_audio_bytes", "error",
+]
+_PAGE = mmap.PAGESIZE
+
+
+class WavFile:
+    """A memory-mapped WAV file (PCM16 or float32, any rate and channel count)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            self._file.close()
+            raise ValueError("empty file")
+        if hasattr(self.map, "madvise"):
+            self.map.madvise(mmap.MADV_SEQUENTIAL)
+        self.format_tag = self.channels = self.sample_rate = self.bits = 0
+        self.data_offset = self.data_size = 0
+        try:
+            self._parse()
+        except Exception:
+            self.close()
+            raise
+
+    def _parse(self) -> None:
+        m = self.map
+        if len(m) < 12 or m[0:4] != b"RIFF" or m[8:12] != b"WAVE":
+            raise ValueError("not a RIFF/WAVE file")
+        pos = 12
+        while pos + 8 <= len(m):
+            chunk_id, size = m[pos : pos + 4], struct.unpack_from("<I", m, pos + 4)[0]
+            body = pos + 8
+            if chunk_id == b"fmt ":
+                self.format_tag, self.channels, self.sample_rate = struct.unpack_from("<HHI", m, body)
+                self.bits = struct.unpack_from("<H", m, body + 14)[0]
+                if self.format_tag == 0xFFFE and size >= 40:  # WAVE_FORMAT_EXTENSIBLE: real tag in the GUID
+                    self.format_tag = struct.unpack_from("<H", m, body + 24)[0]
+            elif chunk_id == b"data":
+                self.data_offset = body
+                # Recorders that never patched the header leave 0 (or 0xFFFFFFFF): use the rest of the file.
+                self.data_size = size if 0 < size <= len(m) - body else len(m) - body
+                break
+            pos = body + size + (size & 1)
+        if not self.data_offset:
+            raise ValueError("no data chunk")
+        if (self.format_tag, self.bits) not in ((1, 16), (3, 32)):
+            raise ValueError(f"unsupported encoding (format {self.format_tag}, {self.bits}-bit)")
+
+    @property
+    def block_align(self) -> int:
+        return self.channels * self.bits // 8
+
+    @property
+    def seconds(self) -> float:
+        return self.data_size / self.block_align / self.sample_rate
+
+    def chunks(self, chunk_ms: int) -> Iterator[bytes]:
+        """Yields ``chunk_ms`` slices of the data chunk, releasing pages already read."""
+        step = max(1, self.sample_rate * chunk_ms // 1000) * self.block_align
+        end = self.data_offset + self.data_size
+        released = self.data_offset - self.data_offset % _PAGE
+        for start in range(self.data_offset, end, step):
+            yield self.map[start : min(start + step, end)]
+            done = (start + step) - (start + step) % _PAGE
+            if done - released >= 64 * _PAGE and hasattr(self.map, "madvise"):
+                # Clean file-backed pages: dropping them keeps RSS flat on long files.
+                self.map.madvise(mmap.MADV_DONTNEED, released, done - released)
+                released = done
+
+    def close(self) -> None:
+        self.map.close()
+        self._file.close()
+
+
+class CoalescingModel:
+    """``FrameCoalescer``'s flush rules replayed in stream time instead of wall time."""
+
+    def __init__(self, max_bytes: int, max_delay: float):
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self._frames: List[Tuple[bytes, float]] = []
+        self._buffered = 0
+        self.frames_in = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+
+    def push(self, frame: bytes, at: float) -> List[bytes]:
+        """Returns the messages sent by the time ``frame`` arrives at stream time ``at``."""
+        self.frames_in += 1
+        if self.max_bytes <= 0 or self.max_delay <= 0:
+            return [frame]
+        out = []
+        if self._frames and at - self._frames[0][1] >= self.max_delay:
+            out += self.flush(self._frames[0][1] + self.max_delay)
+        self._frames.append((frame, at))
+        self._buffered += len(frame)
+        if self._buffered >= self.max_bytes:
+            out += self.flush(at)
+        return out
+
+    def flush(self, at: float) -> List[bytes]:
+        if not self._frames:
+            return []
+        for _, arrived in self._frames:
+            self.latency_sum += at - arrived
+        self.latency_max = max(self.latency_max, at - self._frames[0][1])
+        message = b"".join(frame for frame, _ in self._frames)
+        self._frames = []
+        self._buffered = 0
+        return [message]
+
+
+# --- Worker process ------------------------------------------------------------
+
+_options: Optional[argparse.Namespace] = None
+
+
+def _init_worker(options: argparse.Namespace) -> None:
+    global _options
+    _options = options
+    # Build filters and load numpy up front, so the first file's timings aren't skewed.
+    from app.services import audio_utils
+    audio_utils.warm_up(settings.GEMINI_SAMPLE_RATE)
+
+
+def _process_file(path: str) -> Dict[str, object]:
+    row: Dict[str, object] = {"path": path, "error": ""}
+    try:
+        wav = WavFile(path)
+    except (OSError, ValueError) as e:
+        row["error"] = str(e)
+        return row
+    try:
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        row.update(asyncio.run(_run_pipeline(wav, _options)))
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        row.update({
+            "seconds": round(wav.seconds, 3),
+            "sample_rate": wav.sample_rate,
+            "channels": wav.channels,
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            "x_realtime": round(wav.seconds / wall, 1) if wall > 0 else 0.0,
+        })
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        wav.close()
+    return row
+
+
+async def _run_pipeline(wav: WavFile, options: argparse.Namespace) -> Dict[str, object]:
+    import numpy as np
+    from app.services.audio_utils import AudioProcessor, VoiceActivityDetector
+
+    rate = settings.GEMINI_SAMPLE_RATE
+    processor = AudioProcessor(input_rate=wav.sample_rate, output_rate=rate)
+    vad = None if options.no_vad else VoiceActivityDetector(
+        rate,
+        energy_dbfs=options.vad_energy_dbfs,
+        zcr_max=options.vad_zcr_max,
+        hangover_ms=options.vad_hangover_ms,
+        preroll_ms=options.vad_preroll_ms,
+    )
+    coalescer = CoalescingModel(rate * 2 * options.coalesce_ms // 1000, options.max_delay_ms / 1000)
+    input_format = "int16" if wav.bits == 16 else "float32"
+    dtype = np.int16 if wav.bits == 16 else np.float32
+
+    send = bool(options.gemini)
+    service = receiver = None
+    model_audio = [0]
+    if send:
+        from app.services.gemini_service import GeminiLiveService
+        service = GeminiLiveService(session_id=os.path.basename(wav.path)[:16])
+        service.uri = options.gemini
+        await service.connect()
+
+        async def drain():
+            async for event in service.receive():
+                if isinstance(event, bytes):
+                    model_audio[0] += len(event)
+        receiver = asyncio.create_task(drain())
+
+    messages = bytes_out = sent_bytes = segments = 0
+    stream_time = 0.0
+    try:
+        for chunk in wav.chunks(options.chunk_ms):
+            stream_time += len(chunk) / wav.block_align / wav.sample_rate
+            if wav.channels > 1:
+                samples = np.frombuffer(chunk, dtype=dtype).reshape(-1, wav.channels).mean(axis=1)
+                data = samples.astype(dtype).tobytes()
+            else:
+                data = chunk
+            pcm = processor.resample_audio(data, input_format=input_format)
+            if not pcm:
+                continue
+            bytes_out += len(pcm)
+            if vad is None:
+                frames, speech_ended = [pcm], False
+            else:
+                frames, speech_ended = vad.process(pcm)
+            outgoing = []
+            for frame in frames:
+                outgoing += coalescer.push(frame, stream_time)
+            if speech_ended:
+                segments += 1
+                outgoing += coalescer.flush(stream_time)
+            for message in outgoing:
+                messages += 1
+                if service is not None:
+                    await service.send_audio(message)
+                    sent_bytes += len(message)
+            if speech_ended and service is not None:
+                await service.end_audio_stream()
+        for message in coalescer.flush(stream_time):
+            messages += 1
+            if service is not None:
+                await service.send_audio(message)
+                sent_bytes += len(message)
+    finally:
+        if service is not None:
+            await service.close()
+            receiver.cancel()
+            await asyncio.gather(receiver, return_exceptions=True)
+
+    speech_pct = 100.0 if vad is None else round((1 - vad.suppressed_fraction) * 100, 1)
+    return {
+        "bytes_out": bytes_out,
+        "speech_pct": speech_pct,
+        "speech_segments": segments if vad is not None else "",
+        "upstream_msgs": messages,
+        "msgs_per_s": round(messages / stream_time, 2) if stream_time else 0.0,
+        "coalesce_avg_ms": round(coalescer.latency_sum / coalescer.frames_in * 1000, 2) if coalescer.frames_in else 0.0,
+        "coalesce_max_ms": round(coalescer.latency_max * 1000, 2),
+        "sent_bytes": sent_bytes if send else "",
+        "model_audio_bytes": model_audio[0] if send else "",
+    }
+
+
+# --- Parent process -------------------------------------------------------------
+
+def find_wavs(paths: List[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(".wav"):
+                    yield os.path.join(root, name)
+
+
+def _start_mock(port: int) -> str:
+    """Runs the Gemini stand-in on a background thread of this process; returns its URI."""
+    from benchmarks.mock_gemini import MockGeminiServer
+
+    ready = threading.Event()
+
+    def run() -> None:
+        async def serve() -> None:
+            mock = MockGeminiServer(turn_seconds=0.5, first_audio_delay_ms=0, speed=20.0)
+            async with mock.serve("127.0.0.1", port):
+                ready.set()
+                await asyncio.Event().wait()
+        asyncio.run(serve())
+
+    threading.Thread(target=run, name="mock-gemini", daemon=True).start()
+    if not ready.wait(10):
+        raise SystemExit(f"mock Gemini did not start on port {port}")
+    return f"ws://127.0.0.1:{port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("paths", nargs="+", help="WAV files or directories (searched recursively)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", default="batch_stats.csv", help="Per-file CSV ('-' for stdout)")
+    parser.add_argument("--chunk-ms", type=int, default=20, help="Client chunk size")
+    parser.add_argument("--no-vad", action="store_true", help="Forward everything, like VAD_ENABLED=0")
+    parser.add_argument("--vad-energy-dbfs", type=float, default=settings.VAD_ENERGY_DBFS)
+    parser.add_argument("--vad-zcr-max", type=float, default=settings.VAD_ZCR_MAX)
+    parser.add_argument("--vad-hangover-ms", type=int, default=settings.VAD_HANGOVER_MS)
+    parser.add_argument("--vad-preroll-ms", type=int, default=settings.VAD_PREROLL_MS)
+    parser.add_argument("--coalesce-ms", type=int, default=settings.UPSTREAM_COALESCE_MS)
+    parser.add_argument("--max-delay-ms", type=int, default=settings.UPSTREAM_MAX_DELAY_MS)
+    parser.add_argument("--gemini", default=None, metavar="URI",
+                        help="Also send the messages to this Gemini Live stand-in")
+    parser.add_argument("--mock", action="store_true", help="Start benchmarks.mock_gemini and send to it")
+    parser.add_argument("--mock-port", type=int, default=9100)
+    options = parser.parse_args()
+    if options.mock:
+        options.gemini = _start_mock(options.mock_port)
+
+    out = sys.stdout if options.out == "-" else open(options.out, "w", newline="")
+    writer = csv.DictWriter(out, fieldnames=FIELDS)
+    writer.writeheader()
+
+    files = errors = 0
+    audio_seconds = cpu_seconds = 0.0
+    started = time.perf_counter()
+    # Spawned, not forked: the parent may be running the mock's event loop on a thread.
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(options.workers, initializer=_init_worker, initargs=(options,)) as pool:
+        for row in pool.imap_unordered(_process_file, find_wavs(options.paths)):
+            writer.writerow(row)
+            out.flush()
+            files += 1
+            if row["error"]:
+                errors += 1
+                print(f"{row['path']}: {row['error']}", file=sys.stderr)
+                continue
+            audio_seconds += row["seconds"]
+            cpu_seconds += row["cpu_s"]
+    wall = time.perf_counter() - started
+    if out is not sys.stdout:
+        out.close()
+
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    summary = sys.stderr if options.out == "-" else sys.stdout
+    print(f"\n{files} files ({errors} failed), {audio_seconds / 3600:.2f}h of audio in {wall:.1f}s "
+          f"with {options.workers} workers: {audio_seconds / wall if wall else 0:.0f}x real time", file=summary)
+    print(f"CPU {cpu_seconds:.1f}s ({cpu_seconds / audio_seconds * 1000 if audio_seconds else 0:.2f}ms per second "
+          f"of audio), peak worker RSS {peak_rss_mb:.0f}MB", file=summary)
+    if options.out != "-":
+        print(f"per-file stats: {options.out}", file=summary)
+
+
+if __name__ == "__main__":
+    main()
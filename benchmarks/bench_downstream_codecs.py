@@ -0,0 +1,104 @@
+"""
+Microbenchmark: encode cost and bandwidth of the downstream (server -> browser) codecs.
+
+Reports, per codec, the wire bitrate per listener, the quality (SNR) after a
+round trip, and the encode CPU needed per session. The latter is measured both
+for a lone session and with chunks from many sessions encoded together, as the
+DSP executor does when several sessions send audio in the same tick.
+
+Usage:
+    python -m benchmarks.bench_downstream_codecs [--chunk-ms 40] [--sessions 1,10,100] [--wav speech.wav]
+"""
+import argparse
+import time
+import wave
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.audio_utils import (
+    DOWNSTREAM_CODECS,
+    adpcm_decode,
+    encode_downstream_many,
+    mulaw_decode,
+)
+
+RATE = settings.GEMINI_SAMPLE_RATE
+
+
+def synthetic_speech(seconds: float) -> np.ndarray:
+    """Voiced harmonics with a wandering pitch, syllable-rate envelope and some noise."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(RATE * seconds)) / RATE
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 20))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 0.5
+    audio = voiced * envelope * 6000 + rng.standard_normal(len(t)) * 150
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+def load_wav(path: str) -> np.ndarray:
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2 or f.getnchannels() != 1:
+            raise SystemExit("--wav must be mono 16-bit PCM")
+        if f.getframerate() != RATE:
+            print(f"note: {path} is {f.getframerate()}Hz, treating it as {RATE}Hz")
+        return np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+
+
+def decode(codec: str, data: bytes) -> bytes:
+    if codec == "mulaw":
+        return mulaw_decode(data)
+    if codec == "adpcm":
+        return adpcm_decode(data)
+    return data
+
+
+def snr_db(reference: np.ndarray, decoded: np.ndarray) -> float:
+    ref = reference.astype(np.float64)
+    noise = np.sum((ref - decoded.astype(np.float64)) ** 2)
+    return float("inf") if noise == 0 else 10 * np.log10(np.sum(ref ** 2) / noise)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunk-ms", type=int, default=40, help="Size of one downstream message")
+    parser.add_argument("--sessions", default="1,10,100", help="Sessions encoded per batch")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Length of the synthetic signal")
+    parser.add_argument("--wav", help="Mono 16-bit speech file to use instead of the synthetic signal")
+    args = parser.parse_args()
+
+    audio = load_wav(args.wav) if args.wav else synthetic_speech(args.seconds)
+    step = RATE * args.chunk_ms // 1000
+    chunks = [audio[i : i + step].tobytes() for i in range(0, len(audio) - step + 1, step)]
+    audio_seconds = len(chunks) * step / RATE
+    sessions = [int(n) for n in args.sessions.split(",")]
+
+    pcm_rate = RATE * 2
+    print(f"{len(chunks)} x {args.chunk_ms}ms chunks ({audio_seconds:.1f}s of audio)")
+    header = f"{'codec':>6} {'kbit/s':>8} {'saved':>6} {'SNR dB':>7}"
+    header += "".join(f" {f'cpu% @{n}':>10}" for n in sessions)
+    print(header)
+    for codec in DOWNSTREAM_CODECS:
+        encoded = encode_downstream_many([(codec, chunk) for chunk in chunks])
+        wire = sum(len(e) for e in encoded) / audio_seconds
+        decoded = np.frombuffer(b"".join(decode(codec, e) for e in encoded), dtype=np.int16)
+        snr = snr_db(np.frombuffer(b"".join(chunks), dtype=np.int16), decoded)
+
+        row = f"{codec:>6} {wire * 8 / 1000:>8.0f} {1 - wire / pcm_rate:>6.0%} {snr:>7.1f}"
+        for n in sessions:
+            # Each batch carries one chunk per session, like a busy DSP executor tick.
+            batches = [[(codec, chunks[(b + s) % len(chunks)]) for s in range(n)] for b in range(len(chunks))]
+            encode_downstream_many(batches[0])
+            started = time.perf_counter()
+            for batch in batches:
+                encode_downstream_many(batch)
+            per_session = (time.perf_counter() - started) / n
+            # Share of one core each session needs to keep up with real time.
+            row += f" {per_session / audio_seconds * 100:>10.3f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
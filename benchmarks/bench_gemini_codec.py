@@ -0,0 +1,104 @@
+"""
+Microbenchmark: Gemini Live message encode/decode cost per frame, comparing
+the template/scan codec with the previous dict + json + base64 path.
+
+Usage:
+    python -m benchmarks.bench_gemini_codec [--iterations 2000]
+"""
+import argparse
+import base64
+import json
+import os
+import time
+import tracemalloc
+
+from app.services import gemini_codec
+from app.services.gemini_codec import RealtimeAudioEncoder, parse_server_message
+
+SAMPLE_RATE = 24000
+
+
+def legacy_encode(pcm: bytes) -> str:
+    b64_audio = base64.b64encode(pcm).decode("utf-8")
+    msg = {
+        "realtime_input": {
+            "audio": {
+                "mime_type": f"audio/pcm;rate={SAMPLE_RATE}",
+                "data": b64_audio,
+            }
+        }
+    }
+    return json.dumps(msg)
+
+
+def legacy_decode(message):
+    out = []
+    data = json.loads(message)
+    server_content = data.get("serverContent") or {}
+    for part in (server_content.get("modelTurn") or {}).get("parts", []):
+        inline_data = part.get("inlineData")
+        if inline_data and inline_data.get("data"):
+            out.append(base64.b64decode(inline_data["data"]))
+    return out
+
+
+def server_message(pcm: bytes, parts: int) -> str:
+    b64 = base64.b64encode(pcm).decode("ascii")
+    return json.dumps({
+        "serverContent": {
+            "modelTurn": {
+                "parts": [{"inlineData": {"mimeType": "audio/pcm;rate=24000", "data": b64}}] * parts
+            }
+        }
+    })
+
+
+def measure(fn, arg, iterations):
+    for _ in range(20):
+        fn(arg)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    us = (time.perf_counter() - start) / iterations * 1e6
+
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return us, peak - base
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    encoder = RealtimeAudioEncoder(SAMPLE_RATE)
+    print(f"JSON backend: {gemini_codec.loads.__module__}")
+    # "heap B" is the transient heap high-water mark (tracemalloc) of a single call.
+    print(f"{'direction':>10} {'payload':>10} {'impl':>8} {'us/frame':>10} {'heap B':>10}")
+
+    for ms in (20, 60, 100):
+        pcm = os.urandom(SAMPLE_RATE * 2 * ms // 1000)
+        for name, fn in (("legacy", legacy_encode), ("codec", encoder.encode_text)):
+            us, peak = measure(fn, pcm, args.iterations)
+            print(f"{'encode':>10} {f'{ms}ms':>10} {name:>8} {us:>10.1f} {peak:>10}")
+
+    for seconds, parts in ((0.5, 1), (2.0, 1), (2.0, 4)):
+        pcm = os.urandom(int(SAMPLE_RATE * 2 * seconds / parts))
+        message = server_message(pcm, parts)
+        label = f"{len(message) // 1024}KBx{parts}"
+        # Text frames arrive as str, binary frames as bytes (sliced zero-copy).
+        for name, fn, arg in (
+            ("legacy", legacy_decode, message),
+            ("codec", parse_server_message, message),
+            ("codec-b", parse_server_message, message.encode("ascii")),
+        ):
+            us, peak = measure(fn, arg, max(50, args.iterations // 10))
+            print(f"{'decode':>10} {label:>10} {name:>8} {us:>10.1f} {peak:>10}")
+
+
+if __name__ == "__main__":
+    main()
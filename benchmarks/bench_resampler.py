@@ -0,0 +1,74 @@
+"""
+Microbenchmark: per-chunk cost of the streaming resampler vs. the previous
+stateless ``resample_poly`` implementation.
+
+Usage:
+    python -m benchmarks.bench_resampler [--chunks 2000] [--chunk-ms 20]
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from scipy import signal
+
+from app.services.audio_utils import AudioProcessor
+
+
+def legacy_resample(audio_data: bytes, input_rate: int, output_rate: int) -> bytes:
+    """The pre-streaming implementation: one-shot resample_poly per chunk."""
+    audio_np = np.frombuffer(audio_data, dtype=np.int16)
+    gcd = int(np.gcd(input_rate, output_rate))
+    up = int(output_rate // gcd)
+    down = int(input_rate // gcd)
+    resampled = signal.resample_poly(audio_np.astype(np.float32), up, down)
+    resampled = np.clip(resampled, -32768, 32767)
+    return resampled.astype(np.int16).tobytes()
+
+
+def measure(fn, chunks):
+    for chunk in chunks[:50]:  # warm caches / filter design
+        fn(chunk)
+
+    start = time.perf_counter()
+    for chunk in chunks:
+        fn(chunk)
+    us_per_chunk = (time.perf_counter() - start) / len(chunks) * 1e6
+
+    tracemalloc.start()
+    peak_total = 0
+    for chunk in chunks[:200]:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        fn(chunk)
+        _, peak = tracemalloc.get_traced_memory()
+        peak_total += peak - base
+    tracemalloc.stop()
+    return us_per_chunk, peak_total / 200
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunk-ms", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # "heap B/chunk" is the transient heap high-water mark (tracemalloc) of a single call.
+    print(f"{'ratio':>14} {'impl':>10} {'us/chunk':>10} {'heap B/chunk':>13}")
+    for input_rate, output_rate in [(48000, 24000), (44100, 24000), (16000, 24000)]:
+        n = input_rate * args.chunk_ms // 1000
+        chunks = [(rng.standard_normal(n) * 3000).astype(np.int16).tobytes() for _ in range(args.chunks)]
+
+        processor = AudioProcessor(input_rate=input_rate, output_rate=output_rate)
+        impls = {
+            "legacy": lambda c: legacy_resample(c, input_rate, output_rate),
+            "streaming": processor.resample_audio,
+        }
+        for name, fn in impls.items():
+            us, peak = measure(fn, chunks)
+            print(f"{input_rate:>6}->{output_rate:<6} {name:>10} {us:>10.1f} {peak:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Startup budget: how long a fresh interpreter takes to import the app.
+
+Every uvicorn worker (and every restart) pays this before it can accept a
+connection. Imports ``app.main`` in new processes under ``-X importtime``,
+reports the median wall time and the modules that cost the most, and exits
+non-zero if the median is over budget or if a module that should be loaded
+lazily (numpy, via the DSP code) or not at all (scipy) was imported.
+
+Usage:
+    python -m benchmarks.check_import_time [--runs 5] [--budget-ms 900] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+TARGET = "app.main"
+# Preloaded in the background after startup (numpy, audio_utils) or used by benchmarks only (scipy).
+DEFERRED = ("scipy", "numpy", "app.services.audio_utils")
+
+_PROBE = (
+    "import sys, time; t = time.perf_counter(); import {target}; "
+    "print('WALL', time.perf_counter() - t); "
+    "print('LOADED', ','.join(m for m in {deferred!r} if m in sys.modules))"
+)
+
+
+def run_once(target: str) -> Tuple[float, List[str], Dict[str, int]]:
+    """Returns wall seconds, deferred modules that got loaded, and self-time us per top-level package."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(target=target, deferred=DEFERRED)],
+        capture_output=True, text=True, env=env,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"importing {target} failed:\n{proc.stderr[-2000:]}")
+
+    wall = 0.0
+    loaded: List[str] = []
+    for line in proc.stdout.splitlines():
+        if line.startswith("WALL "):
+            wall = float(line.split()[1])
+        elif line.startswith("LOADED "):
+            loaded = [m for m in line[len("LOADED "):].split(",") if m]
+
+    # Lines look like "import time:   self [us] | cumulative | imported package".
+    # Self times are summed per package (fastapi, pydantic, ...) so nothing is counted twice.
+    by_package: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        package = fields[2].strip().split(".")[0]
+        by_package[package] = by_package.get(package, 0) + int(fields[0])
+    return wall, loaded, by_package
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "900")),
+                        help="Fail if the median import time is above this (env IMPORT_BUDGET_MS)")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest packages to list")
+    parser.add_argument("--target", default=TARGET)
+    args = parser.parse_args()
+
+    run_once(args.target)  # Warm the OS file cache
+    walls: List[float] = []
+    per_package: Dict[str, List[int]] = {}
+    loaded: List[str] = []
+    for _ in range(args.runs):
+        wall, loaded, by_package = run_once(args.target)
+        walls.append(wall)
+        for name, us in by_package.items():
+            per_package.setdefault(name, []).append(us)
+
+    median_ms = statistics.median(walls) * 1000
+    print(f"import {args.target}: median {median_ms:.0f}ms "
+          f"(min {min(walls) * 1000:.0f}ms, max {max(walls) * 1000:.0f}ms, {args.runs} runs)")
+    print(f"\n{'package':<40} {'ms':>8}")
+    ranked = sorted(per_package.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, samples in ranked[: args.top]:
+        print(f"{name:<40} {statistics.median(samples) / 1000:>8.1f}")
+
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"median {median_ms:.0f}ms is over the {args.budget_ms:.0f}ms budget")
+    if loaded:
+        failures.append(f"imported at startup but should be deferred: {', '.join(loaded)}")
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print(f"\nOK: within the {args.budget_ms:.0f}ms budget, nothing deferred was imported")
+
+
+if __name__ == "__main__":
+    main()
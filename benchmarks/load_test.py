@@ -0,0 +1,286 @@
+"""
+Concurrent-session load test for /ws/chat against the local Gemini stand-in.
+
+Starts benchmarks.mock_gemini in-process, launches the app server pointed at
+it (or uses --url for a server you started with GEMINI_LIVE_URI set to the
+mock), then opens N simulated browser clients that stream 20ms mic frames
+at real-time pace, alternating speech and silence so the VAD ends each turn.
+
+Reports p50/p99 time-to-first-audio, p50/p99 mic-to-upstream latency (a
+marked mic frame leaving the client until it reaches the mock), how far ahead
+of playback the clients are buffered, the length of the audio frames they
+receive, server CPU per session and the implied sessions per core. With
+--interrupt-prob it also reports barge-in latency: the mock sending
+``interrupted`` until the client receives the server's ``interrupt``.
+
+Usage:
+    python -m benchmarks.load_test --sessions 50 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import struct
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import websockets
+
+from benchmarks.mock_gemini import MockGeminiServer
+
+SAMPLE_RATE = 24000
+FRAME_SAMPLES = SAMPLE_RATE * 20 // 1000
+# First sample of every speech frame; the next two carry (client id, sequence).
+MARKER = 31322
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.sent_at: Dict[Tuple[int, int], float] = {}
+        self.upstream_latency: List[float] = []
+        self.first_audio: List[float] = []
+        self.failures = 0
+        self.audio_bytes = 0
+        self.client_lead: List[float] = []
+        self.frame_seconds: List[float] = []
+        # Barge-in: the mock's nth interrupt on a connection is the client's interrupt id n.
+        self.conn_client: Dict[int, int] = {}
+        self.interrupt_sent: Dict[Tuple[int, int], float] = {}
+        self.interrupt_count: Dict[int, int] = {}
+        self.interrupt_received: List[Tuple[int, int, float]] = []
+
+        t = np.arange(FRAME_SAMPLES) / SAMPLE_RATE
+        self._tone = (np.sin(2 * np.pi * 180 * t) * 8000).astype(np.int16)
+        self._silence = np.zeros(FRAME_SAMPLES, dtype=np.int16).tobytes()
+
+    def on_upstream_audio(self, pcm: bytes, arrived: float, conn: int) -> None:
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        for offset in range(0, len(samples) - 2, FRAME_SAMPLES):
+            if samples[offset] == MARKER:
+                self.conn_client[conn] = int(samples[offset + 1])
+                sent = self.sent_at.pop((int(samples[offset + 1]), int(samples[offset + 2])), None)
+                if sent is not None:
+                    self.upstream_latency.append(arrived - sent)
+
+    def on_interrupt(self, conn: int, sent: float) -> None:
+        n = self.interrupt_count[conn] = self.interrupt_count.get(conn, 0) + 1
+        self.interrupt_sent[(conn, n)] = sent
+
+    def barge_in_latency(self) -> List[float]:
+        conns: Dict[int, List[int]] = {}
+        for conn, client_id in self.conn_client.items():
+            conns.setdefault(client_id, []).append(conn)
+        latency = []
+        for client_id, interrupt_id, received in self.interrupt_received:
+            # After a reconnect the server's ids no longer line up with one connection's count.
+            if len(conns.get(client_id, ())) != 1:
+                continue
+            sent = self.interrupt_sent.get((conns[client_id][0], interrupt_id))
+            if sent is not None:
+                latency.append(received - sent)
+        return latency
+
+    async def client(self, client_id: int) -> None:
+        speech_frames = self.args.speech_ms // 20
+        cycle = speech_frames + self.args.silence_ms // 20
+        opened = time.monotonic()
+        deadline = opened + self.args.duration
+        try:
+            async with websockets.connect(self.args.url, max_size=4 * 1024 * 1024) as ws:
+                await ws.send(json.dumps({
+                    "type": "config", "sampleRate": SAMPLE_RATE, "sourceSampleRate": 48000, "chunkMs": 20,
+                    "downstreamCodec": self.args.codec, "playbackRate": self.args.playback_rate,
+                }))
+
+                # Simulated player: audio plays back to back from arrival, like the browser.
+                player = {"codec": "pcm16", "rate": SAMPLE_RATE, "play_end": 0.0}
+
+                async def receiver():
+                    first = True
+                    async for message in ws:
+                        if isinstance(message, bytes):
+                            now = time.monotonic()
+                            self.audio_bytes += len(message)
+                            if first:
+                                self.first_audio.append(now - opened)
+                                first = False
+                            duration = _samples(player["codec"], message) / player["rate"]
+                            self.frame_seconds.append(duration)
+                            player["play_end"] = max(now, player["play_end"]) + duration
+                            self.client_lead.append(player["play_end"] - now)
+                        else:
+                            msg = json.loads(message)
+                            if msg.get("type") == "codec":
+                                player["codec"] = msg.get("codec")
+                                player["rate"] = msg.get("sampleRate") or SAMPLE_RATE
+                            elif msg.get("type") == "interrupt":
+                                self.interrupt_received.append((client_id, msg.get("id"), time.monotonic()))
+                                player["play_end"] = 0.0
+                                await ws.send(json.dumps({"type": "interrupt_ack", "id": msg.get("id")}))
+
+                recv_task = asyncio.create_task(receiver())
+                start = time.monotonic()
+                frame_index = 0
+                seq = 0
+                while time.monotonic() < deadline and not recv_task.done():
+                    if frame_index % cycle < speech_frames:
+                        frame = self._tone.copy()
+                        frame[0], frame[1], frame[2] = MARKER, client_id, seq
+                        self.sent_at[(client_id, seq)] = time.monotonic()
+                        seq = (seq + 1) % 32768
+                        await ws.send(frame.tobytes())
+                    else:
+                        await ws.send(self._silence)
+                    if frame_index % 50 == 0:
+                        buffered = max(0.0, player["play_end"] - time.monotonic())
+                        await ws.send(json.dumps({
+                            "type": "ping", "timestamp": int(time.time() * 1000), "bufferedMs": round(buffered * 1000),
+                        }))
+                    frame_index += 1
+                    delay = start + frame_index * 0.02 - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                recv_task.cancel()
+        except Exception as e:
+            self.failures += 1
+            print(f"client {client_id}: {e!r}", file=sys.stderr)
+
+
+def _samples(codec: str, message: bytes) -> int:
+    if codec == "mulaw":
+        return len(message)
+    if codec == "adpcm":
+        return struct.unpack_from("<I", message)[0]
+    return len(message) // 2
+
+
+def _proc_cpu_seconds(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+async def _wait_for_port(host: str, port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server on {host}:{port} did not come up")
+
+
+async def _main(args) -> None:
+    test = LoadTest(args)
+    mock = MockGeminiServer(
+        turn_seconds=args.turn_seconds,
+        first_audio_delay_ms=args.first_audio_delay_ms,
+        interrupt_prob=args.interrupt_prob,
+        speed=args.gemini_speed,
+        drop_after=args.gemini_drop_after,
+        on_audio=test.on_upstream_audio,
+        on_interrupt=test.on_interrupt,
+    )
+
+    server_proc = None
+    async with mock.serve("127.0.0.1", args.mock_port):
+        if args.url is None:
+            env = dict(os.environ)
+            env.setdefault("GEMINI_API_KEY", "mock")
+            env["GEMINI_LIVE_URI"] = f"ws://127.0.0.1:{args.mock_port}"
+            server_proc = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+                env=env,
+            )
+            args.url = f"ws://127.0.0.1:{args.port}/ws/chat"
+            await _wait_for_port("127.0.0.1", args.port, 30)
+
+        try:
+            cpu_start = _proc_cpu_seconds(server_proc.pid) if server_proc else None
+            wall_start = time.monotonic()
+            clients = []
+            for i in range(args.sessions):
+                clients.append(asyncio.create_task(test.client(i)))
+                await asyncio.sleep(args.ramp / max(1, args.sessions))
+            await asyncio.gather(*clients)
+            wall = time.monotonic() - wall_start
+            cpu_end = _proc_cpu_seconds(server_proc.pid) if server_proc else None
+        finally:
+            if server_proc is not None:
+                server_proc.terminate()
+                # Wait off the loop: the mock still has to answer the server's closing handshakes.
+                try:
+                    await asyncio.to_thread(server_proc.wait, 10)
+                except subprocess.TimeoutExpired:
+                    print("server did not stop within 10s of SIGTERM, killed it", file=sys.stderr)
+                    server_proc.kill()
+                    await asyncio.to_thread(server_proc.wait)
+
+    ms = lambda v: v * 1000  # noqa: E731
+    print(f"sessions: {args.sessions} ({test.failures} failed), duration {wall:.1f}s")
+    print(f"mock: {mock.sessions} upstream sessions, {mock.turns} turns, {mock.interruptions} interruptions, "
+          f"{mock.audio_messages_in} audio messages in")
+    if mock.drops:
+        print(f"failover: {mock.drops} upstream connections dropped, {mock.resumed} resumed")
+    print(f"time to first audio: p50 {ms(percentile(test.first_audio, 50)):.0f}ms "
+          f"p99 {ms(percentile(test.first_audio, 99)):.0f}ms (n={len(test.first_audio)})")
+    print(f"mic to upstream: p50 {ms(percentile(test.upstream_latency, 50)):.1f}ms "
+          f"p99 {ms(percentile(test.upstream_latency, 99)):.1f}ms (n={len(test.upstream_latency)})")
+    if mock.interruptions:
+        barge_in = test.barge_in_latency()
+        print(f"barge-in: interrupted to client p50 {ms(percentile(barge_in, 50)):.1f}ms "
+              f"p99 {ms(percentile(barge_in, 99)):.1f}ms max {ms(max(barge_in, default=0)):.1f}ms (n={len(barge_in)})")
+    print(f"downstream audio ({args.codec}): {test.audio_bytes / wall / 1024:.0f} KB/s total, client buffered "
+          f"p50 {ms(percentile(test.client_lead, 50)):.0f}ms max {ms(max(test.client_lead, default=0)):.0f}ms")
+    print(f"downstream frames: {len(test.frame_seconds)}, p50 {ms(percentile(test.frame_seconds, 50)):.0f}ms "
+          f"min {ms(min(test.frame_seconds, default=0)):.0f}ms max {ms(max(test.frame_seconds, default=0)):.0f}ms")
+    if cpu_start is not None and cpu_end is not None:
+        cpu_fraction = (cpu_end - cpu_start) / wall
+        per_session = cpu_fraction / args.sessions
+        print(f"server CPU: {cpu_fraction * 100:.1f}% of one core, {per_session * 100:.2f}% per session, "
+              f"~{1 / per_session if per_session else float('inf'):.0f} sessions per core")
+    else:
+        print("server CPU: n/a (external server or no /proc)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds each client streams")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Seconds over which clients connect")
+    parser.add_argument("--url", default=None, help="Existing /ws/chat URL (default: launch the app)")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the launched app server")
+    parser.add_argument("--mock-port", type=int, default=9100)
+    parser.add_argument("--speech-ms", type=int, default=1500)
+    parser.add_argument("--silence-ms", type=int, default=1500)
+    parser.add_argument("--turn-seconds", type=float, default=2.0)
+    parser.add_argument("--first-audio-delay-ms", type=int, default=300)
+    parser.add_argument("--interrupt-prob", type=float, default=0.0)
+    parser.add_argument("--gemini-speed", type=float, default=1.0,
+                        help="How much faster than real time the mock generates audio")
+    parser.add_argument("--codec", default="pcm16", help="Downstream codec the clients request")
+    parser.add_argument("--playback-rate", type=int, default=None,
+                        help="Ask the server to resample downstream audio to this rate (e.g. 48000)")
+    parser.add_argument("--gemini-drop-after", type=float, default=0.0,
+                        help="Have the mock cut each upstream connection after this many seconds")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Local stand-in for the Gemini Live BidiGenerateContent websocket.
+
+Speaks enough of the protocol for GeminiLiveService: answers ``setup`` with
+``setupComplete``, accepts ``realtime_input`` audio, and answers each user
+turn (a ``client_content`` turn or ``audio_stream_end``) with synthetic 24kHz
+PCM ``inlineData`` streamed at real-time pace, followed by ``turnComplete``.
+Mic audio arriving mid-turn interrupts the turn with a configurable
+probability. Session resumption is supported (``sessionResumptionUpdate``
+handles, accepted back in ``setup``), and connections can be cut abruptly
+after a fixed time to exercise client failover.
+
+Usage:
+    python -m benchmarks.mock_gemini --port 9100 --turn-seconds 3
+    GEMINI_LIVE_URI=ws://127.0.0.1:9100 python run.py
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import random
+import time
+from typing import Callable, Optional
+
+import numpy as np
+import websockets
+
+logger = logging.getLogger("mock_gemini")
+
+SAMPLE_RATE = 24000
+
+
+class MockGeminiServer:
+    def __init__(
+        self,
+        *,
+        turn_seconds: float = 3.0,
+        chunk_ms: int = 40,
+        first_audio_delay_ms: int = 300,
+        interrupt_prob: float = 0.0,
+        speed: float = 1.0,
+        drop_after: float = 0.0,
+        on_audio: Optional[Callable[[bytes, float, int], None]] = None,
+        on_interrupt: Optional[Callable[[int, float], None]] = None,
+    ):
+        self.turn_seconds = turn_seconds
+        self.chunk_ms = chunk_ms
+        self.first_audio_delay = first_audio_delay_ms / 1000
+        self.interrupt_prob = interrupt_prob
+        # Audio generated per wall-clock second; the real service often runs ahead of real time.
+        self.speed = speed
+        # Abort each connection (no close frame, like a network failure) after this many seconds; 0 = never
+        self.drop_after = drop_after
+        # Called with (pcm, arrival monotonic time, connection number) for every realtime_input audio message.
+        self.on_audio = on_audio
+        # Called with (connection number, monotonic time) right after each ``interrupted`` is sent.
+        self.on_interrupt = on_interrupt
+
+        t = np.arange(SAMPLE_RATE * chunk_ms // 1000) / SAMPLE_RATE
+        tone = (np.sin(2 * np.pi * 220 * t) * 6000).astype(np.int16).tobytes()
+        self._chunk_b64 = base64.b64encode(tone).decode("ascii")
+
+        self.sessions = 0
+        self.turns = 0
+        self.interruptions = 0
+        self.audio_messages_in = 0
+        self.drops = 0
+        self.resumed = 0
+        self._handles = set()
+        self._next_handle = 0
+
+    def _new_handle(self) -> str:
+        self._next_handle += 1
+        handle = f"mock-{self._next_handle}"
+        self._handles.add(handle)
+        return handle
+
+    def _drop(self, ws) -> None:
+        self.drops += 1
+        ws.transport.abort()
+
+    async def handler(self, ws, path=None) -> None:
+        setup = json.loads(await ws.recv())
+        if "setup" not in setup:
+            await ws.close(code=1008)
+            return
+        resumption = setup["setup"].get("session_resumption")
+        transcribe = "output_audio_transcription" in setup["setup"]
+        handle = (resumption or {}).get("handle")
+        if handle is not None:
+            if handle not in self._handles:
+                await ws.close(code=1008, reason="unknown resumption handle")
+                return
+            self.resumed += 1
+        await ws.send(json.dumps({"setupComplete": {}}))
+        self.sessions += 1
+        conn = self.sessions
+        if resumption is not None:
+            await ws.send(json.dumps({"sessionResumptionUpdate": {"newHandle": self._new_handle(), "resumable": True}}))
+
+        turn: Optional[asyncio.Task] = None
+        drop = asyncio.get_running_loop().call_later(self.drop_after, self._drop, ws) if self.drop_after > 0 else None
+        try:
+            async for raw in ws:
+                arrived = time.monotonic()
+                msg = json.loads(raw)
+                realtime = msg.get("realtime_input")
+                if realtime is not None:
+                    audio = realtime.get("audio")
+                    if audio and audio.get("data"):
+                        self.audio_messages_in += 1
+                        if self.on_audio is not None:
+                            self.on_audio(base64.b64decode(audio["data"]), arrived, conn)
+                        if turn is not None and not turn.done() and random.random() < self.interrupt_prob:
+                            turn.cancel()
+                            self.interruptions += 1
+                            await ws.send(json.dumps({"serverContent": {"interrupted": True}}))
+                            if self.on_interrupt is not None:
+                                self.on_interrupt(conn, time.monotonic())
+                    if realtime.get("audio_stream_end") and (turn is None or turn.done()):
+                        turn = asyncio.create_task(self._model_turn(ws, resumption is not None, transcribe))
+                elif msg.get("client_content", {}).get("turn_complete"):
+                    if turn is None or turn.done():
+                        turn = asyncio.create_task(self._model_turn(ws, resumption is not None, transcribe))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if drop is not None:
+                drop.cancel()
+            if turn is not None:
+                turn.cancel()
+
+    async def _model_turn(self, ws, resumable: bool, transcribe: bool = False) -> None:
+        self.turns += 1
+        await asyncio.sleep(self.first_audio_delay)
+        chunk_s = self.chunk_ms / 1000
+        interval = chunk_s / self.speed
+        message = json.dumps({
+            "serverContent": {
+                "modelTurn": {"parts": [{"inlineData": {"mimeType": "audio/pcm;rate=24000", "data": self._chunk_b64}}]}
+            }
+        })
+        start = time.monotonic()
+        n_chunks = max(1, int(self.turn_seconds / chunk_s))
+        for i in range(n_chunks):
+            await ws.send(message)
+            # Chunk i is due at start + i * interval (real time at speed 1).
+            delay = start + (i + 1) * interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        if transcribe:
+            await ws.send(json.dumps({"serverContent": {"outputTranscription": {"text": f"Mock turn {self.turns}."}}}))
+        await ws.send(json.dumps({"serverContent": {"turnComplete": True}}))
+        if resumable:
+            await ws.send(json.dumps({"sessionResumptionUpdate": {"newHandle": self._new_handle(), "resumable": True}}))
+
+    def serve(self, host: str, port: int):
+        return websockets.serve(self.handler, host, port, max_size=4 * 1024 * 1024)
+
+
+async def _main(args) -> None:
+    server = MockGeminiServer(
+        turn_seconds=args.turn_seconds,
+        chunk_ms=args.chunk_ms,
+        first_audio_delay_ms=args.first_audio_delay_ms,
+        interrupt_prob=args.interrupt_prob,
+        speed=args.speed,
+        drop_after=args.drop_after,
+    )
+    async with server.serve(args.host, args.port):
+        logger.info("Mock Gemini Live listening on ws://%s:%d", args.host, args.port)
+        await asyncio.Future()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--turn-seconds", type=float, default=3.0)
+    parser.add_argument("--chunk-ms", type=int, default=40)
+    parser.add_argument("--first-audio-delay-ms", type=int, default=300)
+    parser.add_argument("--interrupt-prob", type=float, default=0.0,
+                        help="Chance that each mic message during a model turn interrupts it")
+    parser.add_argument("--speed", type=float, default=1.0, help="Audio generated per second, in real-time units")
+    parser.add_argument("--drop-after", type=float, default=0.0,
+                        help="Abort every connection after this many seconds (0 = never)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
+import argparse
 import uvicorn
-import os
 import webbrowser
 import threading
 import time
@@ -9,7 +9,24 @@ def open_browser():
     time.sleep(2)  # Wait for uvicorn to startup
     webbrowser.open("http://localhost:8000")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Motivational Voice ChatBot")
+    parser.add_argument("--prod", action="store_true",
+                        help="Production mode: multi-worker, no reload/browser, graceful drain on SIGTERM")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="Production workers (default: one per core)")
+    parser.add_argument("--drain-timeout", type=float, default=None,
+                        help="Seconds live sessions may continue after SIGTERM")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.prod:
+        from app.launcher import serve
+        serve(host=args.host, port=args.port, workers=args.workers, drain_timeout=args.drain_timeout)
+        raise SystemExit(0)
+
     print("----------------------------------------------------------------")
     print("   Starting Motivational Voice ChatBot (Production Grade)       ")
     print("----------------------------------------------------------------")
@@ -18,15 +35,14 @@ if __name__ == "__main__":
     print(" * Audio: 24kHz High Fidelity")
     print("----------------------------------------------------------------")
     
-    # Check for API Key
-    if not os.getenv("GEMINI_API_KEY"):
-        # Just a warning, as it might be loaded from .env inside the app too
-        # But good for user feedback in CLI
-        try:
-            from app.core.config import settings
-            print(" * API Key: Detected")
-        except Exception as e:
-            print(" ! WARNING: GEMINI_API_KEY might be missing or invalid.")
+    # Check for API Key (settings also reads it from .env)
+    # Just a warning: the server still starts, but sessions will fail without it
+    from app.core.config import settings
+    try:
+        settings.validate()
+        print(" * API Key: Detected")
+    except ValueError as e:
+        print(f" ! WARNING: {e}")
     
     # Launch browser in a separate thread
     threading.Thread(target=open_browser, daemon=True).start()
@@ -34,4 +50,4 @@ if __name__ == "__main__":
     # Run Server
     # We use workers=1 for websocket stability in this simple setup,
     # though uvicorn supports async workers well.
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("app.main:app", host=args.host, port=args.port, reload=True)